@@ -5,12 +5,97 @@ load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "20"))
+GEMINI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GEMINI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+GEMINI_KEEPALIVE_EXPIRY = float(os.getenv("GEMINI_KEEPALIVE_EXPIRY", "60"))
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "15"))
+GEMINI_TOKENS_PER_MINUTE = int(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+GEMINI_HEDGE_ENABLED = os.getenv("GEMINI_HEDGE_ENABLED", "false").lower() == "true"
+GEMINI_HEDGE_MIN_SAMPLES = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20"))
+GEMINI_BREAKER_FAILURE_THRESHOLD = int(os.getenv("GEMINI_BREAKER_FAILURE_THRESHOLD", "5"))
+GEMINI_BREAKER_RESET_SECONDS = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", "30"))
+HTTP_USER_AGENT = "PiliSeed/1.0 (Agricultural Recommendation System; https://github.com/dandee77/piliseed)"
+WIKIPEDIA_BASE_URL = os.getenv("WIKIPEDIA_BASE_URL", "https://en.wikipedia.org/api/rest_v1")
+WIKIPEDIA_HTTP2 = os.getenv("WIKIPEDIA_HTTP2", "true").lower() == "true"
+WIKIPEDIA_TIMEOUT_SECONDS = float(os.getenv("WIKIPEDIA_TIMEOUT_SECONDS", "10"))
+WIKIPEDIA_BATCH_TIMEOUT_SECONDS = float(os.getenv("WIKIPEDIA_BATCH_TIMEOUT_SECONDS", "12"))
+WIKIPEDIA_MAX_CONCURRENCY = int(os.getenv("WIKIPEDIA_MAX_CONCURRENCY", "8"))
+WIKIPEDIA_MAX_CONNECTIONS = int(os.getenv("WIKIPEDIA_MAX_CONNECTIONS", "10"))
+THUMBNAIL_CACHE_ENABLED = os.getenv("THUMBNAIL_CACHE_ENABLED", "true").lower() == "true"
+THUMBNAIL_CACHE_MAX_ENTRIES = int(os.getenv("THUMBNAIL_CACHE_MAX_ENTRIES", "2048"))
+THUMBNAIL_CACHE_TTL_SECONDS = int(os.getenv("THUMBNAIL_CACHE_TTL_SECONDS", "2592000"))
+THUMBNAIL_CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv("THUMBNAIL_CACHE_NEGATIVE_TTL_SECONDS", "86400"))
+IMAGE_STORE_ENABLED = os.getenv("IMAGE_STORE_ENABLED", "false").lower() == "true"
+IMAGE_STORE_WIDTHS = [int(width) for width in os.getenv("IMAGE_STORE_WIDTHS", "120,250,500").split(",")]
+IMAGE_STORE_DEFAULT_WIDTH = int(os.getenv("IMAGE_STORE_DEFAULT_WIDTH", "250"))
+IMAGE_STORE_BASE_URL = os.getenv("IMAGE_STORE_BASE_URL", "").rstrip("/")
+IMAGE_STORE_CONCURRENCY = int(os.getenv("IMAGE_STORE_CONCURRENCY", "2"))
+IMAGE_CACHE_MAX_AGE_SECONDS = int(os.getenv("IMAGE_CACHE_MAX_AGE_SECONDS", "2592000"))
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017/")
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "5"))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGODB_COMPRESSORS = [name.strip() for name in os.getenv("MONGODB_COMPRESSORS", "zstd,zlib").split(",") if name.strip()]
+MONGODB_BOOTSTRAP_RETRY_SECONDS = float(os.getenv("MONGODB_BOOTSTRAP_RETRY_SECONDS", "10"))
 DATABASE_NAME = "PiliSeed"
+APP_ENV = os.getenv("APP_ENV", "development").lower()
+# Checked at startup everywhere but production, so a query without an index shows up in development
+MONGODB_VERIFY_QUERY_PLANS = os.getenv("MONGODB_VERIFY_QUERY_PLANS", str(APP_ENV != "production")).lower() == "true"
 HTTP_TIMEOUT = 60
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "120"))
+REQUEST_TIMEOUT_MAX_SECONDS = float(os.getenv("REQUEST_TIMEOUT_MAX_SECONDS", "600"))
 MAX_RETRIES = 3
 RETRY_DELAY = 2
 
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "21600"))
+
+CHAT_PROMPT_TOKEN_BUDGET = int(os.getenv("CHAT_PROMPT_TOKEN_BUDGET", "6000"))
+
+HARDWARE_JOB_WORKERS = int(os.getenv("HARDWARE_JOB_WORKERS", "4"))
+HARDWARE_JOB_LEASE_SECONDS = int(os.getenv("HARDWARE_JOB_LEASE_SECONDS", "600"))
+HARDWARE_JOB_MAX_ATTEMPTS = int(os.getenv("HARDWARE_JOB_MAX_ATTEMPTS", "3"))
+HARDWARE_JOB_POLL_INTERVAL = float(os.getenv("HARDWARE_JOB_POLL_INTERVAL", "5"))
+HARDWARE_BATCH_MAX_SENSORS = int(os.getenv("HARDWARE_BATCH_MAX_SENSORS", "100"))
+HARDWARE_BATCH_CONCURRENCY = int(os.getenv("HARDWARE_BATCH_CONCURRENCY", "4"))
+HARDWARE_BATCH_STORE_TIMEOUT_SECONDS = float(os.getenv("HARDWARE_BATCH_STORE_TIMEOUT_SECONDS", "15"))
+HARDWARE_REPAIR_ATTEMPTS = int(os.getenv("HARDWARE_REPAIR_ATTEMPTS", "2"))
+
+SESSION_REUSE_ENABLED = os.getenv("SESSION_REUSE_ENABLED", "true").lower() == "true"
+SESSION_REUSE_MAX_DISTANCE = float(os.getenv("SESSION_REUSE_MAX_DISTANCE", "1.0"))
+SESSION_REUSE_MAX_AGE_HOURS = float(os.getenv("SESSION_REUSE_MAX_AGE_HOURS", "72"))
+SESSION_INDEX_MAX_SESSIONS = int(os.getenv("SESSION_INDEX_MAX_SESSIONS", "5000"))
+
+# A reading regenerates recommendations only once a metric moves further than
+# its band from the last session's reading
+SENSOR_CHANGE_DETECTION_ENABLED = os.getenv("SENSOR_CHANGE_DETECTION_ENABLED", "true").lower() == "true"
+SENSOR_CHANGE_BANDS = {
+    "soil_moisture_pct": float(os.getenv("SENSOR_BAND_SOIL_MOISTURE_PCT", "5")),
+    "temperature_c": float(os.getenv("SENSOR_BAND_TEMPERATURE_C", "2")),
+    "humidity_pct": float(os.getenv("SENSOR_BAND_HUMIDITY_PCT", "8")),
+    "light_lux": float(os.getenv("SENSOR_BAND_LIGHT_LUX", "8000")),
+}
+SENSOR_REGENERATE_MIN_INTERVAL_SECONDS = int(os.getenv("SENSOR_REGENERATE_MIN_INTERVAL_SECONDS", "900"))
+
+CROP_CATALOG_ENABLED = os.getenv("CROP_CATALOG_ENABLED", "true").lower() == "true"
+CROP_CATALOG_MAX_AGE_DAYS = float(os.getenv("CROP_CATALOG_MAX_AGE_DAYS", "90"))
+CROP_CATALOG_REFRESH_SECONDS = float(os.getenv("CROP_CATALOG_REFRESH_SECONDS", "300"))
+CROP_CATALOG_PROMPT_LIMIT = int(os.getenv("CROP_CATALOG_PROMPT_LIMIT", "200"))
+CROP_RANKER_ENABLED = os.getenv("CROP_RANKER_ENABLED", "true").lower() == "true"
+CROP_RANKER_TOP_K = int(os.getenv("CROP_RANKER_TOP_K", "20"))
+CROP_FILTER_LOCAL_ENABLED = os.getenv("CROP_FILTER_LOCAL_ENABLED", "true").lower() == "true"
+CROP_FILTER_MIN_MATCHES = int(os.getenv("CROP_FILTER_MIN_MATCHES", "2"))
+CROP_FILTER_MAX_RESULTS = int(os.getenv("CROP_FILTER_MAX_RESULTS", "5"))
+CROP_FILTER_WORK_HOURS_PER_WEEK = float(os.getenv("CROP_FILTER_WORK_HOURS_PER_WEEK", "40"))
+
+SINGLE_FLIGHT_BACKEND = os.getenv("SINGLE_FLIGHT_BACKEND", "mongo")
+SINGLE_FLIGHT_LEASE_SECONDS = int(os.getenv("SINGLE_FLIGHT_LEASE_SECONDS", "240"))
+SINGLE_FLIGHT_POLL_INTERVAL = float(os.getenv("SINGLE_FLIGHT_POLL_INTERVAL", "0.5"))
+SINGLE_FLIGHT_RESULT_TTL_SECONDS = int(os.getenv("SINGLE_FLIGHT_RESULT_TTL_SECONDS", "30"))
+
 DEFAULT_SENSOR_VALUES = {
     "soil_moisture_pct": 28,
     "temperature_c": 26.7,
@@ -1,20 +1,137 @@
+import time
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Sequence
 from motor.motor_asyncio import AsyncIOMotorClient
-from app.core.config import MONGODB_URL, DATABASE_NAME
+from app.core.config import (
+    MONGODB_URL,
+    DATABASE_NAME,
+    MONGODB_VERIFY_QUERY_PLANS,
+    MONGODB_MAX_POOL_SIZE,
+    MONGODB_MIN_POOL_SIZE,
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+    MONGODB_COMPRESSORS,
+    MONGODB_BOOTSTRAP_RETRY_SECONDS
+)
+from app.core.indexes import ensure_indexes, verify_query_plans
+from app.core.pool_metrics import pool_metrics
+
+logger = logging.getLogger(__name__)
+
+def available_compressors(requested: List[str]) -> List[str]:
+    """The requested wire compressors whose modules are installed, in order."""
+    modules = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+    available = []
+    for name in requested:
+        try:
+            __import__(modules.get(name, name))
+        except ImportError:
+            logger.warning(f"MongoDB {name} compression requested but its module is not installed")
+            continue
+        available.append(name)
+    return available
 
 class MongoDB:
     client: AsyncIOMotorClient = None
+    compressors: List[str] = []
+    last_ping_ms: Optional[float] = None
+    indexes_ready: bool = False
+    bootstrap_task: Optional[asyncio.Task] = None
+    
+    @classmethod
+    async def connect(cls, on_ready: Sequence[Callable[[], Awaitable[Any]]] = ()):
+        """Connect, then create indexes and run `on_ready` (e.g. services' TTL indexes).
+
+        If the server cannot be reached yet, startup continues and that
+        bootstrap runs in the background once a ping succeeds.
+        """
+        cls.compressors = available_compressors(MONGODB_COMPRESSORS)
+        options = {
+            "maxPoolSize": MONGODB_MAX_POOL_SIZE,
+            "minPoolSize": MONGODB_MIN_POOL_SIZE,
+            "waitQueueTimeoutMS": MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+            "serverSelectionTimeoutMS": MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            "event_listeners": [pool_metrics]
+        }
+        if cls.compressors:
+            options["compressors"] = ",".join(cls.compressors)
+        cls.client = AsyncIOMotorClient(MONGODB_URL, **options)
+        
+        if await cls.prewarm():
+            await cls.bootstrap(on_ready)
+        else:
+            cls.bootstrap_task = asyncio.create_task(cls._bootstrap_when_reachable(on_ready))
+    
+    @classmethod
+    async def bootstrap(cls, on_ready: Sequence[Callable[[], Awaitable[Any]]] = ()):
+        try:
+            await ensure_indexes(cls.get_database())
+            for hook in on_ready:
+                await hook()
+            cls.indexes_ready = True
+            if MONGODB_VERIFY_QUERY_PLANS:
+                await verify_query_plans(cls.get_database())
+        except Exception as e:
+            logger.error(f"Index bootstrap failed: {str(e)}")
     
     @classmethod
-    async def connect(cls):
-        cls.client = AsyncIOMotorClient(MONGODB_URL)
+    async def _bootstrap_when_reachable(cls, on_ready: Sequence[Callable[[], Awaitable[Any]]]):
+        while True:
+            await asyncio.sleep(MONGODB_BOOTSTRAP_RETRY_SECONDS)
+            try:
+                await cls.ping()
+            except Exception:
+                continue
+            logger.info("MongoDB reachable, creating indexes")
+            await cls.bootstrap(on_ready)
+            return
+    
+    @classmethod
+    async def ping(cls) -> float:
+        """Round trip to the server in ms; raises if it cannot be selected in time."""
+        started = time.perf_counter()
+        await cls.client.admin.command("ping")
+        cls.last_ping_ms = (time.perf_counter() - started) * 1000
+        return cls.last_ping_ms
+    
+    @classmethod
+    async def prewarm(cls) -> bool:
+        """Ping once to discover the server, then open MONGODB_MIN_POOL_SIZE connections."""
+        try:
+            ping_ms = await cls.ping()
+            # Concurrent pings each need their own connection
+            await asyncio.gather(*[cls.client.admin.command("ping") for _ in range(MONGODB_MIN_POOL_SIZE)])
+        except Exception as e:
+            logger.error(f"MongoDB is not reachable at startup: {str(e)}")
+            return False
+        logger.info(
+            f"MongoDB reachable in {ping_ms:.1f}ms, {MONGODB_MIN_POOL_SIZE} connections prewarmed, "
+            f"compression: {', '.join(cls.compressors) or 'none'}"
+        )
+        return True
     
     @classmethod
     async def disconnect(cls):
+        if cls.bootstrap_task is not None:
+            cls.bootstrap_task.cancel()
+            cls.bootstrap_task = None
         if cls.client:
             cls.client.close()
     
     @classmethod
     def get_database(cls):
         return cls.client[DATABASE_NAME]
+    
+    @classmethod
+    def get_stats(cls) -> Dict[str, Any]:
+        return {
+            **pool_metrics.get_stats(),
+            "max_pool_size": MONGODB_MAX_POOL_SIZE,
+            "min_pool_size": MONGODB_MIN_POOL_SIZE,
+            "compressors": cls.compressors,
+            "indexes_ready": cls.indexes_ready,
+            "last_ping_ms": round(cls.last_ping_ms, 2) if cls.last_ping_ms is not None else None
+        }
 
 mongodb = MongoDB()
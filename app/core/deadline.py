@@ -0,0 +1,58 @@
+import time
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from typing import Optional, Awaitable, Any, Callable
+import pymongo
+from fastapi import HTTPException
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+class DeadlineExceeded(HTTPException):
+    def __init__(self, detail: str = "Request deadline exceeded"):
+        super().__init__(status_code=504, detail=detail)
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """Bound all work awaited inside the block to `seconds`.
+
+    Gemini and Wikipedia calls read the time left with remaining(); Mongo
+    calls are bounded through pymongo.timeout. A nested deadline can only
+    shorten the one already in effect. None or 0 leaves it unchanged.
+    """
+    if not seconds or seconds <= 0:
+        yield
+        return
+
+    expires_at = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        expires_at = min(expires_at, current)
+
+    token = _deadline.set(expires_at)
+    try:
+        with pymongo.timeout(max(0.0, expires_at - time.monotonic())):
+            yield
+    finally:
+        _deadline.reset(token)
+
+def remaining(default: Optional[float] = None) -> Optional[float]:
+    """Seconds left before the deadline, capped at `default`.
+
+    Returns `default` when no deadline is set and raises DeadlineExceeded
+    once it has passed.
+    """
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return default
+
+    left = expires_at - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded()
+    return left if default is None else min(default, left)
+
+async def without_deadline(fn: Callable[[], Awaitable[Any]]) -> Any:
+    """Call `fn` outside any deadline, e.g. for cleanup after the deadline has passed."""
+    async def call():
+        return await fn()
+    return await asyncio.get_running_loop().create_task(call(), context=contextvars.Context())
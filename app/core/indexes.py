@@ -0,0 +1,161 @@
+import sys
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple, Iterator
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Secondary indexes per collection. TTL indexes are created by the services
+# that own them (llm_cache, single_flight, thumbnail_cache).
+INDEXES: Dict[str, List[IndexModel]] = {
+    "crop_recommendations": [
+        # Latest session per sensor, per-sensor history and deletes
+        IndexModel([("data.sensor_id", ASCENDING), ("timestamp", DESCENDING)], name="sensor_latest"),
+        # Global history, session index load and catalog backfill
+        IndexModel([("timestamp", DESCENDING)], name="timestamp")
+    ],
+    "location_analysis": [
+        IndexModel([("data.sensor_id", ASCENDING), ("timestamp", DESCENDING)], name="sensor_latest")
+    ],
+    "filtered_recommendations": [
+        IndexModel([("data.session_id", ASCENDING), ("data.user_uid", ASCENDING), ("timestamp", DESCENDING)], name="session_user_latest")
+    ],
+    "users": [
+        IndexModel([("first_name", ASCENDING), ("last_name", ASCENDING)], name="full_name"),
+        IndexModel([("user_id", ASCENDING)], name="user_id")
+    ],
+    "hardware_jobs": [
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="claim_order")
+    ],
+    "crop_images.files": [
+        IndexModel([("metadata.crop", ASCENDING)], name="crop")
+    ]
+}
+
+# (collection, filter, sort) for every find the routers and services issue
+# on a field other than _id. Aggregations are listed by pipeline_shapes().
+QUERY_SHAPES: List[Tuple[str, Dict[str, Any], Optional[List[Tuple[str, int]]]]] = [
+    ("crop_recommendations", {"data.sensor_id": "sensor"}, [("timestamp", DESCENDING)]),
+    ("crop_recommendations", {"data.sensor_id": "sensor", "data.input.sensor_data": {"$exists": True}}, [("timestamp", DESCENDING)]),
+    ("crop_recommendations", {"data.sensor_id": {"$in": ["sensor"]}, "data.input.sensor_data": {"$exists": True}}, [("timestamp", DESCENDING)]),
+    ("crop_recommendations", {"data.input.sensor_data": {"$exists": True}, "data.reused_from": {"$exists": False}}, [("timestamp", DESCENDING)]),
+    ("crop_recommendations", {}, [("timestamp", DESCENDING)]),
+    ("location_analysis", {"data.sensor_id": "sensor"}, [("timestamp", DESCENDING)]),
+    ("location_analysis", {"data.sensor_id": {"$in": ["sensor"]}}, [("timestamp", DESCENDING)]),
+    ("filtered_recommendations", {"data.session_id": "session", "data.user_uid": "user"}, [("timestamp", DESCENDING)]),
+    ("users", {"first_name": "first", "last_name": "last"}, None),
+    ("users", {"user_id": "user"}, None),
+    ("hardware_jobs", {
+        "$or": [
+            {"status": "queued"},
+            {"status": "running", "lease_expires_at": {"$lte": datetime(2000, 1, 1)}}
+        ],
+        "attempts": {"$lt": 3}
+    }, [("created_at", ASCENDING)]),
+    ("crop_images.files", {"metadata.crop": "crop"}, None)
+]
+
+async def ensure_indexes(db):
+    """Create any declared index that is missing; existing ones are left as they are."""
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        try:
+            existing = set(await collection.index_information())
+        except OperationFailure:
+            existing = set()
+
+        missing = [model for model in models if model.document["name"] not in existing]
+        if not missing:
+            logger.info(f"Indexes on {collection_name} present: {', '.join(model.document['name'] for model in models)}")
+            continue
+
+        try:
+            created = await collection.create_indexes(missing)
+            logger.info(f"Created indexes on {collection_name}: {', '.join(created)}")
+        except OperationFailure as e:
+            # e.g. an index with the same keys under another name
+            logger.warning(f"Could not create indexes on {collection_name}: {str(e)}")
+
+def pipeline_shapes() -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """(collection, pipeline) for every aggregation whose $match should use an index.
+
+    The pipelines come from the functions that build them for the routes, so
+    a changed $match is checked as it is run. The crop catalog backfill reads
+    every session on purpose and is not listed.
+    """
+    # Imported here: both import app.core.database, which imports this module
+    from app.routers.recommendations import history_pipeline
+    from app.services.hardware_service import latest_contexts_pipeline, latest_sessions_pipeline
+    return [
+        ("crop_recommendations", history_pipeline("sensor")),
+        ("crop_recommendations", history_pipeline()),
+        ("crop_recommendations", latest_sessions_pipeline(["sensor"])),
+        ("location_analysis", latest_contexts_pipeline(["sensor"]))
+    ]
+
+def _winning_plans(explain: Any) -> Iterator[Dict[str, Any]]:
+    """Every winningPlan in an explain result; aggregations nest theirs in $cursor stages."""
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == "winningPlan":
+                yield value
+            elif key != "rejectedPlans":
+                yield from _winning_plans(value)
+    elif isinstance(explain, list):
+        for value in explain:
+            yield from _winning_plans(value)
+
+def _stages(plan: Any) -> Iterator[str]:
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+def _scans(explain: Dict[str, Any]) -> bool:
+    return any("COLLSCAN" in set(_stages(plan)) for plan in _winning_plans(explain))
+
+async def verify_query_plans(db) -> List[str]:
+    """Explain every query and pipeline shape; returns those whose winning plan scans a collection."""
+    shapes = []
+    for collection_name, query, sort in QUERY_SHAPES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        shapes.append((f"{collection_name} {query} sort={sort}", await cursor.explain()))
+    for collection_name, pipeline in pipeline_shapes():
+        explain = await db.command("aggregate", collection_name, pipeline=pipeline, explain=True)
+        shapes.append((f"{collection_name} aggregate {pipeline[0]}", explain))
+
+    scans = [shape for shape, explain in shapes if _scans(explain)]
+    for shape in scans:
+        logger.error(f"Query shape scans the collection: {shape}")
+    if not scans:
+        logger.info(f"All {len(shapes)} query shapes use an index")
+    return scans
+
+def shape_count() -> int:
+    return len(QUERY_SHAPES) + len(pipeline_shapes())
+
+async def _check() -> int:
+    from app.core.database import mongodb
+
+    await mongodb.connect()
+    try:
+        scans = await verify_query_plans(mongodb.get_database())
+    finally:
+        await mongodb.disconnect()
+    for shape in scans:
+        print(f"COLLSCAN: {shape}")
+    print(f"{shape_count() - len(scans)} of {shape_count()} query shapes use an index")
+    return 1 if scans else 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_check()))
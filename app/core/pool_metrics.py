@@ -0,0 +1,89 @@
+import threading
+from collections import deque
+from typing import Dict, Any
+from pymongo import monitoring
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool counters and checkout wait times from pymongo's CMAP events.
+
+    pymongo emits these from the threads motor runs it on, so updates are
+    taken under a lock.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.lock = threading.Lock()
+        # Checkout waits in ms, most recent `window` checkouts
+        self.waits = deque(maxlen=window)
+        self.stats = {
+            "checkouts": 0,
+            "checkout_failures": 0,
+            "checkout_timeouts": 0,
+            "connections_created": 0,
+            "connections_closed": 0,
+            "checked_out": 0,
+            "pool_clears": 0,
+            "max_wait_ms": 0.0
+        }
+
+    def _record_wait(self, duration: float):
+        wait_ms = duration * 1000
+        self.waits.append(wait_ms)
+        self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], wait_ms)
+
+    def connection_checked_out(self, event):
+        with self.lock:
+            self.stats["checkouts"] += 1
+            self.stats["checked_out"] += 1
+            self._record_wait(event.duration)
+
+    def connection_check_out_failed(self, event):
+        with self.lock:
+            self.stats["checkout_failures"] += 1
+            if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+                self.stats["checkout_timeouts"] += 1
+            self._record_wait(event.duration)
+
+    def connection_checked_in(self, event):
+        with self.lock:
+            self.stats["checked_out"] -= 1
+
+    def connection_created(self, event):
+        with self.lock:
+            self.stats["connections_created"] += 1
+
+    def connection_closed(self, event):
+        with self.lock:
+            self.stats["connections_closed"] += 1
+
+    def pool_cleared(self, event):
+        with self.lock:
+            self.stats["pool_clears"] += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            waits = sorted(self.waits)
+            stats = dict(self.stats)
+        return {
+            **stats,
+            "open_connections": stats["connections_created"] - stats["connections_closed"],
+            "max_wait_ms": round(stats["max_wait_ms"], 3),
+            "avg_wait_ms": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "p95_wait_ms": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0
+        }
+
+pool_metrics = PoolMetrics()
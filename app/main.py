@@ -1,7 +1,19 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.database import mongodb
-from app.routers import sensors, recommendations
+from app.core.deadline import deadline
+from app.core.config import REQUEST_TIMEOUT_SECONDS, REQUEST_TIMEOUT_MAX_SECONDS
+from app.services.gemini_service import gemini_client
+from app.services.wikipedia_service import wikipedia_client
+from app.services.thumbnail_cache import thumbnail_cache
+from app.services.image_store import image_store
+from app.services.llm_cache import llm_cache
+from app.services.single_flight import single_flight
+from app.services import background
+from app.services.job_queue import hardware_jobs
+from app.services.session_index import session_index
+from app.services.crop_catalog import crop_catalog
+from app.routers import sensors, recommendations, system, images
 
 app = FastAPI(
     title="PiliSeed API",
@@ -17,16 +29,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def request_deadline(request: Request, call_next):
+    timeout = REQUEST_TIMEOUT_SECONDS
+    requested = request.headers.get("X-Request-Timeout")
+    if requested:
+        try:
+            timeout = min(float(requested), REQUEST_TIMEOUT_MAX_SECONDS)
+        except ValueError:
+            pass
+    
+    with deadline(timeout):
+        return await call_next(request)
+
 @app.on_event("startup")
 async def startup_event():
-    await mongodb.connect()
+    # TTL indexes are created with the rest, later if MongoDB is not up yet
+    await mongodb.connect(on_ready=[
+        llm_cache.ensure_indexes,
+        single_flight.ensure_indexes,
+        thumbnail_cache.ensure_indexes
+    ])
+    await gemini_client.connect()
+    await wikipedia_client.connect()
+    await image_store.connect()
+    await session_index.load()
+    await crop_catalog.load()
+    await hardware_jobs.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await hardware_jobs.stop()
+    await background.drain(timeout=30)
+    await gemini_client.disconnect()
+    await wikipedia_client.disconnect()
+    await image_store.disconnect()
     await mongodb.disconnect()
 
 app.include_router(sensors.router)
 app.include_router(recommendations.router)
+app.include_router(system.router)
+app.include_router(images.router)
 
 @app.get("/")
 async def root():
@@ -35,6 +78,8 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "sensors": "/sensors",
-            "recommendations": "/recommendations"
+            "recommendations": "/recommendations",
+            "system": "/system",
+            "images": "/images"
         }
     }
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime
 
 class SensorData(BaseModel):
@@ -48,6 +48,43 @@ class ContextAnalysisResponse(BaseModel):
     agricultural_calendar: Dict[str, Any]
     risk_factors: Dict[str, Any]
 
+class LocationAnalysis(BaseModel):
+    province: str
+    region: str
+    climate_type: Literal["Type I", "Type II", "Type III", "Type IV"]
+    current_season: Literal["Dry", "Wet", "Transition"]
+    season_end_month: int
+
+class WeatherForecast(BaseModel):
+    current_month_rainfall_mm: float
+    next_3months_rainfall_mm: float
+    temperature_range_c: str
+    typhoon_risk: Literal["Low", "Moderate", "High"]
+    el_nino_la_nina: Literal["Normal", "El Niño", "La Niña"]
+
+class MarketConditions(BaseModel):
+    high_demand_crops: List[str]
+    price_trends: str
+    export_opportunities: List[str]
+    local_market_saturation: List[str]
+
+class AgriculturalCalendar(BaseModel):
+    optimal_planting_window: str
+    harvest_season_conflict: str
+    recommended_crop_cycles: List[str]
+
+class RiskFactors(BaseModel):
+    pest_disease_season: List[str]
+    water_availability: Literal["Abundant", "Moderate", "Scarce"]
+    soil_degradation_risk: Literal["Low", "Moderate", "High"]
+
+class ContextAnalysisOutput(BaseModel):
+    location_analysis: LocationAnalysis
+    weather_forecast: WeatherForecast
+    market_conditions: MarketConditions
+    agricultural_calendar: AgriculturalCalendar
+    risk_factors: RiskFactors
+
 class Score(BaseModel):
     overall_score: float
     confidence_pct: int
@@ -139,6 +176,16 @@ class CropRecommendation(BaseModel):
     risk_assessment: RiskAssessment
     reasoning: str
 
+class GeneratedCropRecommendation(CropRecommendation):
+    # Left null by the model for crops in the crop catalog, filled in from it
+    scientific_name: Optional[str] = None
+    growth_requirements: Optional[GrowthRequirements] = None
+    tolerances: Optional[Tolerances] = None
+    management: Optional[Management] = None
+
+class GeneratedRecommendationOutput(BaseModel):
+    recommendations: List[GeneratedCropRecommendation]
+
 class RecommendationResponse(BaseModel):
     id: str
     sensor_id: str
@@ -159,12 +206,65 @@ class AutoRecommendationResponse(BaseModel):
     sensor_id: str
     top_3_crops: List[str]
     total_crops_generated: int
+    generation_complete: bool = True
+    stale: bool = False
+    unchanged: bool = False
+    reused_session_id: Optional[str] = None
     message: str
 
+class HardwareBatchReading(BaseModel):
+    sensor_id: str
+    soil_moisture_pct: float
+    temperature_c: float
+    humidity_pct: float
+    light_lux: float
+
+class HardwareBatchRequest(BaseModel):
+    readings: List[HardwareBatchReading]
+
+class HardwareBatchResult(BaseModel):
+    success: bool
+    session_id: Optional[str] = None
+    top_3_crops: List[str] = []
+    total_crops_generated: int = 0
+    unchanged: bool = False
+    reused_session_id: Optional[str] = None
+    error: Optional[str] = None
+
+class HardwareBatchResponse(BaseModel):
+    total: int
+    succeeded: int
+    failed: int
+    results: Dict[str, HardwareBatchResult]
+
+class HardwareJobResponse(BaseModel):
+    job_id: str
+    sensor_id: str
+    status: str
+    status_url: str
+
+class HardwareJobStatus(BaseModel):
+    job_id: str
+    sensor_id: str
+    status: str
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    top_3_crops: Optional[List[str]] = None
+    result: Optional[AutoRecommendationResponse] = None
+    error: Optional[str] = None
+
 class FilterRecommendationRequest(BaseModel):
     session_id: str
     farmer: FarmerInput
     user_uid: Optional[str] = None
+    # Ask Gemini for a written explanation instead of filtering locally
+    explain: bool = False
+
+class FilterRecommendationOutput(BaseModel):
+    filter_explanation: str
+    recommendations: List[CropRecommendation]
 
 class FilterRecommendationResponse(BaseModel):
     id: str
@@ -173,3 +273,4 @@ class FilterRecommendationResponse(BaseModel):
     filter_explanation: str
     farmer_input: FarmerInput
     recommendations: List[CropRecommendation]
+    filtered_locally: bool = False
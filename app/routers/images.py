@@ -0,0 +1,39 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, RedirectResponse
+from app.core.config import IMAGE_STORE_DEFAULT_WIDTH, IMAGE_CACHE_MAX_AGE_SECONDS
+from app.services.crop_catalog import crop_catalog, normalize_crop_name
+from app.services.image_store import image_store, pick_variant, etag_matches
+from app.services.wikipedia_service import fetch_wikipedia_thumbnail
+
+router = APIRouter(prefix="/images", tags=["images"])
+
+@router.get("/{crop}")
+async def get_crop_image(crop: str, request: Request, w: int = Query(IMAGE_STORE_DEFAULT_WIDTH, ge=0)):
+    key = normalize_crop_name(crop)
+    variants = await image_store.get_variants(key)
+    
+    if not variants:
+        # Not stored yet: send the client to Wikimedia while it is downloaded.
+        # The path holds the lowercased key; look the page up under its real title
+        await crop_catalog.refresh()
+        title = image_store.title(key) or crop
+        source_url = await fetch_wikipedia_thumbnail(title)
+        if not source_url:
+            raise HTTPException(status_code=404, detail="No image found for this crop")
+        image_store.localize(title, source_url)
+        image_store.stats["redirects"] += 1
+        return RedirectResponse(source_url, status_code=307)
+    
+    variant = pick_variant(variants, w)
+    headers = {
+        "ETag": variant["etag"],
+        "Cache-Control": f"public, max-age={IMAGE_CACHE_MAX_AGE_SECONDS}"
+    }
+    
+    if etag_matches(request.headers.get("if-none-match"), variant["etag"]):
+        image_store.stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    
+    content = await image_store.read(variant)
+    image_store.stats["served"] += 1
+    return Response(content=content, media_type=variant["content_type"], headers=headers)
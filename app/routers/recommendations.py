@@ -1,9 +1,9 @@
 import json
 import logging
 import uuid
-import asyncio
-from datetime import datetime, timezone, timedelta
-from fastapi import APIRouter, HTTPException
+from typing import Dict, Any, List, Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse, JSONResponse
 from bson import ObjectId
 from app.models.schemas import (
     ContextAnalysisResponse,
@@ -13,13 +13,25 @@ from app.models.schemas import (
     HardwareSensorData,
     AutoRecommendationResponse,
     FilterRecommendationRequest,
-    FilterRecommendationResponse
+    FilterRecommendationResponse,
+    HardwareJobResponse,
+    HardwareJobStatus,
+    HardwareBatchRequest,
+    HardwareBatchResponse
 )
-from app.services.gemini_service import call_gemini
+from app.services.gemini_service import call_gemini, chat_gemini, stream_gemini
 from app.services.database_service import save_to_mongodb
-from app.services.wikipedia_service import fetch_wikipedia_thumbnail
-from app.services.prompts import CONTEXT_ANALYSIS_PROMPT, RECOMMENDATION_PROMPT, CHAT_PROMPT, HARDWARE_RECOMMENDATION_PROMPT, FILTER_RECOMMENDATION_PROMPT
-from app.core.config import DEFAULT_SENSOR_VALUES, START_MONTH
+from app.services.context_service import generate_context
+from app.services.rate_limiter import Priority
+from app.services.response_schemas import RECOMMENDATIONS_RESPONSE, FILTER_RESPONSE
+from app.services.prompt_builder import build_chat_prompt
+from app.services.crop_catalog import crop_catalog
+from app.services.crop_filter import crop_filter
+from app.services.hardware_service import process_hardware_readings, process_hardware_batch
+from app.services.job_queue import hardware_jobs
+from app.services.wikipedia_service import add_thumbnails
+from app.services.prompts import CONTEXT_ANALYSIS_PROMPT, RECOMMENDATION_PROMPT, FILTER_RECOMMENDATION_PROMPT
+from app.core.config import DEFAULT_SENSOR_VALUES, START_MONTH, HARDWARE_BATCH_MAX_SENSORS
 from app.core.database import mongodb
 
 logger = logging.getLogger(__name__)
@@ -28,6 +40,32 @@ router = APIRouter(prefix="/recommendations", tags=["recommendations"])
 def generate_user_uid():
     return str(uuid.uuid4())
 
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _chat_event_stream(chat_prompt: str, identity: Dict[str, Any]) -> StreamingResponse:
+    async def events():
+        try:
+            async for chunk in stream_gemini(chat_prompt):
+                if "text" in chunk:
+                    yield _sse_event("token", {"text": chunk["text"]})
+                else:
+                    yield _sse_event("done", {
+                        **identity,
+                        "usage": chunk["usage"],
+                        "finish_reason": chunk["finish_reason"]
+                    })
+            logger.info(f"Gemini API stream completed successfully")
+        except Exception as e:
+            logger.error(f"Chat stream error for {identity}: {str(e)}", exc_info=True)
+            yield _sse_event("error", {**identity, "detail": f"Chat failed: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/{sensor_id}/latest", response_model=RecommendationResponse)
 async def get_latest_recommendations(sensor_id: str):
     db = mongodb.get_database()
@@ -103,23 +141,21 @@ async def analyze_context(sensor_id: str, refresh: bool = False):
         )
         context_prompt = context_prompt.replace("{location}", location)
         
-        context_data = call_gemini(context_prompt)
-        
-        if refresh:
-            await context_collection.delete_many({"data.sensor_id": sensor_id})
-        
-        document_id = await save_to_mongodb("location_analysis", {
-            "sensor_id": sensor_id,
-            "sensor_name": sensor_doc["name"],
-            "input": input_payload,
-            "output": context_data
-        })
+        context = await generate_context(
+            sensor_id,
+            sensor_doc["name"],
+            input_payload,
+            context_prompt,
+            refresh=refresh
+        )
         
         return ContextAnalysisResponse(
-            id=document_id,
+            id=context["id"],
             sensor_id=sensor_id,
-            **context_data
+            **context["output"]
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Context analysis failed: {str(e)}")
 
@@ -162,14 +198,13 @@ async def generate_recommendations(request: RecommendationRequest):
             )
             context_prompt = context_prompt.replace("{location}", location)
             
-            context_data = call_gemini(context_prompt)
-            
-            await save_to_mongodb("location_analysis", {
-                "sensor_id": request.sensor_id,
-                "sensor_name": sensor_doc["name"],
-                "input": input_payload,
-                "output": context_data
-            })
+            context = await generate_context(
+                request.sensor_id,
+                sensor_doc["name"],
+                input_payload,
+                context_prompt
+            )
+            context_data = context["output"]
         
         recommendation_prompt = RECOMMENDATION_PROMPT.replace(
             "{context_data}", 
@@ -183,8 +218,13 @@ async def generate_recommendations(request: RecommendationRequest):
             "{start_month}", 
             str(START_MONTH)
         )
+        await crop_catalog.refresh()
+        recommendation_prompt = recommendation_prompt.replace(
+            "{catalogued_crops}",
+            crop_catalog.prompt_names()
+        )
         
-        ai_response = call_gemini(recommendation_prompt)
+        ai_response = await call_gemini(recommendation_prompt, response=RECOMMENDATIONS_RESPONSE)
         
         if isinstance(ai_response, dict) and "recommendations" in ai_response:
             output = ai_response
@@ -197,11 +237,10 @@ async def generate_recommendations(request: RecommendationRequest):
                 recs = []
             output = {"recommendations": recs}
         
-        for recommendation in output.get("recommendations", []):
-            searchable_name = recommendation.get("searchable_name")
-            if searchable_name:
-                image_url = await fetch_wikipedia_thumbnail(searchable_name)
-                recommendation["image_url"] = image_url
+        output["recommendations"] = crop_catalog.complete(output.get("recommendations", []))
+        await crop_catalog.update_from(output["recommendations"])
+        
+        await add_thumbnails(output.get("recommendations", []))
         
         document_id = await save_to_mongodb("crop_recommendations", {
             "sensor_id": request.sensor_id,
@@ -216,6 +255,8 @@ async def generate_recommendations(request: RecommendationRequest):
             sensor_id=request.sensor_id,
             recommendations=output["recommendations"]
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Recommendation generation failed: {str(e)}")
 
@@ -307,6 +348,31 @@ async def toggle_crop_planted(recommendation_id: str, crop_index: int, planted:
         "planted": planted
     }
 
+def history_pipeline(sensor_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Session summaries, newest first, without transferring the crops or context.
+
+    All sessions, or only those of `sensor_id`.
+    """
+    recommendations = {"$ifNull": ["$data.output.recommendations", []]}
+    return [
+        {"$match": {"data.sensor_id": sensor_id} if sensor_id is not None else {}},
+        {"$sort": {"timestamp": -1}},
+        {"$project": {
+            "_id": 1,
+            "timestamp": 1,
+            "sensor_id": "$data.sensor_id",
+            "sensor_name": "$data.sensor_name",
+            "location": "$data.input.location",
+            "farmer_input": "$data.input.farmer",
+            "total_crops": {"$size": recommendations},
+            "planted_count": {"$size": {"$filter": {
+                "input": recommendations,
+                "as": "crop",
+                "cond": {"$eq": ["$$crop.planted", True]}
+            }}}
+        }}
+    ]
+
 @router.get("/{sensor_id}/history")
 async def get_recommendation_history(sensor_id: str):
     db = mongodb.get_database()
@@ -316,44 +382,31 @@ async def get_recommendation_history(sensor_id: str):
     # Get sensor info for fallback
     sensor_info = None
     try:
-        sensor_info = await sensors_collection.find_one({"_id": ObjectId(sensor_id)})
+        sensor_info = await sensors_collection.find_one({"_id": ObjectId(sensor_id)}, {"name": 1})
     except:
         pass
     
     fallback_sensor_name = sensor_info.get("name", "Unknown") if sensor_info else "Unknown"
     
     try:
-        history_cursor = recommendations_collection.find(
-            {"data.sensor_id": sensor_id}
-        ).sort("timestamp", -1)
-        
         history = []
-        async for doc in history_cursor:
-            data = doc.get("data", {})
-            output = data.get("output", {})
-            recommendations = output.get("recommendations", [])
-            input_data = data.get("input", {})
-            
-            planted_count = sum(1 for rec in recommendations if rec.get("planted", False))
-            
+        async for doc in recommendations_collection.aggregate(history_pipeline(sensor_id)):
             # Extract location - handle both string and object formats
-            location = input_data.get("location", "Unknown Location")
+            location = doc.get("location", "Unknown Location")
             if isinstance(location, dict):
                 # Use location_string (e.g., "Quezon City") not location_name (e.g., "Sensor 1")
                 location = location.get("location_string") or location.get("location_name") or "Unknown Location"
             
-            # Get sensor_name from data, fallback to sensor_info
-            sensor_name = data.get("sensor_name", fallback_sensor_name)
-            
             history.append({
                 "id": str(doc["_id"]),
                 "timestamp": doc["timestamp"],
-                "sensor_id": data.get("sensor_id", sensor_id),
-                "sensor_name": sensor_name,
+                "sensor_id": doc.get("sensor_id", sensor_id),
+                # Get sensor_name from data, fallback to sensor_info
+                "sensor_name": doc.get("sensor_name", fallback_sensor_name),
                 "location": location,
-                "total_crops": len(recommendations),
-                "planted_count": planted_count,
-                "farmer_input": input_data.get("farmer", {})
+                "total_crops": doc["total_crops"],
+                "planted_count": doc["planted_count"],
+                "farmer_input": doc.get("farmer_input", {})
             })
         
         return {"history": history}
@@ -367,34 +420,29 @@ async def get_all_recommendation_history():
     sensors_collection = db["sensor_locations"]
     
     try:
-        history_cursor = recommendations_collection.find({}).sort("timestamp", -1)
+        docs = [doc async for doc in recommendations_collection.aggregate(history_pipeline())]
+        
+        # One lookup for every sensor in the history instead of one per session
+        sensor_ids = set()
+        for doc in docs:
+            if ObjectId.is_valid(doc.get("sensor_id") or ""):
+                sensor_ids.add(ObjectId(doc["sensor_id"]))
+        locations = {}
+        async for sensor_doc in sensors_collection.find({"_id": {"$in": list(sensor_ids)}}, {"location": 1}):
+            locations[str(sensor_doc["_id"])] = sensor_doc.get("location", "Unknown")
         
         history = []
-        async for doc in history_cursor:
-            sensor_id = doc.get("data", {}).get("sensor_id")
-            output = doc.get("data", {}).get("output", {})
-            recommendations = output.get("recommendations", [])
-            
-            sensor_doc = None
-            if sensor_id:
-                try:
-                    sensor_doc = await sensors_collection.find_one({"_id": ObjectId(sensor_id)})
-                except:
-                    pass
-            
-            location = sensor_doc.get("location", "Unknown") if sensor_doc else "Unknown"
-            
-            planted_count = sum(1 for rec in recommendations if rec.get("planted", False))
-            
+        for doc in docs:
+            sensor_id = doc.get("sensor_id")
             history.append({
                 "id": str(doc["_id"]),
                 "timestamp": doc["timestamp"],
                 "sensor_id": sensor_id,
-                "sensor_name": doc.get("data", {}).get("sensor_name", "Unknown"),
-                "location": location,
-                "total_crops": len(recommendations),
-                "planted_count": planted_count,
-                "farmer_input": doc.get("data", {}).get("input", {}).get("farmer", {})
+                "sensor_name": doc.get("sensor_name", "Unknown"),
+                "location": locations.get(sensor_id, "Unknown"),
+                "total_crops": doc["total_crops"],
+                "planted_count": doc["planted_count"],
+                "farmer_input": doc.get("farmer_input", {})
             })
         
         return {"history": history}
@@ -484,7 +532,7 @@ async def get_session_context(recommendation_id: str):
     }
 
 @router.post("/{sensor_id}/chat")
-async def chat_with_ai(sensor_id: str, message: dict):
+async def chat_with_ai(sensor_id: str, message: dict, stream: bool = False):
     db = mongodb.get_database()
     recommendations_collection = db["crop_recommendations"]
     
@@ -528,49 +576,20 @@ async def chat_with_ai(sensor_id: str, message: dict):
                 "sensor_id": sensor_id
             }
         
-        chat_prompt = CHAT_PROMPT.format(
-            user_message=user_message,
-            sensor_id=sensor_id,
-            location=input_data.get('location', 'Unknown'),
-            crop_category=input_data.get('crop_category', 'N/A'),
-            budget=f"{input_data.get('budget_php', 0):,.2f}",
-            land_size=input_data.get('land_size_ha', 0),
-            manpower=input_data.get('manpower', 0),
-            waiting_tolerance=input_data.get('waiting_tolerance_days', 0),
-            context_data=json.dumps(context_data, indent=2),
-            recommendations=json.dumps(recommendations, indent=2)
+        chat_prompt = build_chat_prompt(
+            user_message,
+            sensor_id,
+            input_data,
+            context_data,
+            recommendations
         )
         
         logger.info(f"Calling Gemini API for chat with sensor {sensor_id}")
         
-        import requests
-        from app.core.config import GEMINI_API_KEY, GEMINI_MODEL
-        
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent"
-        headers = {"Content-Type": "application/json"}
-        payload = {
-            "contents": [{
-                "parts": [{
-                    "text": chat_prompt
-                }]
-            }],
-            "generationConfig": {
-                "temperature": 0.7,
-                "topK": 40,
-                "topP": 0.95,
-                "maxOutputTokens": 2048,
-            }
-        }
-        
-        api_url = f"{url}?key={GEMINI_API_KEY}"
-        response = requests.post(api_url, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
+        if stream:
+            return _chat_event_stream(chat_prompt, {"sensor_id": sensor_id})
         
-        data = response.json()
-        if "candidates" not in data or not data["candidates"]:
-            raise ValueError("No response from AI")
-        
-        response_text = data["candidates"][0]["content"]["parts"][0]["text"]
+        response_text = await chat_gemini(chat_prompt)
         logger.info(f"Gemini API response received successfully")
         
         return {
@@ -586,7 +605,7 @@ async def chat_with_ai(sensor_id: str, message: dict):
         raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
 
 @router.post("/session/{session_id}/chat")
-async def chat_with_session(session_id: str, message: dict):
+async def chat_with_session(session_id: str, message: dict, stream: bool = False):
     db = mongodb.get_database()
     recommendations_collection = db["crop_recommendations"]
     
@@ -618,52 +637,21 @@ async def chat_with_session(session_id: str, message: dict):
                 "message": "This session has no recommendations. Please use a session with crop recommendations."
             }
         
-        # Use context_data if available, otherwise use minimal context
-        context_str = json.dumps(context_data, indent=2) if context_data else "No detailed context available"
-        
-        chat_prompt = CHAT_PROMPT.format(
-            user_message=user_message,
-            sensor_id=input_data.get('sensor_id', recommendation_data.get('sensor_id', 'Historical Session')),
-            location=input_data.get('location', 'Unknown'),
-            crop_category=input_data.get('crop_category', 'N/A'),
-            budget=f"{input_data.get('budget_php', 0):,.2f}",
-            land_size=input_data.get('land_size_ha', 0),
-            manpower=input_data.get('manpower', 0),
-            waiting_tolerance=input_data.get('waiting_tolerance_days', 0),
-            context_data=context_str,
-            recommendations=json.dumps(recommendations, indent=2)
+        chat_prompt = build_chat_prompt(
+            user_message,
+            input_data.get('sensor_id', recommendation_data.get('sensor_id', 'Historical Session')),
+            input_data,
+            # Use context_data if available, otherwise use minimal context
+            context_data or "No detailed context available",
+            recommendations
         )
         
         logger.info(f"Calling Gemini API for chat with session {session_id}")
         
-        import requests
-        from app.core.config import GEMINI_API_KEY, GEMINI_MODEL
-        
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent"
-        headers = {"Content-Type": "application/json"}
-        payload = {
-            "contents": [{
-                "parts": [{
-                    "text": chat_prompt
-                }]
-            }],
-            "generationConfig": {
-                "temperature": 0.7,
-                "topK": 40,
-                "topP": 0.95,
-                "maxOutputTokens": 2048,
-            }
-        }
-        
-        api_url = f"{url}?key={GEMINI_API_KEY}"
-        response = requests.post(api_url, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
+        if stream:
+            return _chat_event_stream(chat_prompt, {"session_id": session_id})
         
-        data = response.json()
-        if "candidates" not in data or not data["candidates"]:
-            raise ValueError("No response from AI")
-        
-        response_text = data["candidates"][0]["content"]["parts"][0]["text"]
+        response_text = await chat_gemini(chat_prompt)
         logger.info(f"Gemini API response received successfully")
         
         return {
@@ -678,206 +666,83 @@ async def chat_with_session(session_id: str, message: dict):
         logger.error(f"Chat error for session {session_id}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
 
-@router.post("/hardware/{sensor_id}/readings", response_model=AutoRecommendationResponse)
-async def auto_generate_recommendations(sensor_id: str, sensor_data: HardwareSensorData):
+@router.post(
+    "/hardware/{sensor_id}/readings",
+    response_model=AutoRecommendationResponse,
+    responses={202: {"model": HardwareJobResponse}}
+)
+async def auto_generate_recommendations(
+    sensor_id: str,
+    sensor_data: HardwareSensorData,
+    async_mode: bool = Query(False, alias="async")
+):
+    if not async_mode:
+        return await process_hardware_readings(sensor_id, sensor_data)
     
+    db = mongodb.get_database()
     try:
-        db = mongodb.get_database()
-        sensors_collection = db["sensor_locations"]
-        recommendations_collection = db["crop_recommendations"]
-        
-        try:
-            sensor_location = await sensors_collection.find_one({"_id": ObjectId(sensor_id)})
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Invalid sensor_id format: {str(e)}")
-        
-        if not sensor_location:
-            raise HTTPException(status_code=404, detail=f"Sensor {sensor_id} not found")
-        
-        location_string = sensor_location.get("location", "Unknown")
-        location_info = {
-            "location_name": sensor_location.get("name", "Unknown"),
-            "location_string": location_string
-        }
-        
-        # Check if this is a "Load More" request (has already_generated crops)
-        is_load_more = sensor_data.already_generated and len(sensor_data.already_generated) > 0
-        
-        if is_load_more:
-            # LOAD MORE: Get existing session data to reuse context
-            logger.info(f"Load More request for sensor {sensor_id} - reusing existing session data")
-            
-            existing_session = await recommendations_collection.find_one(
-                {"data.sensor_id": sensor_id},
-                sort=[("timestamp", -1)]
-            )
-            
-            if not existing_session or "data" not in existing_session:
-                raise HTTPException(status_code=404, detail="No existing session found for Load More")
-            
-            # Reuse existing context and sensor data from the session
-            session_data = existing_session["data"]
-            context_data = session_data.get("context")
-            stored_sensor_data = session_data.get("input", {}).get("sensor_data", {})
-            
-            logger.info(f"Reusing context and sensor data from existing session")
-            
-            # Format the already_generated list
-            crops_list = "\n".join([f"- {crop}" for crop in sensor_data.already_generated])
-            logger.info(f"Excluding {len(sensor_data.already_generated)} already generated crops")
-            
-            recommendation_input = {
-                "sensor_data": stored_sensor_data,
-                "location": location_info,
-                "sensor_id": sensor_id
-            }
-            
-        else:
-            # INITIAL REQUEST: Generate context first
-            logger.info(f"Initial request for sensor {sensor_id} - generating context")
-            
-            context_collection = db["location_analysis"]
-            
-            # Try to reuse existing context if available
-            existing_context = await context_collection.find_one(
-                {"data.sensor_id": sensor_id},
-                sort=[("timestamp", -1)]
-            )
-            
-            if existing_context and "data" in existing_context:
-                context_data = existing_context["data"].get("output")
-                logger.info(f"Reusing existing context analysis")
-            else:
-                logger.info(f"Generating new context analysis")
-                
-                context_input = {
-                    "location": location_info,
-                    "sensor_data": {
-                        "soil_moisture_pct": sensor_data.soil_moisture_pct,
-                        "temperature_c": sensor_data.temperature_c,
-                        "humidity_pct": sensor_data.humidity_pct,
-                        "light_lux": sensor_data.light_lux
-                    },
-                    "start_month": START_MONTH
-                }
-                
-                context_prompt = CONTEXT_ANALYSIS_PROMPT.format(
-                    input_payload=json.dumps(context_input, indent=2),
-                    location=location_string
-                )
-                
-                context_response = call_gemini(context_prompt)
-                context_data = context_response
-                
-                # Store the context
-                await save_to_mongodb("location_analysis", {
-                    "sensor_id": sensor_id,
-                    "sensor_name": sensor_location.get("name", "Unknown"),
-                    "input": context_input,
-                    "output": context_data
-                })
-                
-                # Wait before next API call
-                logger.info("Waiting 3 seconds before generating recommendations...")
-                await asyncio.sleep(3)
-            
-            crops_list = "None yet (this is the first batch)"
-            
-            recommendation_input = {
-                "sensor_data": {
-                    "soil_moisture_pct": sensor_data.soil_moisture_pct,
-                    "temperature_c": sensor_data.temperature_c,
-                    "humidity_pct": sensor_data.humidity_pct,
-                    "light_lux": sensor_data.light_lux
-                },
-                "location": location_info,
-                "sensor_id": sensor_id
-            }
-        
-        # Generate recommendations (both initial and load more use same prompt)
-        logger.info(f"Generating 8 crop recommendations")
-        
-        recommendation_prompt = HARDWARE_RECOMMENDATION_PROMPT.format(
-            context_data=json.dumps(context_data, indent=2),
-            input_payload=json.dumps(recommendation_input, indent=2),
-            start_month=START_MONTH,
-            already_generated=crops_list
-        )
-        
-        recommendations_response = call_gemini(recommendation_prompt)
-        recommendations_json = recommendations_response  # Already a dict from call_gemini
-        new_recommendations = recommendations_json.get("recommendations", [])
-        
-        if len(new_recommendations) != 8:
-            logger.warning(f"Expected 8 recommendations but got {len(new_recommendations)}")
-        
-        for i, rec in enumerate(new_recommendations):
-            rec["is_top_3"] = (i < 3)
-            
-            searchable_name = rec.get("searchable_name", rec.get("crop"))
-            if searchable_name:
-                try:
-                    thumbnail_url = await fetch_wikipedia_thumbnail(searchable_name)
-                    rec["image_url"] = thumbnail_url
-                except Exception as img_error:
-                    logger.error(f"Failed to fetch image for {searchable_name}: {str(img_error)}")
-                    rec["image_url"] = None
-        
-        # Store or update recommendations
-        if is_load_more:
-            # LOAD MORE: Append new crops to existing session
-            logger.info(f"Appending {len(new_recommendations)} new crops to existing session")
-            
-            existing_recommendations = existing_session["data"]["output"].get("recommendations", [])
-            all_recommendations = existing_recommendations + new_recommendations
-            
-            # Update the existing session document
-            await recommendations_collection.update_one(
-                {"_id": existing_session["_id"]},
-                {"$set": {
-                    "data.output.recommendations": all_recommendations,
-                    "timestamp": datetime.now(timezone(timedelta(hours=8)))
-                }}
-            )
-            
-            logger.info(f"Session updated: {len(existing_recommendations)} + {len(new_recommendations)} = {len(all_recommendations)} total crops")
-            
-        else:
-            # INITIAL: Create new session
-            logger.info(f"Creating new session with {len(new_recommendations)} crops")
-            
-            storage_data = {
-                "sensor_id": sensor_id,
-                "input": {
-                    "sensor_data": sensor_data.dict(exclude={'already_generated'}),
-                    "location": location_info
-                },
-                "context": context_data,
-                "output": {
-                    "recommendations": new_recommendations
-                }
-            }
-            
-            await save_to_mongodb("crop_recommendations", storage_data)
-        
-        top_3_crops = [rec["crop"] for rec in new_recommendations[:3]]
-        
-        return AutoRecommendationResponse(
-            success=True,
-            sensor_id=sensor_id,
-            top_3_crops=top_3_crops,
-            total_crops_generated=len(new_recommendations),
-            message=f"Successfully generated {len(new_recommendations)} recommendations. Top 3 crops returned."
+        sensor_location = await db["sensor_locations"].find_one({"_id": ObjectId(sensor_id)})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid sensor_id format: {str(e)}")
+    
+    if not sensor_location:
+        raise HTTPException(status_code=404, detail=f"Sensor {sensor_id} not found")
+    
+    try:
+        job_id = await hardware_jobs.enqueue(sensor_id, sensor_data)
+    except Exception as e:
+        logger.error(f"Failed to enqueue hardware job for sensor {sensor_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to enqueue job: {str(e)}")
+    
+    status_url = f"/recommendations/jobs/{job_id}"
+    response = HardwareJobResponse(
+        job_id=job_id,
+        sensor_id=sensor_id,
+        status="queued",
+        status_url=status_url
+    )
+    return JSONResponse(status_code=202, content=response.model_dump(), headers={"Location": status_url})
+
+@router.post("/hardware/batch", response_model=HardwareBatchResponse)
+async def batch_generate_recommendations(request: HardwareBatchRequest):
+    if not request.readings:
+        raise HTTPException(status_code=400, detail="At least one reading is required")
+    
+    if len(request.readings) > HARDWARE_BATCH_MAX_SENSORS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: {len(request.readings)} readings (max {HARDWARE_BATCH_MAX_SENSORS})"
         )
-        
-    except HTTPException:
-        raise
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON parsing error for hardware sensor {sensor_id}: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Failed to parse AI response: {str(e)}")
+    
+    try:
+        return await process_hardware_batch(request.readings)
     except Exception as e:
-        logger.error(f"Auto-recommendation error for hardware sensor {sensor_id}: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Failed to generate recommendations: {str(e)}")
+        logger.error(f"Batch recommendation error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to process batch: {str(e)}")
+
+@router.get("/jobs/{job_id}", response_model=HardwareJobStatus)
+async def get_hardware_job(job_id: str):
+    try:
+        job = await hardware_jobs.get(job_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid job_id format")
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    result = job.get("result")
+    return HardwareJobStatus(
+        job_id=str(job["_id"]),
+        sensor_id=job["sensor_id"],
+        status=job["status"],
+        attempts=job.get("attempts", 0),
+        created_at=job["created_at"],
+        started_at=job.get("started_at"),
+        finished_at=job.get("finished_at"),
+        top_3_crops=result.get("top_3_crops") if result else None,
+        result=result,
+        error=job.get("error")
+    )
 
 @router.post("/session/{recommendation_id}/filter", response_model=FilterRecommendationResponse)
 async def filter_recommendations(recommendation_id: str, request: FilterRecommendationRequest):
@@ -908,33 +773,45 @@ async def filter_recommendations(recommendation_id: str, request: FilterRecommen
     if not available_crops:
         raise HTTPException(status_code=404, detail="No valid crop names found")
     
-    context_data = recommendation_doc.get("data", {}).get("context_data") or recommendation_doc.get("data", {}).get("context", {})
-    
-    if not context_data:
-        sensor_id = recommendation_doc.get("data", {}).get("sensor_id")
-        if sensor_id:
-            existing_context = await context_collection.find_one(
-                {"data.sensor_id": sensor_id},
-                sort=[("timestamp", -1)]
-            )
-            if existing_context and "data" in existing_context:
-                context_data = existing_context["data"].get("output", {})
-    
     farmer_input = request.farmer.dict()
+    session_input = recommendation_doc.get("data", {}).get("input") or {}
     
-    filter_input = {
-        "available_crops": available_crops,
-        "context_data": json.dumps(context_data) if context_data else "{}",
-        "farmer_input": json.dumps(farmer_input)
-    }
+    recommendations, rejected = crop_filter.apply(original_recommendations, farmer_input, session_input)
+    filtered_locally = not crop_filter.needs_model(recommendations, request.explain)
     
     try:
-        prompt = FILTER_RECOMMENDATION_PROMPT.format(**filter_input)
-        filter_response = call_gemini(prompt)
-        
-        filter_json = filter_response
-        filter_explanation = filter_json.get("filter_explanation", "Filtered based on your preferences.")
-        recommendations = filter_json.get("recommendations", [])
+        if filtered_locally:
+            filter_explanation = crop_filter.explanation(farmer_input, rejected)
+        else:
+            context_data = recommendation_doc.get("data", {}).get("context_data") or recommendation_doc.get("data", {}).get("context", {})
+            
+            if not context_data:
+                sensor_id = recommendation_doc.get("data", {}).get("sensor_id")
+                if sensor_id:
+                    existing_context = await context_collection.find_one(
+                        {"data.sensor_id": sensor_id},
+                        sort=[("timestamp", -1)]
+                    )
+                    if existing_context and "data" in existing_context:
+                        context_data = existing_context["data"].get("output", {})
+            
+            # Enough crops passed locally: the model only explains and ranks those
+            candidate_crops = available_crops
+            if crop_filter.enabled and len(recommendations) >= crop_filter.min_matches:
+                candidate_crops = [rec["crop"] for rec in recommendations]
+            
+            filter_input = {
+                "available_crops": candidate_crops,
+                "context_data": json.dumps(context_data) if context_data else "{}",
+                "farmer_input": json.dumps(farmer_input)
+            }
+            
+            prompt = FILTER_RECOMMENDATION_PROMPT.format(**filter_input)
+            filter_response = await call_gemini(prompt, priority=Priority.FILTER, response=FILTER_RESPONSE)
+            
+            filter_json = filter_response
+            filter_explanation = filter_json.get("filter_explanation", "Filtered based on your preferences.")
+            recommendations = filter_json.get("recommendations", [])
         
         if not recommendations:
             raise HTTPException(status_code=404, detail="No crops matched your criteria")
@@ -942,16 +819,8 @@ async def filter_recommendations(recommendation_id: str, request: FilterRecommen
         if len(recommendations) > 5:
             recommendations = recommendations[:5]
         
-        # Fetch images for filtered crops
-        for rec in recommendations:
-            searchable_name = rec.get("searchable_name", rec.get("crop"))
-            if searchable_name:
-                try:
-                    thumbnail_url = await fetch_wikipedia_thumbnail(searchable_name)
-                    rec["image_url"] = thumbnail_url
-                except Exception as img_error:
-                    logger.error(f"Failed to fetch image for {searchable_name}: {str(img_error)}")
-                    rec["image_url"] = None
+        # Locally filtered crops keep the session's images
+        await add_thumbnails(recommendations, only_missing=True)
         
         storage_data = {
             "session_id": recommendation_id,
@@ -959,6 +828,7 @@ async def filter_recommendations(recommendation_id: str, request: FilterRecommen
             "farmer_input": farmer_input,
             "filter_explanation": filter_explanation,
             "available_crops": available_crops,
+            "filtered_locally": filtered_locally,
             "output": {
                 "recommendations": recommendations
             }
@@ -972,7 +842,8 @@ async def filter_recommendations(recommendation_id: str, request: FilterRecommen
             user_uid=user_uid,
             filter_explanation=filter_explanation,
             farmer_input=request.farmer,
-            recommendations=recommendations
+            recommendations=recommendations,
+            filtered_locally=filtered_locally
         )
         
     except HTTPException:
@@ -0,0 +1,50 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.core.database import mongodb
+from app.services.llm_cache import llm_cache
+from app.services.single_flight import single_flight
+from app.services.rate_limiter import gemini_scheduler
+from app.services.gemini_service import generation_stats, gemini_breaker
+from app.services import background
+from app.services.job_queue import hardware_jobs
+from app.services.hardware_service import repair_stats
+from app.services.session_index import session_index
+from app.services.change_detection import change_detector
+from app.services.crop_catalog import crop_catalog
+from app.services.crop_ranker import crop_ranker
+from app.services.crop_filter import crop_filter
+from app.services.wikipedia_service import wikipedia_client
+from app.services.thumbnail_cache import thumbnail_cache
+from app.services.image_store import image_store
+
+router = APIRouter(prefix="/system", tags=["system"])
+
+@router.get("/stats")
+async def get_service_stats():
+    return {
+        "llm_cache": llm_cache.get_stats(),
+        "single_flight": single_flight.get_stats(),
+        "gemini_scheduler": gemini_scheduler.get_stats(),
+        "gemini_generation": generation_stats.get_stats(),
+        "gemini_breaker": gemini_breaker.get_stats(),
+        "hardware_jobs": hardware_jobs.get_stats(),
+        "crop_repair": repair_stats,
+        "session_reuse": session_index.get_stats(),
+        "change_detection": change_detector.get_stats(),
+        "crop_catalog": crop_catalog.get_stats(),
+        "crop_ranker": crop_ranker.get_stats(),
+        "crop_filter": crop_filter.get_stats(),
+        "wikipedia": wikipedia_client.get_stats(),
+        "thumbnail_cache": thumbnail_cache.get_stats(),
+        "image_store": image_store.get_stats(),
+        "mongodb_pool": mongodb.get_stats(),
+        "background_tasks": background.pending_count()
+    }
+
+@router.get("/ready")
+async def readiness():
+    try:
+        ping_ms = await mongodb.ping()
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "detail": f"MongoDB: {str(e)}"})
+    return {"status": "ready", "mongodb_ping_ms": round(ping_ms, 2)}
@@ -0,0 +1,30 @@
+import asyncio
+import contextvars
+import logging
+from typing import Set, Coroutine, Any
+
+logger = logging.getLogger(__name__)
+
+_tasks: Set[asyncio.Task] = set()
+
+def spawn(coro: Coroutine[Any, Any, Any], name: str = None) -> asyncio.Task:
+    """Run work that outlives the request, keeping a reference until it finishes.
+
+    The task starts from an empty context so the request deadline does not apply.
+    """
+    task = asyncio.create_task(coro, name=name, context=contextvars.Context())
+    _tasks.add(task)
+    task.add_done_callback(_finished)
+    return task
+
+def _finished(task: asyncio.Task):
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        logger.error(f"Background task {task.get_name()} failed", exc_info=task.exception())
+
+def pending_count() -> int:
+    return len(_tasks)
+
+async def drain(timeout: float):
+    if _tasks:
+        await asyncio.wait(set(_tasks), timeout=timeout)
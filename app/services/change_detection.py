@@ -0,0 +1,83 @@
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+from app.core.config import SENSOR_CHANGE_DETECTION_ENABLED, SENSOR_CHANGE_BANDS, SENSOR_REGENERATE_MIN_INTERVAL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class ChangeDetector:
+    """Decides whether a sensor's new reading warrants a new generation.
+
+    Readings are compared with the sensor_data of the sensor's last session,
+    not with the previous post, so slow drift still triggers a regeneration
+    once it leaves the band. Regeneration also waits at least
+    `min_interval_seconds` after the last session, however far the readings moved.
+    """
+
+    def __init__(self, bands: Dict[str, float], min_interval_seconds: float, enabled: bool = True):
+        self.enabled = enabled
+        self.bands = bands
+        self.min_interval_seconds = min_interval_seconds
+        self.stats = {
+            "readings": 0,
+            "generations": 0,
+            "avoided_in_band": 0,
+            "avoided_too_soon": 0
+        }
+
+    def changed_metrics(self, previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, float]:
+        changed = {}
+        for metric, band in self.bands.items():
+            if metric not in previous or metric not in current:
+                changed[metric] = float("inf")
+                continue
+            delta = abs(float(current[metric]) - float(previous[metric]))
+            if delta > band:
+                changed[metric] = delta
+        return changed
+
+    def should_regenerate(
+        self,
+        sensor_id: str,
+        current: Dict[str, Any],
+        previous: Optional[Dict[str, Any]],
+        previous_at: Optional[datetime]
+    ) -> bool:
+        self.stats["readings"] += 1
+        if not self.enabled or previous is None or previous_at is None:
+            self.stats["generations"] += 1
+            return True
+
+        if previous_at.tzinfo is None:
+            # pymongo returns naive UTC datetimes
+            previous_at = previous_at.replace(tzinfo=timezone.utc)
+        age = time.time() - previous_at.timestamp()
+
+        changed = self.changed_metrics(previous, current)
+        if not changed:
+            self.stats["avoided_in_band"] += 1
+            logger.info(f"Readings for sensor {sensor_id} within thresholds of its last session, not regenerating")
+            return False
+        if age < self.min_interval_seconds:
+            self.stats["avoided_too_soon"] += 1
+            logger.info(f"Sensor {sensor_id} changed ({', '.join(changed)}) but its last session is only {age:.0f}s old, not regenerating")
+            return False
+
+        self.stats["generations"] += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        avoided = self.stats["avoided_in_band"] + self.stats["avoided_too_soon"]
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "generations_avoided": avoided,
+            "avoided_rate": round(avoided / self.stats["readings"], 3) if self.stats["readings"] else 0.0
+        }
+
+change_detector = ChangeDetector(
+    SENSOR_CHANGE_BANDS,
+    SENSOR_REGENERATE_MIN_INTERVAL_SECONDS,
+    enabled=SENSOR_CHANGE_DETECTION_ENABLED
+)
@@ -0,0 +1,114 @@
+import time
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any, Callable
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(HTTPException):
+    def __init__(self, name: str, retry_after: float):
+        # Half-open rejections have nothing left to wait for but the probe
+        seconds = max(1, round(retry_after))
+        super().__init__(
+            status_code=503,
+            detail=f"{name} is unavailable, retry in {seconds}s",
+            headers={"Retry-After": str(seconds)}
+        )
+
+class CircuitBreaker:
+    """Fails calls fast after repeated failures of a dependency.
+
+    Opens after `failure_threshold` consecutive failures. After
+    `reset_seconds` a single probe call is let through (half-open): success
+    closes the circuit, failure opens it again. `is_failure` decides which
+    exceptions count; others neither open nor close it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float, is_failure: Callable[[Exception], bool]):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.is_failure = is_failure
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.stats = {
+            "opened": 0,
+            "rejected": 0,
+            "failures": 0
+        }
+
+    @property
+    def is_open(self) -> bool:
+        return self.state != CLOSED
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_seconds - time.monotonic())
+
+    def check(self):
+        """Raise CircuitOpenError if a call now would be rejected, without claiming the probe."""
+        if self.state == OPEN and self.retry_after() > 0:
+            self.stats["rejected"] += 1
+            raise CircuitOpenError(self.name, self.retry_after())
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError if the call is rejected; returns whether it is the probe."""
+        if self.state == CLOSED:
+            return False
+        if self.state == OPEN and self.retry_after() <= 0:
+            logger.info(f"{self.name} circuit half-open, sending a probe call")
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        self.stats["rejected"] += 1
+        raise CircuitOpenError(self.name, self.retry_after())
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info(f"{self.name} circuit closed")
+        self.state = CLOSED
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.stats["failures"] += 1
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+            logger.warning(
+                f"{self.name} circuit opened after {self.consecutive_failures} consecutive failures, "
+                f"failing fast for {self.reset_seconds}s"
+            )
+            self.stats["opened"] += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    @contextmanager
+    def guard(self):
+        probe = self.before_call()
+        try:
+            yield
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            raise
+        else:
+            self.record_success()
+        finally:
+            # Only the probe releases the slot; calls already in flight when it opened must not
+            if probe:
+                self.probe_in_flight = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_after_seconds": round(self.retry_after(), 1) if self.state == OPEN else 0.0
+        }
@@ -0,0 +1,55 @@
+from typing import Dict, Any, Optional
+from app.core.database import mongodb
+from app.services.gemini_service import call_gemini
+from app.services.database_service import save_to_mongodb
+from app.services.single_flight import single_flight
+from app.services.rate_limiter import Priority
+from app.services.response_schemas import CONTEXT_RESPONSE
+
+async def find_latest_context(sensor_id: str) -> Optional[Dict[str, Any]]:
+    db = mongodb.get_database()
+    return await db["location_analysis"].find_one(
+        {"data.sensor_id": sensor_id},
+        sort=[("timestamp", -1)]
+    )
+
+async def generate_context(
+    sensor_id: str,
+    sensor_name: str,
+    input_payload: Dict[str, Any],
+    prompt: str,
+    refresh: bool = False,
+    priority: Priority = Priority.INTERACTIVE
+) -> Dict[str, Any]:
+    """Generate and store a context analysis for a sensor.
+
+    Concurrent callers for the same sensor and refresh intent share a single
+    Gemini call. Returns {"id": <location_analysis id>, "output": <context>}.
+    """
+    async def generate() -> Dict[str, Any]:
+        if not refresh:
+            # Another request may have stored the analysis while this one waited
+            existing_context = await find_latest_context(sensor_id)
+            if existing_context and existing_context.get("data", {}).get("output"):
+                return {
+                    "id": str(existing_context["_id"]),
+                    "output": existing_context["data"]["output"]
+                }
+
+        context_data = await call_gemini(prompt, use_cache=not refresh, priority=priority, response=CONTEXT_RESPONSE)
+
+        if refresh:
+            db = mongodb.get_database()
+            await db["location_analysis"].delete_many({"data.sensor_id": sensor_id})
+
+        document_id = await save_to_mongodb("location_analysis", {
+            "sensor_id": sensor_id,
+            "sensor_name": sensor_name,
+            "input": input_payload,
+            "output": context_data
+        })
+
+        return {"id": document_id, "output": context_data}
+
+    intent = "refresh" if refresh else "fill"
+    return await single_flight.run(f"context:{sensor_id}:{intent}", generate)
@@ -0,0 +1,224 @@
+import json
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+from pydantic import BaseModel, ValidationError
+from pymongo import UpdateOne
+from app.core.config import (
+    CROP_CATALOG_ENABLED,
+    CROP_CATALOG_MAX_AGE_DAYS,
+    CROP_CATALOG_REFRESH_SECONDS,
+    CROP_CATALOG_PROMPT_LIMIT
+)
+from app.core.database import mongodb
+from app.models.schemas import GrowthRequirements, Tolerances, Management
+from app.services.rate_limiter import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "crop_catalog"
+
+# Agronomic facts that do not depend on the site, season or farmer
+CATALOG_FIELDS: Dict[str, Optional[type[BaseModel]]] = {
+    "scientific_name": None,
+    "growth_requirements": GrowthRequirements,
+    "tolerances": Tolerances,
+    "management": Management
+}
+
+def normalize_crop_name(name: Optional[str]) -> str:
+    return " ".join((name or "").lower().split())
+
+def _catalog_key(crop: Dict[str, Any]) -> str:
+    return normalize_crop_name(crop.get("searchable_name") or crop.get("crop"))
+
+def _static_fields(crop: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The crop's catalog fields, or None if any is missing or invalid."""
+    fields = {}
+    for name, model in CATALOG_FIELDS.items():
+        value = crop.get(name)
+        if value is None:
+            return None
+        if model is None:
+            if not isinstance(value, str) or not value.strip():
+                return None
+        else:
+            try:
+                value = model.model_validate(value).model_dump()
+            except ValidationError:
+                return None
+        fields[name] = value
+    return fields
+
+class CropCatalog:
+    """Static agronomic data per crop, shared by every session.
+
+    Entries are keyed on the normalized searchable_name and kept in memory,
+    reloaded from the crop_catalog collection every CROP_CATALOG_REFRESH_SECONDS
+    so workers pick up each other's additions. Prompts list the catalogued
+    crops and the model leaves their catalog fields null; merge() fills them in.
+    Entries older than CROP_CATALOG_MAX_AGE_DAYS are not listed, so the model
+    writes them out again and update_from() refreshes them.
+    """
+
+    def __init__(self, max_age_days: float, refresh_seconds: float, prompt_limit: int, enabled: bool = True):
+        self.enabled = enabled
+        self.max_age = timedelta(days=max_age_days)
+        self.refresh_seconds = refresh_seconds
+        self.prompt_limit = prompt_limit
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.loaded_at: Optional[float] = None
+        # Bumped whenever entries change, for consumers that derive data from them
+        self.version = 0
+        self.stats = {
+            "crops_merged": 0,
+            "crops_added": 0,
+            "output_tokens_saved": 0
+        }
+
+    def _collection(self):
+        if mongodb.client is None:
+            return None
+        return mongodb.get_database()[COLLECTION_NAME]
+
+    async def load(self):
+        collection = self._collection()
+        if not self.enabled or collection is None:
+            return
+
+        try:
+            entries = {}
+            async for doc in collection.find({}):
+                entries[doc["_id"]] = doc
+            self.entries = entries
+            self.loaded_at = time.monotonic()
+            self.version += 1
+
+            if not self.entries:
+                await self.backfill()
+        except Exception as e:
+            logger.warning(f"Could not load crop catalog: {str(e)}")
+
+    async def refresh(self):
+        if self.loaded_at is None or time.monotonic() - self.loaded_at >= self.refresh_seconds:
+            await self.load()
+
+    async def backfill(self):
+        """Seed the catalog from the newest valid copy of each crop in stored sessions."""
+        db = mongodb.get_database()
+        crops = []
+        async for doc in db["crop_recommendations"].aggregate([
+            {"$sort": {"timestamp": -1}},
+            {"$unwind": "$data.output.recommendations"},
+            {"$project": {
+                "crop": {name: f"$data.output.recommendations.{name}" for name in ["crop", "searchable_name", *CATALOG_FIELDS]}
+            }}
+        ]):
+            crops.append(doc["crop"])
+
+        added = await self.update_from(crops)
+        logger.info(f"Crop catalog seeded with {added} crops from {len(crops)} stored recommendations")
+
+    def _is_fresh(self, entry: Dict[str, Any]) -> bool:
+        updated_at = entry.get("updated_at")
+        if updated_at is None:
+            return False
+        if updated_at.tzinfo is None:
+            # pymongo returns naive UTC datetimes
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - updated_at < self.max_age
+
+    def prompt_names(self) -> str:
+        """Catalogued crops, as listed in recommendation prompts."""
+        names = sorted(
+            entry["searchable_name"]
+            for entry in self.entries.values()
+            if self._is_fresh(entry)
+        )[:self.prompt_limit] if self.enabled else []
+        if not names:
+            return "None"
+        return ", ".join(names)
+
+    def merge(self, crop: Any) -> Any:
+        """Fill the crop's null catalog fields from its catalog entry, in place."""
+        if not self.enabled or not isinstance(crop, dict):
+            return crop
+
+        entry = self.entries.get(_catalog_key(crop))
+        missing = [name for name in CATALOG_FIELDS if crop.get(name) is None]
+        if entry is None or not missing:
+            return crop
+
+        for name in missing:
+            crop[name] = entry[name]
+        self.stats["crops_merged"] += 1
+        self.stats["output_tokens_saved"] += estimate_tokens(json.dumps({name: entry[name] for name in missing}))
+        return crop
+
+    def complete(self, crops: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Merge each crop, dropping those whose catalog fields are still missing."""
+        completed = []
+        for crop in crops:
+            self.merge(crop)
+            if any(crop.get(name) is None for name in CATALOG_FIELDS):
+                logger.warning(f"Dropping {crop.get('crop')}: catalog fields left null but it is not catalogued")
+                continue
+            completed.append(crop)
+        return completed
+
+    async def update_from(self, crops: List[Dict[str, Any]]) -> int:
+        """Store the catalog fields of crops that are new to the catalog or stale in it."""
+        collection = self._collection()
+        if not self.enabled or collection is None:
+            return 0
+
+        now = datetime.now(timezone.utc)
+        updates = {}
+        for crop in crops:
+            key = _catalog_key(crop)
+            if not key or key in updates:
+                continue
+            entry = self.entries.get(key)
+            if entry is not None and self._is_fresh(entry):
+                continue
+            fields = _static_fields(crop)
+            if fields is None:
+                continue
+            updates[key] = {
+                "searchable_name": crop.get("searchable_name") or crop.get("crop"),
+                "crop": crop.get("crop"),
+                **fields,
+                "updated_at": now
+            }
+
+        if not updates:
+            return 0
+
+        try:
+            await collection.bulk_write([
+                UpdateOne({"_id": key}, {"$set": entry}, upsert=True)
+                for key, entry in updates.items()
+            ], ordered=False)
+        except Exception as e:
+            logger.warning(f"Could not update crop catalog: {str(e)}")
+            return 0
+        for key, entry in updates.items():
+            self.entries[key] = {"_id": key, **entry}
+        self.version += 1
+        self.stats["crops_added"] += len(updates)
+        return len(updates)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "entries": len(self.entries)
+        }
+
+crop_catalog = CropCatalog(
+    CROP_CATALOG_MAX_AGE_DAYS,
+    CROP_CATALOG_REFRESH_SECONDS,
+    CROP_CATALOG_PROMPT_LIMIT,
+    enabled=CROP_CATALOG_ENABLED
+)
@@ -0,0 +1,169 @@
+import copy
+import time
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+from app.core.config import (
+    CROP_FILTER_LOCAL_ENABLED,
+    CROP_FILTER_MIN_MATCHES,
+    CROP_FILTER_MAX_RESULTS,
+    CROP_FILTER_WORK_HOURS_PER_WEEK
+)
+
+logger = logging.getLogger(__name__)
+
+# Farmer categories that do not narrow the selection
+ANY_CATEGORY = {"", "any", "all", "none", "n/a"}
+
+# Economics figures that grow with land size; yields, prices and ratios do not
+SCALED_ECONOMICS = ["estimated_cost_php", "estimated_revenue_php"]
+
+def _category_key(category: Optional[str]) -> str:
+    key = " ".join((category or "").lower().split())
+    # "Vegetable" and "Vegetables" are the same preference
+    return key[:-1] if key.endswith("s") else key
+
+def _session_land_size(session_input: Dict[str, Any]) -> float:
+    """Hectares the stored economics were generated for.
+
+    Farmer sessions are costed for the farmer's land, hardware sessions for
+    one hectare.
+    """
+    farmer = session_input.get("farmer") or {}
+    try:
+        land_size = float(farmer.get("land_size_ha") or 1.0)
+    except (TypeError, ValueError):
+        return 1.0
+    return land_size if land_size > 0 else 1.0
+
+def _number(value: Any) -> Optional[float]:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+def _scale_economics(crop: Dict[str, Any], factor: float) -> Dict[str, Any]:
+    crop = copy.deepcopy(crop)
+    economics = crop.get("economics") or {}
+    for name in SCALED_ECONOMICS:
+        if _number(economics.get(name)) is not None:
+            economics[name] = round(economics[name] * factor, 2)
+    breakdown = economics.get("cost_breakdown") or {}
+    for name, value in breakdown.items():
+        if _number(value) is not None:
+            breakdown[name] = round(value * factor, 2)
+    return crop
+
+class CropFilter:
+    """Applies a farmer's constraints to a stored session without the model.
+
+    Every figure the constraints need is already stored per crop, so filtering
+    is a pass over at most a few dozen dicts. Gemini is only asked when the
+    caller wants a written explanation, or when fewer than `min_matches` crops
+    pass and the model's judgement on near misses is worth the wait.
+    """
+
+    def __init__(self, min_matches: int, max_results: int, work_hours_per_week: float, enabled: bool = True):
+        self.enabled = enabled
+        self.min_matches = min_matches
+        self.max_results = max_results
+        self.work_hours_per_week = work_hours_per_week
+        self.stats = {
+            "filters": 0,
+            "local": 0,
+            "llm_explained": 0,
+            "llm_too_few": 0,
+            "crops_checked": 0,
+            "local_ms_total": 0.0
+        }
+
+    def _rejection(self, crop: Dict[str, Any], farmer: Dict[str, Any], cost_factor: float) -> Optional[str]:
+        """Why the crop does not fit the farmer, or None if it does."""
+        category = _category_key(farmer.get("crop_category"))
+        if category not in ANY_CATEGORY and _category_key(crop.get("category")) != category:
+            return f"category {crop.get('category')}"
+
+        cycle_days = _number((crop.get("growth_requirements") or {}).get("crop_cycle_days"))
+        if cycle_days is None:
+            return "no crop cycle"
+        if cycle_days > farmer["waiting_tolerance_days"]:
+            return f"{cycle_days:.0f}-day cycle"
+
+        cost = _number((crop.get("economics") or {}).get("estimated_cost_php"))
+        if cost is None:
+            return "no cost estimate"
+        if cost * cost_factor > farmer["budget_php"]:
+            return f"costs PHP {cost * cost_factor:,.0f}"
+
+        labor = _number((crop.get("management") or {}).get("labor_hours_per_ha_per_week"))
+        if labor is None:
+            return "no labor estimate"
+        labor_hours = labor * farmer["land_size_ha"]
+        if labor_hours > farmer["manpower"] * self.work_hours_per_week:
+            return f"needs {labor_hours:.0f} labor hours a week"
+
+        return None
+
+    def apply(
+        self,
+        recommendations: List[Dict[str, Any]],
+        farmer: Dict[str, Any],
+        session_input: Dict[str, Any]
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+        """(passing crops best first, scaled to the farmer's land; rejection reason per crop name)."""
+        started = time.perf_counter()
+        cost_factor = farmer["land_size_ha"] / _session_land_size(session_input)
+
+        passed, rejected = [], {}
+        for crop in recommendations:
+            reason = self._rejection(crop, farmer, cost_factor)
+            if reason is None:
+                passed.append(crop)
+            else:
+                rejected[crop.get("crop", "?")] = reason
+
+        passed.sort(key=lambda crop: _number((crop.get("scores") or {}).get("overall_score")) or 0.0, reverse=True)
+        passed = [_scale_economics(crop, cost_factor) for crop in passed[:self.max_results]]
+
+        self.stats["filters"] += 1
+        self.stats["crops_checked"] += len(recommendations)
+        self.stats["local_ms_total"] += (time.perf_counter() - started) * 1000
+        return passed, rejected
+
+    def needs_model(self, passed: List[Dict[str, Any]], explain: bool) -> bool:
+        if explain:
+            self.stats["llm_explained"] += 1
+            return True
+        if not self.enabled:
+            return True
+        if len(passed) < self.min_matches:
+            self.stats["llm_too_few"] += 1
+            return True
+        self.stats["local"] += 1
+        return False
+
+    def explanation(self, farmer: Dict[str, Any], rejected: Dict[str, str]) -> str:
+        category = farmer.get("crop_category")
+        in_category = f" in the {category} category" if _category_key(category) not in ANY_CATEGORY else ""
+        explanation = (
+            f"Kept crops{in_category} that cost at most PHP {farmer['budget_php']:,.0f} "
+            f"for {farmer['land_size_ha']:g} ha, are harvested within {farmer['waiting_tolerance_days']} days "
+            f"and need no more labor than {farmer['manpower']} workers provide, ranked by overall score."
+        )
+        if rejected:
+            excluded = "; ".join(f"{name} ({reason})" for name, reason in rejected.items())
+            explanation += f" Excluded: {excluded}."
+        return explanation
+
+    def get_stats(self) -> Dict[str, Any]:
+        filters = self.stats["filters"]
+        return {
+            **{name: value for name, value in self.stats.items() if name != "local_ms_total"},
+            "enabled": self.enabled,
+            "min_matches": self.min_matches,
+            "avg_local_ms": round(self.stats["local_ms_total"] / filters, 3) if filters else 0.0,
+            "local_rate": round(self.stats["local"] / filters, 3) if filters else 0.0
+        }
+
+crop_filter = CropFilter(
+    CROP_FILTER_MIN_MATCHES,
+    CROP_FILTER_MAX_RESULTS,
+    CROP_FILTER_WORK_HOURS_PER_WEEK,
+    enabled=CROP_FILTER_LOCAL_ENABLED
+)
@@ -0,0 +1,161 @@
+import re
+import logging
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+import numpy as np
+from app.core.config import CROP_RANKER_ENABLED, CROP_RANKER_TOP_K
+from app.services.crop_catalog import crop_catalog, normalize_crop_name
+
+logger = logging.getLogger(__name__)
+
+LEVELS = {"low": 0.0, "moderate": 1.0, "medium": 1.0, "high": 2.0}
+
+# Score falls to zero this many degrees outside a crop's optimal range
+TEMP_FALLOFF_C = 6.0
+# Midday lux of full sun; light below a crop's need is a deficit
+FULL_SUN_LUX = 30000.0
+# How hard a light deficit hits crops by shade tolerance (low, moderate, high)
+SHADE_PENALTY = np.array([1.5, 1.0, 0.5])
+
+WEIGHTS = {"temperature": 0.4, "water": 0.3, "light": 0.3}
+
+# "20-30", "20 - 30°C", "20–30", "20 to 30"; the hyphen is a separator, not a sign
+_RANGE = re.compile(r"(\d+(?:\.\d+)?)\s*(?:-|–|—|to)\s*(\d+(?:\.\d+)?)")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+def _level(text: Any) -> Optional[float]:
+    words = re.findall(r"[a-z]+", str(text or "").lower())
+    for word in words:
+        if word in LEVELS:
+            return LEVELS[word]
+    return None
+
+def _temp_range(text: Any) -> Optional[Tuple[float, float]]:
+    text = str(text or "")
+    match = _RANGE.search(text)
+    if match:
+        low, high = float(match[1]), float(match[2])
+        return min(low, high), max(low, high)
+    # A single optimum, e.g. "25°C"
+    match = _NUMBER.search(text)
+    if match:
+        return float(match[0]), float(match[0])
+    return None
+
+def crop_features(entry: Dict[str, Any]) -> Optional[List[float]]:
+    """[temp_low, temp_high, water_level, sunlight_hours, shade_level] for a catalog entry."""
+    growth = entry.get("growth_requirements") or {}
+    tolerances = entry.get("tolerances") or {}
+    temp_range = _temp_range(growth.get("optimal_temp_range_c"))
+    water = _level(growth.get("water_requirement"))
+    shade = _level(tolerances.get("shade_tolerance"))
+    sunlight = growth.get("sunlight_hours_daily")
+    if temp_range is None or water is None or shade is None or not isinstance(sunlight, (int, float)):
+        return None
+    return [temp_range[0], temp_range[1], water, float(sunlight), shade]
+
+def sensor_features(sensor_data: Dict[str, Any]) -> List[float]:
+    return [
+        float(sensor_data["temperature_c"]),
+        float(sensor_data["soil_moisture_pct"]),
+        float(sensor_data["light_lux"])
+    ]
+
+def suitability(crops: np.ndarray, sensors: np.ndarray) -> np.ndarray:
+    """Score every crop against every sensor in one pass.
+
+    `crops` is C x 5 (see crop_features), `sensors` is S x 3 (see
+    sensor_features); returns an S x C matrix of scores in [0, 1].
+    """
+    temp_low, temp_high, water, sunlight, shade = (crops[:, i][None, :] for i in range(5))
+    temperature, moisture, lux = (sensors[:, i][:, None] for i in range(3))
+
+    outside = np.maximum(temp_low - temperature, 0) + np.maximum(temperature - temp_high, 0)
+    temp_score = np.clip(1 - outside / TEMP_FALLOFF_C, 0, 1)
+
+    # Soil moisture on the same 0-2 scale as Low/Moderate/High water needs
+    moisture_level = np.clip((moisture - 15) / 20, 0, 2)
+    water_score = 1 - np.abs(water - moisture_level) / 2
+
+    light_deficit = np.maximum(np.clip(sunlight / 12, 0, 1) - np.clip(lux / FULL_SUN_LUX, 0, 1), 0)
+    light_score = np.clip(1 - light_deficit * SHADE_PENALTY[shade.astype(int)], 0, 1)
+
+    return (
+        WEIGHTS["temperature"] * temp_score
+        + WEIGHTS["water"] * water_score
+        + WEIGHTS["light"] * light_score
+    )
+
+class CropRanker:
+    """Deterministic pre-ranking of catalogued crops for a sensor reading.
+
+    The catalog is turned into a feature matrix once per catalog version and
+    every ranking is a single vectorized pass over it, so only the best
+    `top_k` candidates need to be offered to the model.
+    """
+
+    def __init__(self, top_k: int, enabled: bool = True):
+        self.enabled = enabled
+        self.top_k = top_k
+        self.version: Optional[int] = None
+        self.names: List[str] = []
+        self.aliases: List[set] = []
+        self.features = np.empty((0, 5))
+        self.stats = {
+            "rankings": 0,
+            "crops_scored": 0
+        }
+
+    def _refresh(self):
+        if self.version == crop_catalog.version:
+            return
+        names, aliases, rows = [], [], []
+        for entry in crop_catalog.entries.values():
+            features = crop_features(entry)
+            if features is not None:
+                names.append(entry["searchable_name"])
+                # Already generated crops are named by variety, e.g. "Ampalaya - Jade 20"
+                variety = entry.get("crop") or ""
+                aliases.append({normalize_crop_name(name) for name in [entry["searchable_name"], variety, variety.split(" - ")[0]] if name})
+                rows.append(features)
+        self.names = names
+        self.aliases = aliases
+        self.features = np.array(rows) if rows else np.empty((0, 5))
+        self.version = crop_catalog.version
+        logger.info(f"Crop ranker built for {len(names)} of {len(crop_catalog.entries)} catalogued crops")
+
+    def rank(self, sensor_data: Dict[str, Any], exclude: Iterable[str] = (), top_k: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Best catalogued crops for the reading, as (searchable_name, score), best first."""
+        if not self.enabled:
+            return []
+        self._refresh()
+        if not self.names:
+            return []
+
+        try:
+            sensor = sensor_features(sensor_data)
+        except (KeyError, TypeError, ValueError):
+            return []
+        
+        scores = suitability(self.features, np.array([sensor]))[0]
+        excluded = {normalize_crop_name(name) for name in exclude}
+        self.stats["rankings"] += 1
+        self.stats["crops_scored"] += len(self.names)
+
+        ranked = []
+        for index in np.argsort(-scores, kind="stable"):
+            if self.aliases[index] & excluded:
+                continue
+            ranked.append((self.names[index], round(float(scores[index]), 3)))
+            if len(ranked) >= (top_k or self.top_k):
+                break
+        return ranked
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "crops": len(self.names),
+            "top_k": self.top_k
+        }
+
+crop_ranker = CropRanker(CROP_RANKER_TOP_K, enabled=CROP_RANKER_ENABLED)
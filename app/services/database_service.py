@@ -1,19 +1,40 @@
 import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+from bson import ObjectId
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
 from app.core.database import mongodb
 
-async def save_to_mongodb(collection_name: str, data: Dict[str, Any]) -> str:
-    db = mongodb.get_database()
-    collection = db[collection_name]
-    
+def make_document(data: Dict[str, Any]) -> Dict[str, Any]:
     # Use Philippine timezone (GMT+8)
     philippine_tz = datetime.timezone(datetime.timedelta(hours=8))
     philippine_time = datetime.datetime.now(philippine_tz)
     
-    document = {
+    return {
         "timestamp": philippine_time,
         "data": data
     }
+
+async def save_to_mongodb(collection_name: str, data: Dict[str, Any]) -> str:
+    db = mongodb.get_database()
+    collection = db[collection_name]
     
-    result = await collection.insert_one(document)
+    result = await collection.insert_one(make_document(data))
     return str(result.inserted_id)
+
+async def bulk_save_to_mongodb(collection_name: str, data_items: List[Dict[str, Any]]) -> List[Optional[str]]:
+    """Ids of the inserted documents, in order; None for items whose insert failed."""
+    db = mongodb.get_database()
+    collection = db[collection_name]
+    
+    # ids are assigned client-side, so they are known after the single round trip
+    documents = [{"_id": ObjectId(), **make_document(data)} for data in data_items]
+    try:
+        await collection.bulk_write([InsertOne(document) for document in documents], ordered=False)
+    except BulkWriteError as e:
+        # Unordered, so every insert not listed in writeErrors was written
+        if not e.details.get("writeErrors"):
+            raise
+        failed = {error["index"] for error in e.details["writeErrors"]}
+        return [None if index in failed else str(document["_id"]) for index, document in enumerate(documents)]
+    return [str(document["_id"]) for document in documents]
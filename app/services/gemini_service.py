@@ -1,74 +1,476 @@
+import copy
 import json
 import time
-import requests
-from typing import Dict, Any
-from app.core.config import GEMINI_API_KEY, GEMINI_MODEL, HTTP_TIMEOUT, MAX_RETRIES, RETRY_DELAY
-
-def call_gemini(prompt: str) -> Dict[str, Any]:
-    if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY environment variable not set")
-    
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
-    
-    headers = {"Content-Type": "application/json"}
-    
-    payload = {
-        "contents": [{
-            "parts": [{
-                "text": prompt
-            }]
-        }],
-        "generationConfig": {
-            "temperature": 0.2,
-            "topK": 40,
-            "topP": 0.95,
-            "maxOutputTokens": 8192,
+import asyncio
+import logging
+from collections import deque
+import httpx
+from typing import Dict, Any, Callable, AsyncIterator, Optional, List
+from pydantic import ValidationError
+from app.core.config import (
+    GEMINI_API_KEY,
+    GEMINI_MODEL,
+    GEMINI_BASE_URL,
+    GEMINI_MAX_CONNECTIONS,
+    GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+    GEMINI_KEEPALIVE_EXPIRY,
+    GEMINI_HEDGE_ENABLED,
+    GEMINI_HEDGE_MIN_SAMPLES,
+    GEMINI_BREAKER_FAILURE_THRESHOLD,
+    GEMINI_BREAKER_RESET_SECONDS,
+    HTTP_TIMEOUT,
+    MAX_RETRIES,
+    RETRY_DELAY
+)
+from app.core.deadline import DeadlineExceeded, remaining
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.services.llm_cache import llm_cache
+from app.services.rate_limiter import Priority, gemini_scheduler, estimate_tokens
+from app.services.json_stream import JsonArrayStreamParser
+from app.services.response_schemas import ResponseFormat, strip_code_fence
+
+logger = logging.getLogger(__name__)
+
+JSON_GENERATION_CONFIG = {
+    "temperature": 0.2,
+    "topK": 40,
+    "topP": 0.95,
+    "maxOutputTokens": 8192,
+    "responseMimeType": "application/json",
+}
+
+CHAT_GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "topK": 40,
+    "topP": 0.95,
+    "maxOutputTokens": 2048,
+}
+
+def _is_outage(error: Exception) -> bool:
+    # Bad requests and unusable outputs mean Gemini is up; only these mean it is not
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+gemini_breaker = CircuitBreaker(
+    "Gemini",
+    GEMINI_BREAKER_FAILURE_THRESHOLD,
+    GEMINI_BREAKER_RESET_SECONDS,
+    is_failure=_is_outage
+)
+
+class GeminiClient:
+    client: httpx.AsyncClient = None
+    
+    @classmethod
+    async def connect(cls):
+        cls.client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            headers={"Content-Type": "application/json"},
+            limits=httpx.Limits(
+                max_connections=GEMINI_MAX_CONNECTIONS,
+                max_keepalive_connections=GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=GEMINI_KEEPALIVE_EXPIRY
+            )
+        )
+    
+    @classmethod
+    async def disconnect(cls):
+        if cls.client:
+            await cls.client.aclose()
+            cls.client = None
+    
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        if cls.client is None:
+            raise RuntimeError("Gemini client is not connected")
+        return cls.client
+    
+    @classmethod
+    def model_url(cls, method: str) -> str:
+        return f"{GEMINI_BASE_URL}/models/{GEMINI_MODEL}:{method}"
+    
+    @classmethod
+    def _payload(cls, prompt: str, generation_config: Dict[str, Any]) -> Dict[str, Any]:
+        if not GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY environment variable not set")
+        
+        return {
+            "contents": [{
+                "parts": [{
+                    "text": prompt
+                }]
+            }],
+            "generationConfig": generation_config
         }
-    }
     
+    @classmethod
+    async def generate_content(cls, prompt: str, generation_config: Dict[str, Any]) -> Dict[str, Any]:
+        with gemini_breaker.guard():
+            response = await cls.get_client().post(
+                cls.model_url("generateContent"),
+                params={"key": GEMINI_API_KEY},
+                json=cls._payload(prompt, generation_config),
+                timeout=remaining(HTTP_TIMEOUT)
+            )
+            response.raise_for_status()
+            return response.json()
+    
+    @classmethod
+    async def stream_content(cls, prompt: str, generation_config: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        with gemini_breaker.guard():
+            async with cls.get_client().stream(
+                "POST",
+                cls.model_url("streamGenerateContent"),
+                params={"key": GEMINI_API_KEY, "alt": "sse"},
+                json=cls._payload(prompt, generation_config),
+                timeout=remaining(HTTP_TIMEOUT)
+            ) as response:
+                if response.is_error:
+                    await response.aread()
+                response.raise_for_status()
+                # Gemini answered; the consumer may stop reading long before the end
+                gemini_breaker.record_success()
+                
+                async for line in response.aiter_lines():
+                    if line.startswith("data:"):
+                        yield json.loads(line[len("data:"):])
+
+gemini_client = GeminiClient()
+
+class GenerationStats:
+    """Attempts, retries, unusable outputs and latency per prompt type."""
+
+    def __init__(self):
+        self.by_kind: Dict[str, Dict[str, int]] = {}
+        self.latencies: Dict[str, deque] = {}
+
+    def _kind(self, kind: str) -> Dict[str, int]:
+        return self.by_kind.setdefault(kind, {
+            "calls": 0,
+            "retries": 0,
+            "invalid_outputs": 0,
+            "failures": 0,
+            "hedges": 0,
+            "hedge_wins": 0
+        })
+
+    def record_latency(self, kind: str, seconds: float):
+        self.latencies.setdefault(kind, deque(maxlen=200)).append(seconds)
+
+    def p95_latency(self, kind: str) -> Optional[float]:
+        samples = self.latencies.get(kind)
+        if not samples or len(samples) < GEMINI_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def record_hedge(self, kind: str, won: bool):
+        stats = self._kind(kind)
+        stats["hedges"] += 1
+        stats["hedge_wins"] += int(won)
+
+    def record(self, kind: str, attempts: int, invalid_outputs: int, failed: bool):
+        stats = self._kind(kind)
+        stats["calls"] += 1
+        stats["retries"] += attempts - 1
+        stats["invalid_outputs"] += invalid_outputs
+        stats["failures"] += int(failed)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            kind: {
+                **stats,
+                "retry_rate": round(stats["retries"] / stats["calls"], 3) if stats["calls"] else 0.0,
+                "p95_ms": round(self.p95_latency(kind) * 1000, 1) if self.p95_latency(kind) is not None else None
+            }
+            for kind, stats in self.by_kind.items()
+        }
+
+generation_stats = GenerationStats()
+
+def extract_text(data: Dict[str, Any]) -> str:
+    if "candidates" not in data or not data["candidates"]:
+        raise ValueError("No candidates in response")
+    
+    return data["candidates"][0]["content"]["parts"][0]["text"]
+
+def parse_json_text(text_content: str) -> Any:
+    return json.loads(strip_code_fence(text_content))
+
+def _json_config(response: Optional[ResponseFormat]) -> Dict[str, Any]:
+    if response is None:
+        return JSON_GENERATION_CONFIG
+    return {**JSON_GENERATION_CONFIG, "responseSchema": response.schema}
+
+def _is_invalid_output(error: Exception) -> bool:
+    return isinstance(error, (json.JSONDecodeError, ValidationError))
+
+def _retry_after_seconds(response: httpx.Response, attempt: int) -> float:
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return 5 * (attempt + 1)  # 5s, 10s, 15s for rate limits
+
+async def _backoff(error: Exception, attempt: int):
+    if isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 429:
+        # The scheduler holds back every queued Gemini call, not just this one
+        wait_time = _retry_after_seconds(error.response, attempt)
+        logger.warning(f"Rate limit hit, pausing Gemini traffic for {wait_time}s (attempt {attempt + 1}/{MAX_RETRIES})")
+        gemini_scheduler.penalize(wait_time)
+    elif attempt < MAX_RETRIES - 1:
+        wait_time = RETRY_DELAY * (attempt + 1)
+        await asyncio.sleep(remaining(wait_time))
+
+async def _acquire(priority: Priority, estimated_tokens: int):
+    try:
+        await asyncio.wait_for(gemini_scheduler.acquire(priority, estimated_tokens), remaining())
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("Request deadline exceeded while waiting for Gemini capacity")
+
+async def _hedged(primary: asyncio.Future, hedge_after: float, prompt: str, generation_config: Dict[str, Any], kind: str, estimated_tokens: int) -> Dict[str, Any]:
+    hedge = None
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        # Hedge only with spare budget; a hedge must never delay queued requests
+        if done or not gemini_scheduler.try_acquire(estimated_tokens):
+            return await primary
+        
+        logger.info(f"Gemini {kind} call slower than p95 ({hedge_after:.1f}s), sending a hedged request")
+        hedge = asyncio.ensure_future(gemini_client.generate_content(prompt, generation_config))
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    generation_stats.record_hedge(kind, won=task is hedge)
+                    return task.result()
+                error = task.exception()
+        generation_stats.record_hedge(kind, won=False)
+        raise error
+    finally:
+        # Also reached when the deadline cancels us, so no call outlives the request
+        for task in (primary, hedge):
+            if task is None:
+                continue
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                # A loser that failed alongside the winner; retrieve its error
+                task.exception()
+
+async def _generate(prompt: str, generation_config: Dict[str, Any], kind: str, estimated_tokens: int) -> Dict[str, Any]:
+    started = time.monotonic()
+    # Raises before any call is started if the deadline has already passed
+    timeout = remaining()
+    hedge_after = generation_stats.p95_latency(kind) if GEMINI_HEDGE_ENABLED else None
+    primary = asyncio.ensure_future(gemini_client.generate_content(prompt, generation_config))
+    call = primary if hedge_after is None else _hedged(primary, hedge_after, prompt, generation_config, kind, estimated_tokens)
+    try:
+        # httpx timeouts apply per read, so bound the whole call by the deadline
+        data = await asyncio.wait_for(call, timeout)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("Request deadline exceeded waiting for Gemini")
+    generation_stats.record_latency(kind, time.monotonic() - started)
+    return data
+
+async def _generate_with_retries(
+    prompt: str,
+    generation_config: Dict[str, Any],
+    parse: Callable[[str], Any],
+    priority: Priority,
+    kind: str
+) -> Any:
+    estimated_tokens = estimate_tokens(prompt)
     last_error = None
+    invalid_outputs = 0
     for attempt in range(MAX_RETRIES):
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=HTTP_TIMEOUT)
-            response.raise_for_status()
-            
-            data = response.json()
+            # Fail fast instead of queueing for capacity while Gemini is down
+            gemini_breaker.check()
+            await _acquire(priority, estimated_tokens)
+            data = await _generate(prompt, generation_config, kind, estimated_tokens)
             
-            if "candidates" not in data or not data["candidates"]:
-                raise ValueError("No candidates in response")
+            usage = data.get("usageMetadata", {})
+            if "totalTokenCount" in usage:
+                gemini_scheduler.reconcile(estimated_tokens, usage["totalTokenCount"])
             
-            text_content = data["candidates"][0]["content"]["parts"][0]["text"]
-            
-            text_content = text_content.strip()
-            if text_content.startswith("```json"):
-                text_content = text_content[7:]
-            elif text_content.startswith("```"):
-                text_content = text_content[3:]
-            if text_content.endswith("```"):
-                text_content = text_content[:-3]
-            text_content = text_content.strip()
+            result = parse(extract_text(data))
+            generation_stats.record(kind, attempt + 1, invalid_outputs, failed=False)
+            return result
+        except (DeadlineExceeded, CircuitOpenError):
+            generation_stats.record(kind, attempt + 1, invalid_outputs, failed=True)
+            raise
+        except Exception as e:
+            last_error = e
+            if _is_invalid_output(e):
+                invalid_outputs += 1
+                logger.warning(f"Unusable {kind} output from Gemini (attempt {attempt + 1}/{MAX_RETRIES}): {str(e)[:200]}")
+            await _backoff(e, attempt)
+    
+    generation_stats.record(kind, MAX_RETRIES, invalid_outputs, failed=True)
+    raise RuntimeError(f"Failed after {MAX_RETRIES} attempts. Last error: {last_error}")
+
+async def call_gemini(
+    prompt: str,
+    use_cache: bool = True,
+    priority: Priority = Priority.INTERACTIVE,
+    response: Optional[ResponseFormat] = None
+) -> Dict[str, Any]:
+    """Generate JSON for `prompt`.
+
+    With a ResponseFormat the model is constrained to its schema and the
+    output is validated against the matching Pydantic model; without one the
+    text is only parsed as JSON.
+    """
+    generation_config = _json_config(response)
+    cache_key = llm_cache.make_key(GEMINI_MODEL, generation_config, prompt)
+    
+    if use_cache:
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    else:
+        llm_cache.record_bypass()
+    
+    if response is not None:
+        result = await _generate_with_retries(prompt, generation_config, response.parse, priority, response.name)
+    else:
+        result = await _generate_with_retries(prompt, generation_config, parse_json_text, priority, "json")
+    await llm_cache.set(cache_key, result, GEMINI_MODEL)
+    return result
+
+async def chat_gemini(prompt: str, priority: Priority = Priority.INTERACTIVE) -> str:
+    return await _generate_with_retries(prompt, CHAT_GENERATION_CONFIG, lambda text: text, priority, "chat")
+
+async def stream_gemini(
+    prompt: str,
+    generation_config: Dict[str, Any] = CHAT_GENERATION_CONFIG,
+    priority: Priority = Priority.INTERACTIVE,
+    kind: str = "chat_stream"
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield {"text": ...} per streamed chunk, then {"usage": ..., "finish_reason": ...}.
+
+    Failures before the first chunk are retried like call_gemini. Text already
+    forwarded cannot be taken back, so errors after that propagate.
+    """
+    estimated_tokens = estimate_tokens(prompt)
+    last_error = None
+    for attempt in range(MAX_RETRIES):
+        started = False
+        usage = {}
+        finish_reason = None
+        try:
+            gemini_breaker.check()
+            await _acquire(priority, estimated_tokens)
+            async for chunk in gemini_client.stream_content(prompt, generation_config):
+                remaining()
+                usage = chunk.get("usageMetadata", usage)
+                candidates = chunk.get("candidates") or []
+                if not candidates:
+                    continue
+                
+                finish_reason = candidates[0].get("finishReason", finish_reason)
+                parts = candidates[0].get("content", {}).get("parts", [])
+                text = "".join(part.get("text", "") for part in parts)
+                if text:
+                    started = True
+                    yield {"text": text}
             
-            return json.loads(text_content)
+            if "totalTokenCount" in usage:
+                gemini_scheduler.reconcile(estimated_tokens, usage["totalTokenCount"])
             
-        except requests.exceptions.HTTPError as e:
-            last_error = e
-            # Handle rate limiting with longer wait
-            if e.response.status_code == 429 and attempt < MAX_RETRIES - 1:
-                wait_time = 5 * (attempt + 1)  # 5s, 10s, 15s for rate limits
-                print(f"Rate limit hit, waiting {wait_time}s before retry {attempt + 2}/{MAX_RETRIES}...")
-                time.sleep(wait_time)
-            elif attempt < MAX_RETRIES - 1:
-                wait_time = RETRY_DELAY * (attempt + 1)
-                time.sleep(wait_time)
-        except json.JSONDecodeError as e:
-            last_error = e
-            if attempt < MAX_RETRIES - 1:
-                wait_time = RETRY_DELAY * (attempt + 1)
-                time.sleep(wait_time)
+            generation_stats.record(kind, attempt + 1, 0, failed=False)
+            yield {"usage": usage, "finish_reason": finish_reason}
+            return
         except Exception as e:
+            if started or isinstance(e, (DeadlineExceeded, CircuitOpenError)):
+                generation_stats.record(kind, attempt + 1, 0, failed=True)
+                raise
             last_error = e
-            if attempt < MAX_RETRIES - 1:
-                wait_time = RETRY_DELAY * (attempt + 1)
-                time.sleep(wait_time)
+            await _backoff(e, attempt)
     
+    generation_stats.record(kind, MAX_RETRIES, 0, failed=True)
     raise RuntimeError(f"Failed after {MAX_RETRIES} attempts. Last error: {last_error}")
+
+async def stream_json_array(
+    prompt: str,
+    key: str,
+    use_cache: bool = True,
+    priority: Priority = Priority.INTERACTIVE,
+    response: Optional[ResponseFormat] = None
+) -> AsyncIterator[Any]:
+    """Yield each element of the JSON array under `key` as soon as it is complete.
+
+    Shares call_gemini's cache: a cached response is replayed, and a stream
+    that parsed cleanly to the end is stored for later callers.
+    """
+    generation_config = _json_config(response)
+    cache_key = llm_cache.make_key(GEMINI_MODEL, generation_config, prompt)
+    
+    if use_cache:
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            for element in (cached.get(key, []) if isinstance(cached, dict) else cached):
+                yield element
+            return
+    else:
+        llm_cache.record_bypass()
+    
+    parser = JsonArrayStreamParser(key)
+    elements = []
+    kind = f"{response.name if response else 'json'}_stream"
+    async for chunk in stream_gemini(prompt, generation_config, priority, kind):
+        if "text" not in chunk:
+            continue
+        for element in parser.feed(chunk["text"]):
+            elements.append(element)
+            yield copy.deepcopy(element)
+    
+    if parser.errors:
+        logger.warning(f"Skipped {parser.errors} malformed element(s) in streamed '{key}' array")
+    elif parser.complete:
+        await llm_cache.set(cache_key, {key: elements}, GEMINI_MODEL)
+
+async def generate_json_array(
+    prompt: str,
+    key: str,
+    use_cache: bool = True,
+    priority: Priority = Priority.INTERACTIVE,
+    response: Optional[ResponseFormat] = None
+) -> List[Any]:
+    """Return the elements of the JSON array under `key` from one generateContent call.
+
+    Unlike call_gemini, a malformed or truncated element only drops that
+    element, so callers can ask again for just the missing ones. Shares the
+    cache with call_gemini and stream_json_array.
+    """
+    generation_config = _json_config(response)
+    cache_key = llm_cache.make_key(GEMINI_MODEL, generation_config, prompt)
+    
+    if use_cache:
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            return list(cached.get(key, []) if isinstance(cached, dict) else cached)
+    else:
+        llm_cache.record_bypass()
+    
+    def parse(text: str):
+        parser = JsonArrayStreamParser(key)
+        elements = parser.feed(text)
+        if not parser.in_array:
+            raise json.JSONDecodeError(f"No '{key}' array in response", text, 0)
+        return parser, elements
+    
+    kind = f"{response.name if response else 'json'}_array"
+    parser, elements = await _generate_with_retries(prompt, generation_config, parse, priority, kind)
+    
+    if parser.errors or not parser.complete:
+        logger.warning(f"Kept {len(elements)} element(s) of a partial '{key}' array ({parser.errors} malformed)")
+    else:
+        await llm_cache.set(cache_key, {key: elements}, GEMINI_MODEL)
+    return elements
@@ -0,0 +1,698 @@
+import json
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, List, Optional
+from fastapi import HTTPException
+from bson import ObjectId
+from pymongo import UpdateOne
+from pydantic import ValidationError
+from app.models.schemas import (
+    HardwareSensorData,
+    AutoRecommendationResponse,
+    CropRecommendation,
+    HardwareBatchReading,
+    HardwareBatchResult,
+    HardwareBatchResponse
+)
+from app.services.gemini_service import generate_json_array, stream_json_array, gemini_breaker
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.database_service import save_to_mongodb, bulk_save_to_mongodb
+from app.services.context_service import generate_context, find_latest_context
+from app.services.wikipedia_service import add_thumbnails
+from app.services.rate_limiter import Priority
+from app.services.response_schemas import RECOMMENDATIONS_RESPONSE
+from app.services.background import spawn
+from app.services.session_index import session_index
+from app.services.change_detection import change_detector
+from app.services.crop_catalog import crop_catalog
+from app.services.crop_ranker import crop_ranker
+from app.services.prompts import CONTEXT_ANALYSIS_PROMPT, HARDWARE_RECOMMENDATION_PROMPT
+from app.core.config import (
+    START_MONTH,
+    HARDWARE_BATCH_CONCURRENCY,
+    HARDWARE_BATCH_STORE_TIMEOUT_SECONDS,
+    HARDWARE_REPAIR_ATTEMPTS
+)
+from app.core.database import mongodb
+from app.core.deadline import DeadlineExceeded, deadline, without_deadline
+
+logger = logging.getLogger(__name__)
+
+TOP_CROPS = 3
+HARDWARE_CROP_COUNT = 8
+
+repair_stats = {
+    "repairs": 0,
+    "crops_requested": 0,
+    "crops_recovered": 0
+}
+
+def _is_valid_crop(element: Any) -> bool:
+    try:
+        CropRecommendation.model_validate(element)
+        return True
+    except ValidationError as e:
+        logger.warning(f"Skipping invalid crop in AI response ({e.error_count()} validation errors)")
+        return False
+
+async def _collect_valid_crops(crop_stream, crops: List[Dict[str, Any]], limit: Optional[int] = None):
+    async for element in crop_stream:
+        if not _is_valid_crop(crop_catalog.merge(element)):
+            continue
+        
+        crops.append(element)
+        if limit is not None and len(crops) >= limit:
+            return
+
+async def _enrich_crops(new_recommendations: List[Dict[str, Any]]):
+    if len(new_recommendations) != HARDWARE_CROP_COUNT:
+        logger.warning(f"Expected {HARDWARE_CROP_COUNT} recommendations but got {len(new_recommendations)}")
+    
+    for i, rec in enumerate(new_recommendations):
+        rec["is_top_3"] = (i < TOP_CROPS)
+    
+    await add_thumbnails(new_recommendations)
+
+def _location_info(sensor_location: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "location_name": sensor_location.get("name", "Unknown"),
+        "location_string": sensor_location.get("location", "Unknown")
+    }
+
+def _sensor_values(sensor_data) -> Dict[str, float]:
+    return {
+        "soil_moisture_pct": sensor_data.soil_moisture_pct,
+        "temperature_c": sensor_data.temperature_c,
+        "humidity_pct": sensor_data.humidity_pct,
+        "light_lux": sensor_data.light_lux
+    }
+
+async def _initial_context(
+    sensor_id: str,
+    sensor_location: Dict[str, Any],
+    sensor_data,
+    existing_context: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    if existing_context and "data" in existing_context:
+        logger.info(f"Reusing existing context analysis")
+        return existing_context["data"].get("output")
+    
+    logger.info(f"Generating new context analysis")
+    
+    location_info = _location_info(sensor_location)
+    context_input = {
+        "location": location_info,
+        "sensor_data": _sensor_values(sensor_data),
+        "start_month": START_MONTH
+    }
+    
+    context_prompt = CONTEXT_ANALYSIS_PROMPT.format(
+        input_payload=json.dumps(context_input, indent=2),
+        location=location_info["location_string"]
+    )
+    
+    context = await generate_context(
+        sensor_id,
+        location_info["location_name"],
+        context_input,
+        context_prompt,
+        priority=Priority.HARDWARE
+    )
+    return context["output"]
+
+async def _reuse_similar_session(
+    sensor_id: str,
+    location_info: Dict[str, Any],
+    sensor_values: Dict[str, float]
+) -> Optional[Dict[str, Any]]:
+    """Session data for `sensor_id` copied from a recent session with near-identical readings."""
+    match = session_index.nearest(location_info, sensor_values)
+    if match is None:
+        return None
+    
+    source_id, distance = match
+    source = await mongodb.get_database()["crop_recommendations"].find_one({"_id": ObjectId(source_id)})
+    if not source or not source.get("data", {}).get("output", {}).get("recommendations"):
+        # Deleted since it was indexed
+        session_index.remove(source_id)
+        return None
+    
+    logger.info(f"Reusing session {source_id} for sensor {sensor_id} (distance {distance:.2f})")
+    crops = [
+        {**crop, "planted": False}
+        for crop in source["data"]["output"]["recommendations"][:HARDWARE_CROP_COUNT]
+    ]
+    return {
+        "sensor_id": sensor_id,
+        "input": {
+            "sensor_data": sensor_values,
+            "location": location_info,
+            "start_month": START_MONTH
+        },
+        "context": source["data"].get("context"),
+        "output": {
+            "recommendations": crops
+        },
+        "reused_from": source_id
+    }
+
+def _needs_regeneration(sensor_id: str, sensor_values: Dict[str, float], last_session: Optional[Dict[str, Any]]) -> bool:
+    if not last_session or not last_session.get("data", {}).get("output", {}).get("recommendations"):
+        return change_detector.should_regenerate(sensor_id, sensor_values, None, None)
+    return change_detector.should_regenerate(
+        sensor_id,
+        sensor_values,
+        last_session["data"]["input"]["sensor_data"],
+        last_session.get("timestamp")
+    )
+
+def _crops_list(crop_names: List[str]) -> str:
+    if not crop_names:
+        return "None yet (this is the first batch)"
+    return "\n".join([f"- {crop}" for crop in crop_names])
+
+def _recommendation_prompt(
+    context_data: Dict[str, Any],
+    recommendation_input: Dict[str, Any],
+    excluded: List[str],
+    crop_count: int = HARDWARE_CROP_COUNT
+) -> str:
+    candidates = crop_ranker.rank(recommendation_input["sensor_data"], exclude=excluded)
+    if candidates:
+        candidate_crops = "\n".join(f"- {name} (suitability {score:.2f})" for name, score in candidates)
+        # Every candidate is catalogued; listing only them keeps the prompt short
+        catalogued_crops = ", ".join(name for name, _ in candidates)
+    else:
+        candidate_crops = "None (choose freely)"
+        catalogued_crops = crop_catalog.prompt_names()
+    
+    return HARDWARE_RECOMMENDATION_PROMPT.format(
+        context_data=json.dumps(context_data, indent=2),
+        input_payload=json.dumps(recommendation_input, indent=2),
+        start_month=START_MONTH,
+        already_generated=_crops_list(excluded),
+        candidate_crops=candidate_crops,
+        crop_count=crop_count,
+        catalogued_crops=catalogued_crops
+    )
+
+async def _request_crops(
+    context_data: Dict[str, Any],
+    recommendation_input: Dict[str, Any],
+    excluded: List[str],
+    crop_count: int
+) -> List[Dict[str, Any]]:
+    await crop_catalog.refresh()
+    prompt = _recommendation_prompt(context_data, recommendation_input, excluded, crop_count)
+    elements = await generate_json_array(
+        prompt,
+        "recommendations",
+        priority=Priority.HARDWARE,
+        response=RECOMMENDATIONS_RESPONSE
+    )
+    return [element for element in elements if _is_valid_crop(crop_catalog.merge(element))]
+
+async def _repair_crops(
+    sensor_id: str,
+    context_data: Dict[str, Any],
+    recommendation_input: Dict[str, Any],
+    excluded: List[str],
+    crops: List[Dict[str, Any]]
+):
+    """Top `crops` up to HARDWARE_CROP_COUNT, asking Gemini only for the missing ones.
+
+    Crops already held join the exclusion list, so a short, truncated or
+    partly malformed response never costs a full regeneration.
+    """
+    for attempt in range(HARDWARE_REPAIR_ATTEMPTS):
+        missing = HARDWARE_CROP_COUNT - len(crops)
+        if missing <= 0:
+            return
+        
+        known = excluded + [crop["crop"] for crop in crops]
+        logger.info(f"Requesting {missing} missing crop(s) for sensor {sensor_id} (repair {attempt + 1}/{HARDWARE_REPAIR_ATTEMPTS})")
+        repair_stats["repairs"] += 1
+        repair_stats["crops_requested"] += missing
+        
+        try:
+            repaired = await _request_crops(context_data, recommendation_input, known, missing)
+        except (DeadlineExceeded, CircuitOpenError):
+            # The caller answers these with 504 / 503 or stale crops
+            raise
+        except Exception as e:
+            logger.error(f"Crop repair failed for sensor {sensor_id}, keeping {len(crops)} crops: {str(e)}")
+            return
+        
+        seen = {name.lower() for name in known}
+        for crop in repaired[:missing]:
+            if crop["crop"].lower() in seen:
+                continue
+            seen.add(crop["crop"].lower())
+            crops.append(crop)
+            repair_stats["crops_recovered"] += 1
+
+async def _finish_hardware_session(
+    sensor_id: str,
+    crop_stream,
+    new_recommendations: List[Dict[str, Any]],
+    context_data: Dict[str, Any],
+    recommendation_input: Dict[str, Any],
+    excluded: List[str],
+    storage_data: Optional[Dict[str, Any]] = None,
+    existing_session: Optional[Dict[str, Any]] = None
+):
+    if crop_stream is not None:
+        try:
+            # Over-produced crops are dropped rather than stored or appended
+            await _collect_valid_crops(crop_stream, new_recommendations, limit=HARDWARE_CROP_COUNT)
+        except Exception as e:
+            logger.error(f"Crop stream for sensor {sensor_id} ended early with {len(new_recommendations)} crops: {str(e)}")
+        finally:
+            await crop_stream.aclose()
+    
+    try:
+        await _repair_crops(sensor_id, context_data, recommendation_input, excluded, new_recommendations)
+    except CircuitOpenError as e:
+        # The top 3 are already on the device; store what there is
+        logger.error(f"Crop repair for sensor {sensor_id} skipped, keeping {len(new_recommendations)} crops: {str(e)}")
+    await _enrich_crops(new_recommendations)
+    await crop_catalog.update_from(new_recommendations)
+    
+    # Store or update recommendations
+    if existing_session is not None:
+        # LOAD MORE: Append new crops to existing session
+        logger.info(f"Appending {len(new_recommendations)} new crops to existing session")
+        
+        existing_recommendations = existing_session["data"]["output"].get("recommendations", [])
+        all_recommendations = existing_recommendations + new_recommendations
+        
+        # Update the existing session document
+        db = mongodb.get_database()
+        await db["crop_recommendations"].update_one(
+            {"_id": existing_session["_id"]},
+            {"$set": {
+                "data.output.recommendations": all_recommendations,
+                "timestamp": datetime.now(timezone(timedelta(hours=8)))
+            }}
+        )
+        
+        logger.info(f"Session updated: {len(existing_recommendations)} + {len(new_recommendations)} = {len(all_recommendations)} total crops")
+    else:
+        # INITIAL: Create new session
+        logger.info(f"Creating new session with {len(new_recommendations)} crops")
+        session_id = await save_to_mongodb("crop_recommendations", storage_data)
+        session_index.add(session_id, storage_data)
+
+async def _stale_recommendations(sensor_id: str, sensor_data: HardwareSensorData, error: Exception) -> AutoRecommendationResponse:
+    """Answer from the sensor's latest stored session while Gemini is unavailable."""
+    unavailable = error if isinstance(error, CircuitOpenError) else CircuitOpenError(
+        gemini_breaker.name,
+        gemini_breaker.retry_after()
+    )
+    
+    # Load More needs new crops; stored ones would only repeat what the device has
+    if sensor_data.already_generated:
+        raise unavailable
+    
+    db = mongodb.get_database()
+    latest_session = await db["crop_recommendations"].find_one(
+        {"data.sensor_id": sensor_id},
+        sort=[("timestamp", -1)]
+    )
+    recommendations = (latest_session or {}).get("data", {}).get("output", {}).get("recommendations") or []
+    if not recommendations:
+        raise unavailable
+    
+    logger.warning(f"Gemini unavailable, serving stored recommendations for sensor {sensor_id} from {latest_session.get('timestamp')}")
+    return AutoRecommendationResponse(
+        success=True,
+        sensor_id=sensor_id,
+        top_3_crops=[rec["crop"] for rec in recommendations[:TOP_CROPS]],
+        total_crops_generated=len(recommendations),
+        stale=True,
+        message=f"Recommendation service unavailable. Returning stored recommendations from {latest_session.get('timestamp')}."
+    )
+
+async def process_hardware_readings(sensor_id: str, sensor_data: HardwareSensorData) -> AutoRecommendationResponse:
+    try:
+        db = mongodb.get_database()
+        sensors_collection = db["sensor_locations"]
+        recommendations_collection = db["crop_recommendations"]
+        
+        try:
+            sensor_location = await sensors_collection.find_one({"_id": ObjectId(sensor_id)})
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid sensor_id format: {str(e)}")
+        
+        if not sensor_location:
+            raise HTTPException(status_code=404, detail=f"Sensor {sensor_id} not found")
+        
+        location_info = _location_info(sensor_location)
+        
+        # Check if this is a "Load More" request (has already_generated crops)
+        is_load_more = sensor_data.already_generated and len(sensor_data.already_generated) > 0
+        
+        if is_load_more:
+            # LOAD MORE: Get existing session data to reuse context
+            logger.info(f"Load More request for sensor {sensor_id} - reusing existing session data")
+            
+            existing_session = await recommendations_collection.find_one(
+                {"data.sensor_id": sensor_id},
+                sort=[("timestamp", -1)]
+            )
+            
+            if not existing_session or "data" not in existing_session:
+                raise HTTPException(status_code=404, detail="No existing session found for Load More")
+            
+            # Reuse existing context and sensor data from the session
+            session_data = existing_session["data"]
+            context_data = session_data.get("context")
+            stored_sensor_data = session_data.get("input", {}).get("sensor_data", {})
+            
+            logger.info(f"Reusing context and sensor data from existing session")
+            
+            # Format the already_generated list
+            excluded = list(sensor_data.already_generated)
+            logger.info(f"Excluding {len(sensor_data.already_generated)} already generated crops")
+            
+            recommendation_input = {
+                "sensor_data": stored_sensor_data,
+                "location": location_info,
+                "sensor_id": sensor_id
+            }
+            
+        else:
+            sensor_values = _sensor_values(sensor_data)
+            await sensors_collection.update_one(
+                {"_id": sensor_location["_id"]},
+                {"$set": {"current_sensors": sensor_values, "last_updated": datetime.utcnow()}}
+            )
+            
+            # Readings that barely moved since the last session keep its recommendations
+            last_session = await recommendations_collection.find_one(
+                {"data.sensor_id": sensor_id, "data.input.sensor_data": {"$exists": True}},
+                sort=[("timestamp", -1)]
+            )
+            if not _needs_regeneration(sensor_id, sensor_values, last_session):
+                recommendations = last_session["data"]["output"]["recommendations"]
+                return AutoRecommendationResponse(
+                    success=True,
+                    sensor_id=sensor_id,
+                    top_3_crops=[rec["crop"] for rec in recommendations[:TOP_CROPS]],
+                    total_crops_generated=len(recommendations),
+                    unchanged=True,
+                    message="Readings have not changed enough to regenerate. Returning the current top 3 crops."
+                )
+            
+            # INITIAL REQUEST: Reuse a similar recent session, otherwise generate context first
+            reused = await _reuse_similar_session(sensor_id, location_info, sensor_values)
+            if reused is not None:
+                await save_to_mongodb("crop_recommendations", reused)
+                recommendations = reused["output"]["recommendations"]
+                return AutoRecommendationResponse(
+                    success=True,
+                    sensor_id=sensor_id,
+                    top_3_crops=[rec["crop"] for rec in recommendations[:TOP_CROPS]],
+                    total_crops_generated=len(recommendations),
+                    reused_session_id=reused["reused_from"],
+                    message=f"Reused {len(recommendations)} recommendations from a sensor with similar conditions. Top 3 crops returned."
+                )
+            
+            logger.info(f"Initial request for sensor {sensor_id} - generating context")
+            
+            # Try to reuse existing context if available
+            existing_context = await find_latest_context(sensor_id)
+            context_data = await _initial_context(sensor_id, sensor_location, sensor_data, existing_context)
+            
+            excluded = []
+            
+            recommendation_input = {
+                "sensor_data": _sensor_values(sensor_data),
+                "location": location_info,
+                "sensor_id": sensor_id
+            }
+        
+        # Generate recommendations (both initial and load more use same prompt)
+        logger.info(f"Generating 8 crop recommendations")
+        
+        await crop_catalog.refresh()
+        recommendation_prompt = _recommendation_prompt(context_data, recommendation_input, excluded)
+        
+        new_recommendations = []
+        crop_stream = stream_json_array(
+            recommendation_prompt,
+            "recommendations",
+            priority=Priority.HARDWARE,
+            response=RECOMMENDATIONS_RESPONSE
+        )
+        try:
+            # Only the top 3 names go back to the device; stop waiting once they are in
+            await _collect_valid_crops(crop_stream, new_recommendations, limit=TOP_CROPS)
+        except Exception as stream_error:
+            # Keep what already streamed in and ask only for the rest
+            logger.warning(f"Streaming generation failed for sensor {sensor_id} after {len(new_recommendations)} crops: {str(stream_error)}")
+            await crop_stream.aclose()
+            crop_stream = None
+            if not new_recommendations and gemini_breaker.is_open:
+                raise
+            await _repair_crops(sensor_id, context_data, recommendation_input, excluded, new_recommendations)
+            if not new_recommendations:
+                raise RuntimeError(f"No valid crops generated: {str(stream_error)}")
+        else:
+            if len(new_recommendations) < TOP_CROPS:
+                # The stream ended cleanly, but invalid or missing elements left it short
+                logger.warning(f"Crop stream for sensor {sensor_id} ended with {len(new_recommendations)} valid crops")
+                await crop_stream.aclose()
+                crop_stream = None
+                await _repair_crops(sensor_id, context_data, recommendation_input, excluded, new_recommendations)
+                if not new_recommendations:
+                    raise RuntimeError("No valid crops generated")
+        
+        storage_data = None
+        if not is_load_more:
+            storage_data = {
+                "sensor_id": sensor_id,
+                "input": {
+                    "sensor_data": sensor_data.dict(exclude={'already_generated'}),
+                    "location": location_info,
+                    "start_month": START_MONTH
+                },
+                "context": context_data,
+                "output": {
+                    "recommendations": new_recommendations
+                }
+            }
+        
+        # Remaining crops, thumbnails and the Mongo write complete after the response
+        spawn(
+            _finish_hardware_session(
+                sensor_id,
+                crop_stream,
+                new_recommendations,
+                context_data,
+                recommendation_input,
+                excluded,
+                storage_data=storage_data,
+                existing_session=existing_session if is_load_more else None
+            ),
+            name=f"hardware-session-{sensor_id}"
+        )
+        
+        top_3_crops = [rec["crop"] for rec in new_recommendations[:TOP_CROPS]]
+        generation_complete = crop_stream is None
+        
+        return AutoRecommendationResponse(
+            success=True,
+            sensor_id=sensor_id,
+            top_3_crops=top_3_crops,
+            total_crops_generated=len(new_recommendations),
+            generation_complete=generation_complete,
+            message=(
+                f"Successfully generated {len(new_recommendations)} recommendations. Top 3 crops returned."
+                if generation_complete else
+                "Top 3 crops returned. Remaining recommendations are being generated."
+            )
+        )
+        
+    except CircuitOpenError as e:
+        return await _stale_recommendations(sensor_id, sensor_data, e)
+    except HTTPException:
+        raise
+    except json.JSONDecodeError as e:
+        logger.error(f"JSON parsing error for hardware sensor {sensor_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to parse AI response: {str(e)}")
+    except Exception as e:
+        # Failures that just opened the circuit are part of the same outage
+        if gemini_breaker.is_open:
+            return await _stale_recommendations(sensor_id, sensor_data, e)
+        logger.error(f"Auto-recommendation error for hardware sensor {sensor_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to generate recommendations: {str(e)}")
+
+def _latest_per_sensor_pipeline(match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {"$match": match},
+        {"$sort": {"timestamp": -1}},
+        {"$group": {"_id": "$data.sensor_id", "doc": {"$first": "$$ROOT"}}}
+    ]
+
+def latest_contexts_pipeline(sensor_ids: List[str]) -> List[Dict[str, Any]]:
+    """Newest location_analysis document per sensor."""
+    return _latest_per_sensor_pipeline({"data.sensor_id": {"$in": sensor_ids}})
+
+def latest_sessions_pipeline(sensor_ids: List[str]) -> List[Dict[str, Any]]:
+    """Newest hardware session per sensor in crop_recommendations."""
+    return _latest_per_sensor_pipeline({"data.sensor_id": {"$in": sensor_ids}, "data.input.sensor_data": {"$exists": True}})
+
+async def _store_batch_sessions(sessions: List[Dict[str, Any]]) -> List[Optional[str]]:
+    # Slow generations may have used up the request deadline; the write gets its own
+    with deadline(HARDWARE_BATCH_STORE_TIMEOUT_SECONDS):
+        return await bulk_save_to_mongodb("crop_recommendations", sessions)
+
+async def process_hardware_batch(readings: List[HardwareBatchReading]) -> HardwareBatchResponse:
+    db = mongodb.get_database()
+    results: Dict[str, HardwareBatchResult] = {}
+    
+    pending = []
+    seen = set()
+    for reading in readings:
+        if reading.sensor_id in seen:
+            # One session per sensor; the first reading in the batch wins
+            logger.warning(f"Ignoring duplicate reading for sensor {reading.sensor_id} in batch")
+            continue
+        seen.add(reading.sensor_id)
+        
+        if not ObjectId.is_valid(reading.sensor_id):
+            results[reading.sensor_id] = HardwareBatchResult(success=False, error="Invalid sensor_id format")
+            continue
+        pending.append(reading)
+    
+    sensor_ids = [reading.sensor_id for reading in pending]
+    
+    # One query per collection for the whole batch
+    sensor_docs = {}
+    async for doc in db["sensor_locations"].find({"_id": {"$in": [ObjectId(sensor_id) for sensor_id in sensor_ids]}}):
+        sensor_docs[str(doc["_id"])] = doc
+    
+    latest_contexts = {}
+    async for group in db["location_analysis"].aggregate(latest_contexts_pipeline(sensor_ids)):
+        latest_contexts[group["_id"]] = group["doc"]
+    
+    latest_sessions = {}
+    async for group in db["crop_recommendations"].aggregate(latest_sessions_pipeline(sensor_ids)):
+        latest_sessions[group["_id"]] = group["doc"]
+    
+    semaphore = asyncio.Semaphore(HARDWARE_BATCH_CONCURRENCY)
+    
+    async def generate(reading: HardwareBatchReading) -> Dict[str, Any]:
+        async with semaphore:
+            sensor_location = sensor_docs[reading.sensor_id]
+            location_info = _location_info(sensor_location)
+            
+            reused = await _reuse_similar_session(reading.sensor_id, location_info, _sensor_values(reading))
+            if reused is not None:
+                return reused
+            
+            context_data = await _initial_context(
+                reading.sensor_id,
+                sensor_location,
+                reading,
+                latest_contexts.get(reading.sensor_id)
+            )
+            
+            recommendation_input = {
+                "sensor_data": _sensor_values(reading),
+                "location": location_info,
+                "sensor_id": reading.sensor_id
+            }
+            new_recommendations = await _request_crops(context_data, recommendation_input, [], HARDWARE_CROP_COUNT)
+            await _repair_crops(reading.sensor_id, context_data, recommendation_input, [], new_recommendations)
+            
+            if not new_recommendations:
+                raise ValueError("AI response contained no valid crops")
+            
+            await _enrich_crops(new_recommendations)
+            await crop_catalog.update_from(new_recommendations)
+            
+            return {
+                "sensor_id": reading.sensor_id,
+                "input": {
+                    "sensor_data": _sensor_values(reading),
+                    "location": location_info,
+                    "start_month": START_MONTH
+                },
+                "context": context_data,
+                "output": {
+                    "recommendations": new_recommendations
+                }
+            }
+    
+    runnable = []
+    for reading in pending:
+        if reading.sensor_id not in sensor_docs:
+            results[reading.sensor_id] = HardwareBatchResult(success=False, error=f"Sensor {reading.sensor_id} not found")
+            continue
+        
+        last_session = latest_sessions.get(reading.sensor_id)
+        if _needs_regeneration(reading.sensor_id, _sensor_values(reading), last_session):
+            runnable.append(reading)
+        else:
+            recommendations = last_session["data"]["output"]["recommendations"]
+            results[reading.sensor_id] = HardwareBatchResult(
+                success=True,
+                session_id=str(last_session["_id"]),
+                top_3_crops=[rec["crop"] for rec in recommendations[:TOP_CROPS]],
+                total_crops_generated=len(recommendations),
+                unchanged=True
+            )
+    
+    known_readings = [reading for reading in pending if reading.sensor_id in sensor_docs]
+    if known_readings:
+        await db["sensor_locations"].bulk_write([
+            UpdateOne(
+                {"_id": ObjectId(reading.sensor_id)},
+                {"$set": {"current_sensors": _sensor_values(reading), "last_updated": datetime.utcnow()}}
+            )
+            for reading in known_readings
+        ], ordered=False)
+    
+    outcomes = await asyncio.gather(*[generate(reading) for reading in runnable], return_exceptions=True)
+    
+    sessions = []
+    for reading, outcome in zip(runnable, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"Batch recommendation failed for sensor {reading.sensor_id}: {str(outcome)}")
+            results[reading.sensor_id] = HardwareBatchResult(success=False, error=f"Failed to generate recommendations: {str(outcome)}")
+        else:
+            sessions.append(outcome)
+    
+    if sessions:
+        try:
+            session_ids = await without_deadline(lambda: _store_batch_sessions(sessions))
+        except Exception as e:
+            logger.error(f"Batch session write failed: {str(e)}", exc_info=True)
+            session_ids = [None] * len(sessions)
+        if None in session_ids:
+            logger.error(f"{session_ids.count(None)} of {len(sessions)} batch sessions were not stored")
+        
+        for storage_data, session_id in zip(sessions, session_ids):
+            recommendations = storage_data["output"]["recommendations"]
+            if session_id is None:
+                results[storage_data["sensor_id"]] = HardwareBatchResult(success=False, error="Failed to store recommendations")
+            else:
+                session_index.add(session_id, storage_data)
+                results[storage_data["sensor_id"]] = HardwareBatchResult(
+                    success=True,
+                    session_id=session_id,
+                    top_3_crops=[rec["crop"] for rec in recommendations[:TOP_CROPS]],
+                    total_crops_generated=len(recommendations),
+                    reused_session_id=storage_data.get("reused_from")
+                )
+    
+    succeeded = sum(1 for result in results.values() if result.success)
+    return HardwareBatchResponse(
+        total=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        results=results
+    )
@@ -0,0 +1,219 @@
+import re
+import asyncio
+import hashlib
+import logging
+import httpx
+from urllib.parse import quote
+from typing import Dict, Any, List, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from app.core.config import (
+    HTTP_USER_AGENT,
+    IMAGE_STORE_ENABLED,
+    IMAGE_STORE_WIDTHS,
+    IMAGE_STORE_BASE_URL,
+    IMAGE_STORE_CONCURRENCY,
+    WIKIPEDIA_TIMEOUT_SECONDS
+)
+from app.core.database import mongodb
+from app.services.crop_catalog import crop_catalog, normalize_crop_name
+from app.services.background import spawn
+
+logger = logging.getLogger(__name__)
+
+BUCKET_NAME = "crop_images"
+
+# .../thumb/a/a5/Tomato.jpg/330px-Tomato.jpg
+_THUMB_URL = re.compile(r"^(?P<prefix>https?://upload\.wikimedia\.org/.+/thumb/.+/)\d+px-(?P<name>[^/]+)$")
+# .../a/a5/Tomato.jpg
+_ORIGINAL_URL = re.compile(r"^(?P<base>https?://upload\.wikimedia\.org/wikipedia/[^/]+)/(?P<path>[0-9a-f]/[0-9a-f]{2}/(?P<name>[^/]+))$")
+
+def variant_urls(source_url: str, widths: List[int]) -> List[Tuple[int, str]]:
+    """(width, url) per variant, resized by Wikimedia's thumbnailer.
+
+    Images not hosted on upload.wikimedia.org are stored as a single
+    variant of width 0.
+    """
+    match = _THUMB_URL.match(source_url)
+    if match:
+        return [(width, f"{match['prefix']}{width}px-{match['name']}") for width in widths]
+
+    match = _ORIGINAL_URL.match(source_url)
+    if match:
+        # SVGs are thumbnailed to PNG
+        name = match["name"] + (".png" if match["name"].lower().endswith(".svg") else "")
+        return [(width, f"{match['base']}/thumb/{match['path']}/{width}px-{name}") for width in widths]
+
+    return [(0, source_url)]
+
+def pick_variant(variants: List[Dict[str, Any]], width: int) -> Dict[str, Any]:
+    """Smallest variant at least `width` wide, else the largest."""
+    ordered = sorted(variants, key=lambda variant: variant["width"])
+    for variant in ordered:
+        if variant["width"] >= width:
+            return variant
+    return ordered[-1]
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+class ImageStore:
+    """Crop images served from GridFS instead of Wikimedia.
+
+    add_thumbnails() points image_url at {base_url}/images/{crop}; the first
+    time a crop is seen its image is downloaded in the background, once per
+    worker, in each of IMAGE_STORE_WIDTHS, and stored in the crop_images
+    bucket. Until then the route redirects to the Wikimedia URL.
+    """
+
+    def __init__(self, widths: List[int], concurrency: int, base_url: str, enabled: bool = True):
+        # Clients load image_url directly, so it must stay absolute
+        absolute = base_url.startswith(("http://", "https://"))
+        if enabled and not absolute:
+            logger.warning("IMAGE_STORE_ENABLED needs an absolute IMAGE_STORE_BASE_URL; handing out Wikimedia URLs")
+        self.enabled = enabled and absolute
+        self.base_url = base_url
+        self.widths = widths
+        self.client: Optional[httpx.AsyncClient] = None
+        self.semaphore = asyncio.Semaphore(concurrency)
+        # Variant metadata per crop key, so conditional requests skip GridFS
+        self.variants: Dict[str, List[Dict[str, Any]]] = {}
+        self.pending: Dict[str, asyncio.Task] = {}
+        # searchable_name as recommended per crop key; Wikipedia titles are case-sensitive
+        self.titles: Dict[str, str] = {}
+        self.stats = {
+            "crops_stored": 0,
+            "variants_stored": 0,
+            "downloads": 0,
+            "download_errors": 0,
+            "served": 0,
+            "not_modified": 0,
+            "redirects": 0
+        }
+
+    async def connect(self):
+        self.client = httpx.AsyncClient(
+            timeout=WIKIPEDIA_TIMEOUT_SECONDS,
+            headers={"User-Agent": HTTP_USER_AGENT},
+            follow_redirects=True
+        )
+
+    async def disconnect(self):
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+    def _bucket(self) -> Optional[AsyncIOMotorGridFSBucket]:
+        if mongodb.client is None:
+            return None
+        return AsyncIOMotorGridFSBucket(mongodb.get_database(), bucket_name=BUCKET_NAME)
+
+    def local_url(self, searchable_name: str) -> str:
+        return f"{self.base_url}/images/{quote(normalize_crop_name(searchable_name))}"
+
+    def title(self, key: str) -> Optional[str]:
+        """The Wikipedia title for a crop key, as last recommended or as catalogued."""
+        if key in self.titles:
+            return self.titles[key]
+        entry = crop_catalog.entries.get(key)
+        return entry.get("searchable_name") if entry else None
+
+    def localize(self, searchable_name: str, source_url: Optional[str]) -> Optional[str]:
+        """The URL to hand out for a crop image, storing it in the background if needed."""
+        if not self.enabled or not source_url or self.client is None:
+            return source_url
+        self.titles[normalize_crop_name(searchable_name)] = searchable_name
+        self.schedule(searchable_name, source_url)
+        return self.local_url(searchable_name)
+
+    def schedule(self, searchable_name: str, source_url: str):
+        key = normalize_crop_name(searchable_name)
+        if key in self.variants or key in self.pending:
+            return
+        task = spawn(self._store(key, source_url), name=f"image-store-{key}")
+        self.pending[key] = task
+        task.add_done_callback(lambda _: self.pending.pop(key, None))
+
+    async def get_variants(self, key: str) -> List[Dict[str, Any]]:
+        if key in self.variants:
+            return self.variants[key]
+
+        bucket = self._bucket()
+        if bucket is None:
+            return []
+        variants = []
+        async for grid_out in bucket.find({"metadata.crop": key}):
+            variants.append({"file_id": grid_out._id, **grid_out.metadata})
+        if variants:
+            self.variants[key] = variants
+        return variants
+
+    async def _download(self, url: str) -> Optional[Tuple[bytes, str]]:
+        self.stats["downloads"] += 1
+        try:
+            response = await self.client.get(url)
+            response.raise_for_status()
+        except Exception as e:
+            self.stats["download_errors"] += 1
+            logger.warning(f"Could not download crop image {url}: {str(e)}")
+            return None
+        return response.content, response.headers.get("content-type", "application/octet-stream")
+
+    async def _store_variant(self, bucket: AsyncIOMotorGridFSBucket, key: str, width: int, url: str) -> Optional[Dict[str, Any]]:
+        downloaded = await self._download(url)
+        if downloaded is None:
+            return None
+        content, content_type = downloaded
+        metadata = {
+            "crop": key,
+            "width": width,
+            "content_type": content_type,
+            "etag": f'"{hashlib.sha1(content).hexdigest()}"',
+            "length": len(content),
+            "source_url": url
+        }
+        file_id = await bucket.upload_from_stream(f"{key}/{width}", content, metadata=metadata)
+        return {"file_id": file_id, **metadata}
+
+    async def _store(self, key: str, source_url: str):
+        async with self.semaphore:
+            bucket = self._bucket()
+            if bucket is None or await self.get_variants(key):
+                return
+
+            sources = variant_urls(source_url, self.widths)
+            variants = []
+            for width, url in sources:
+                variant = await self._store_variant(bucket, key, width, url)
+                if variant is not None:
+                    variants.append(variant)
+
+            if not variants and sources != [(0, source_url)]:
+                # Wikimedia does not upscale, so images narrower than every width are stored as they are
+                variant = await self._store_variant(bucket, key, 0, source_url)
+                if variant is not None:
+                    variants.append(variant)
+
+            if not variants:
+                return
+            self.variants[key] = variants
+            self.stats["crops_stored"] += 1
+            self.stats["variants_stored"] += len(variants)
+            logger.info(f"Stored {len(variants)} image variants for {key}")
+
+    async def read(self, variant: Dict[str, Any]) -> bytes:
+        stream = await self._bucket().open_download_stream(variant["file_id"])
+        return await stream.read()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "widths": self.widths,
+            "crops_cached": len(self.variants),
+            "pending": len(self.pending)
+        }
+
+image_store = ImageStore(IMAGE_STORE_WIDTHS, IMAGE_STORE_CONCURRENCY, IMAGE_STORE_BASE_URL, enabled=IMAGE_STORE_ENABLED)
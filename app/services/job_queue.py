@@ -0,0 +1,188 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from app.core.config import (
+    HARDWARE_JOB_WORKERS,
+    HARDWARE_JOB_LEASE_SECONDS,
+    HARDWARE_JOB_MAX_ATTEMPTS,
+    HARDWARE_JOB_POLL_INTERVAL
+)
+from app.core.database import mongodb
+from app.core.deadline import deadline
+from app.models.schemas import HardwareSensorData
+from app.services.hardware_service import process_hardware_readings
+from app.services.single_flight import WORKER_ID
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "hardware_jobs"
+
+class HardwareJobQueue:
+    """Mongo-backed queue for hardware readings submitted with ?async=true.
+
+    Jobs are claimed with a lease, so a job whose worker process died is
+    picked up again once the lease expires, up to HARDWARE_JOB_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, worker_count: int, lease_seconds: int, max_attempts: int, poll_interval: float):
+        self.worker_count = worker_count
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.workers: List[asyncio.Task] = []
+        self.wakeup: Optional[asyncio.Event] = None
+        self.stats = {
+            "enqueued": 0,
+            "completed": 0,
+            "failed": 0,
+            "retried": 0
+        }
+
+    def _collection(self):
+        return mongodb.get_database()[COLLECTION_NAME]
+
+    async def start(self):
+        self.wakeup = asyncio.Event()
+        try:
+            # Jobs whose worker died on the last attempt will never be claimed again
+            await self._collection().update_many(
+                {
+                    "status": "running",
+                    "lease_expires_at": {"$lte": datetime.utcnow()},
+                    "attempts": {"$gte": self.max_attempts}
+                },
+                {"$set": {
+                    "status": "failed",
+                    "error": "Worker stopped while processing the job",
+                    "finished_at": datetime.utcnow()
+                }}
+            )
+        except Exception as e:
+            logger.warning(f"Could not recover hardware jobs: {str(e)}")
+
+        self.workers = [
+            asyncio.create_task(self._worker(), name=f"hardware-job-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def enqueue(self, sensor_id: str, sensor_data: HardwareSensorData) -> str:
+        now = datetime.utcnow()
+        result = await self._collection().insert_one({
+            "sensor_id": sensor_id,
+            "payload": sensor_data.dict(),
+            "status": "queued",
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None
+        })
+        self.stats["enqueued"] += 1
+        if self.wakeup is not None:
+            self.wakeup.set()
+        return str(result.inserted_id)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self._collection().find_one({"_id": ObjectId(job_id)})
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        return await self._collection().find_one_and_update(
+            {
+                "$or": [
+                    {"status": "queued"},
+                    {"status": "running", "lease_expires_at": {"$lte": now}}
+                ],
+                "attempts": {"$lt": self.max_attempts}
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "worker": WORKER_ID,
+                    "started_at": now,
+                    "updated_at": now,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds)
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.error(f"Failed to claim hardware job: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            if job is None:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(job)
+
+    async def _finish(self, job: Dict[str, Any], changes: Dict[str, Any]):
+        now = datetime.utcnow()
+        await self._collection().update_one(
+            {"_id": job["_id"], "worker": WORKER_ID},
+            {"$set": {**changes, "updated_at": now}}
+        )
+
+    async def _run(self, job: Dict[str, Any]):
+        job_id = str(job["_id"])
+        logger.info(f"Processing hardware job {job_id} for sensor {job['sensor_id']} (attempt {job['attempts']})")
+        try:
+            # A job must not outlive its lease, or another worker would run it too
+            with deadline(self.lease_seconds):
+                result = await process_hardware_readings(job["sensor_id"], HardwareSensorData(**job["payload"]))
+            await self._finish(job, {
+                "status": "done",
+                "result": result.model_dump(),
+                "error": None,
+                "finished_at": datetime.utcnow()
+            })
+            self.stats["completed"] += 1
+        except Exception as e:
+            # 4xx failures (unknown sensor, missing session) will not succeed on retry
+            retryable = not isinstance(e, HTTPException) or e.status_code >= 500
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            logger.error(f"Hardware job {job_id} failed: {error}")
+            
+            if retryable and job["attempts"] < self.max_attempts:
+                await self._finish(job, {"status": "queued", "error": error})
+                self.stats["retried"] += 1
+            else:
+                await self._finish(job, {"status": "failed", "error": error, "finished_at": datetime.utcnow()})
+                self.stats["failed"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "workers": len(self.workers)
+        }
+
+hardware_jobs = HardwareJobQueue(
+    HARDWARE_JOB_WORKERS,
+    HARDWARE_JOB_LEASE_SECONDS,
+    HARDWARE_JOB_MAX_ATTEMPTS,
+    HARDWARE_JOB_POLL_INTERVAL
+)
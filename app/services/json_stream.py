@@ -0,0 +1,87 @@
+import re
+import json
+from typing import Any, List, Optional
+
+_TOP_LEVEL_ARRAY = re.compile(r"^\s*(?:```(?:json)?\s*)?\[")
+
+class JsonArrayStreamParser:
+    """Extracts complete elements of a JSON array from text that arrives in chunks.
+
+    The array is the value of `key` in the top-level object, or the top-level
+    value itself when the model answers with a bare list. Object and array
+    elements are yielded as soon as their closing bracket arrives; elements
+    that do not parse are counted in `errors` and skipped.
+    """
+
+    def __init__(self, key: Optional[str] = None):
+        self.key = key
+        self.buffer = ""
+        self.position = 0
+        self.in_array = False
+        self.complete = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.element_start = None
+        self.errors = 0
+
+    def _find_array_start(self) -> bool:
+        match = _TOP_LEVEL_ARRAY.match(self.buffer)
+        if not match and self.key:
+            match = re.search(r'"' + re.escape(self.key) + r'"\s*:\s*\[', self.buffer)
+        if not match:
+            return False
+
+        self.in_array = True
+        self.buffer = self.buffer[match.end():]
+        self.position = 0
+        return True
+
+    def feed(self, text: str) -> List[Any]:
+        if self.complete:
+            return []
+
+        self.buffer += text
+        if not self.in_array and not self._find_array_start():
+            return []
+
+        elements = []
+        buffer = self.buffer
+        i = self.position
+        while i < len(buffer) and not self.complete:
+            char = buffer[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                if self.depth == 0:
+                    self.element_start = i
+                self.depth += 1
+            elif char in "}]":
+                if self.depth == 0:
+                    # Closing bracket of the array itself
+                    self.complete = char == "]"
+                else:
+                    self.depth -= 1
+                    if self.depth == 0 and self.element_start is not None:
+                        try:
+                            elements.append(json.loads(buffer[self.element_start:i + 1]))
+                        except json.JSONDecodeError:
+                            self.errors += 1
+                        self.element_start = None
+            i += 1
+
+        # Drop text that is no longer needed so long streams stay small
+        keep_from = self.element_start if self.element_start is not None else i
+        self.buffer = buffer[keep_from:]
+        self.position = i - keep_from
+        if self.element_start is not None:
+            self.element_start = 0
+
+        return elements
@@ -0,0 +1,123 @@
+import copy
+import json
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+from cachetools import TTLCache
+from app.core.config import LLM_CACHE_ENABLED, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS
+from app.core.database import mongodb
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "llm_cache"
+
+class LLMCache:
+    """Two-tier cache for parsed Gemini responses.
+
+    Entries are keyed on a hash of the model, generation config and prompt,
+    kept in an in-process LRU and mirrored to a Mongo collection shared by
+    every worker. Both tiers expire entries after LLM_CACHE_TTL_SECONDS.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int, enabled: bool = True):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.memory = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        self.stats = {
+            "memory_hits": 0,
+            "mongo_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "stores": 0,
+            "errors": 0
+        }
+
+    @staticmethod
+    def make_key(model: str, generation_config: Dict[str, Any], prompt: str) -> str:
+        material = json.dumps(
+            {"model": model, "generation_config": generation_config, "prompt": prompt},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _collection(self):
+        if mongodb.client is None:
+            return None
+        return mongodb.get_database()[COLLECTION_NAME]
+
+    async def ensure_indexes(self):
+        collection = self._collection()
+        if collection is None:
+            return
+        try:
+            # Mongo's TTL monitor removes documents once expires_at has passed
+            await collection.create_index("expires_at", expireAfterSeconds=0)
+        except Exception as e:
+            logger.warning(f"Could not create LLM cache TTL index: {str(e)}")
+
+    async def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+
+        if key in self.memory:
+            self.stats["memory_hits"] += 1
+            return copy.deepcopy(self.memory[key])
+
+        collection = self._collection()
+        if collection is not None:
+            try:
+                doc = await collection.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+                if doc:
+                    self.stats["mongo_hits"] += 1
+                    self.memory[key] = doc["response"]
+                    return copy.deepcopy(doc["response"])
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"LLM cache lookup failed: {str(e)}")
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Any, model: str):
+        if not self.enabled:
+            return
+
+        self.memory[key] = copy.deepcopy(value)
+        self.stats["stores"] += 1
+
+        collection = self._collection()
+        if collection is None:
+            return
+
+        now = datetime.utcnow()
+        try:
+            await collection.replace_one(
+                {"_id": key},
+                {
+                    "model": model,
+                    "response": value,
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl_seconds)
+                },
+                upsert=True
+            )
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"LLM cache store failed: {str(e)}")
+
+    def record_bypass(self):
+        self.stats["bypassed"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self.stats["memory_hits"] + self.stats["mongo_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "memory_entries": len(self.memory),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+        }
+
+llm_cache = LLMCache(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS, enabled=LLM_CACHE_ENABLED)
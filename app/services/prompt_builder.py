@@ -0,0 +1,171 @@
+import re
+import json
+import logging
+from typing import Dict, Any, List, Optional
+from app.core.config import CHAT_PROMPT_TOKEN_BUDGET
+from app.services.prompts import CHAT_PROMPT
+from app.services.rate_limiter import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Always sent so the model can name, rank and tell planted crops apart
+BASE_FIELDS = ["crop", "category", "is_top_3", "planted"]
+
+# Sections of a crop that answer each kind of question (English and Tagalog keywords)
+TOPICS = {
+    "economics": (
+        ["economics", "market_strategy"],
+        ["cost", "price", "profit", "budget", "roi", "revenue", "income", "money", "expensive", "cheap",
+         "peso", "₱", "kita", "gastos", "presyo", "puhunan", "mahal", "mura"]
+    ),
+    "market": (
+        ["market_strategy"],
+        ["sell", "market", "buyer", "demand", "export", "benta", "bentahan", "palengke"]
+    ),
+    "growth": (
+        ["growth_requirements", "planting_schedule"],
+        ["water", "soil", "sun", "light", "temperature", "grow", "harvest", "days", "cycle", "fast", "quick",
+         "tubig", "lupa", "araw", "ani", "aanihin", "tanim"]
+    ),
+    "schedule": (
+        ["planting_schedule"],
+        ["plant", "schedule", "when", "intercrop", "succession", "kailan", "itanim"]
+    ),
+    "risk": (
+        ["tolerances", "risk_assessment"],
+        ["pest", "disease", "risk", "typhoon", "flood", "drought", "insect", "salinity", "shade",
+         "peste", "sakit", "bagyo", "baha", "tagtuyot", "insekto"]
+    ),
+    "management": (
+        ["management"],
+        ["labor", "work", "manpower", "worker", "organic", "irrigation", "trellis", "machine", "effort",
+         "trabaho", "tao", "patubig"]
+    ),
+    "reasoning": (
+        ["scores", "reasoning"],
+        ["why", "reason", "recommend", "best", "suggest", "compare", "score", "bakit", "pinakamaganda"]
+    )
+}
+
+# Used when the question does not match any topic
+SUMMARY_FIELDS = {
+    "scientific_name": None,
+    "scores": ["overall_score", "confidence_pct"],
+    "growth_requirements": ["crop_cycle_days", "water_requirement"],
+    "economics": ["estimated_cost_php", "estimated_revenue_php", "roi_pct"],
+    "market_strategy": ["demand_level", "current_market_price_php_per_kg"],
+    "reasoning": None
+}
+
+def _compact(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+def _question_fields(question: str) -> Optional[Dict[str, Any]]:
+    words = re.findall(r"[\w₱]+", question.lower())
+    fields = {}
+    for sections, keywords in TOPICS.values():
+        # Short keywords must match a whole word, longer ones also match inflections
+        if any(word == keyword or (len(keyword) >= 4 and word.startswith(keyword)) for word in words for keyword in keywords):
+            fields.update({section: None for section in sections})
+    return fields or None
+
+def _project(crop: Dict[str, Any], fields: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if fields is None:
+        return crop
+
+    projected = {name: crop[name] for name in BASE_FIELDS if name in crop}
+    for name, subfields in fields.items():
+        value = crop.get(name)
+        if value is None:
+            continue
+        if subfields and isinstance(value, dict):
+            value = {key: value[key] for key in subfields if key in value}
+        projected[name] = value
+    return projected
+
+def _crop_names(crop: Dict[str, Any]) -> List[str]:
+    # "Ampalaya - Jade 20" is also asked about as just "Ampalaya"
+    name = crop.get("crop") or ""
+    names = [name, name.split(" - ")[0], crop.get("searchable_name") or ""]
+    return [name.strip() for name in names if name.strip()]
+
+def _rank(crop: Dict[str, Any]) -> float:
+    return (crop.get("scores") or {}).get("overall_score") or 0.0
+
+def build_chat_prompt(
+    user_message: str,
+    sensor_id: str,
+    input_data: Dict[str, Any],
+    context_data: Any,
+    recommendations: List[Dict[str, Any]],
+    token_budget: int = CHAT_PROMPT_TOKEN_BUDGET
+) -> str:
+    """Fill CHAT_PROMPT with only the crop fields the question needs.
+
+    Crops named in the question are sent in full and always kept. If the
+    prompt is still over `token_budget`, the lowest-scoring crops are dropped.
+    """
+    question = user_message.lower()
+    fields = _question_fields(user_message) or SUMMARY_FIELDS
+
+    crops = []
+    for index, crop in enumerate(recommendations):
+        mentioned = any(
+            re.search(r"\b" + re.escape(name.lower()) + r"\b", question)
+            for name in _crop_names(crop)
+        )
+        crops.append({
+            "index": index,
+            "mentioned": mentioned,
+            "text": _compact(_project(crop, None if mentioned else fields))
+        })
+
+    if isinstance(context_data, str):
+        context_str = context_data
+    else:
+        context_str = _compact(context_data)
+
+    def render(included: List[Dict[str, Any]]) -> str:
+        crops_str = "[" + ",".join(crop["text"] for crop in included) + "]"
+        omitted = len(crops) - len(included)
+        if omitted:
+            crops_str += f"\n({omitted} lower-ranked crops omitted)"
+        return CHAT_PROMPT.format(
+            user_message=user_message,
+            sensor_id=sensor_id,
+            location=input_data.get('location', 'Unknown'),
+            crop_category=input_data.get('crop_category', 'N/A'),
+            budget=f"{input_data.get('budget_php', 0):,.2f}",
+            land_size=input_data.get('land_size_ha', 0),
+            manpower=input_data.get('manpower', 0),
+            waiting_tolerance=input_data.get('waiting_tolerance_days', 0),
+            context_data=context_str,
+            recommendations=crops_str
+        )
+
+    # Drop candidates from the end: unmentioned crops, lowest score first
+    drop_order = sorted(
+        (crop for crop in crops if not crop["mentioned"]),
+        key=lambda crop: (_rank(recommendations[crop["index"]]), -crop["index"])
+    )
+    dropped = set()
+    prompt = render(crops)
+    tokens = estimate_tokens(prompt)
+    for crop in drop_order:
+        if tokens <= token_budget or len(dropped) == len(crops) - 1:
+            break
+        dropped.add(crop["index"])
+        tokens -= estimate_tokens(crop["text"])
+
+    if dropped:
+        prompt = render([crop for crop in crops if crop["index"] not in dropped])
+        tokens = estimate_tokens(prompt)
+
+    full_tokens = estimate_tokens(CHAT_PROMPT) + estimate_tokens(
+        json.dumps(context_data, indent=2) + json.dumps(recommendations, indent=2)
+    )
+    logger.info(
+        f"Chat prompt ~{tokens} tokens for {len(crops) - len(dropped)}/{len(crops)} crops "
+        f"(saved ~{max(0, full_tokens - tokens)} of ~{full_tokens})"
+    )
+    return prompt
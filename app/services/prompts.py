@@ -63,6 +63,11 @@ FARMER PROFILE & SENSORS:
 
 Generate detailed crop recommendations as a JSON object with key "recommendations" containing an array of crop objects.
 
+CATALOGUED CROPS (static agronomic data already on file):
+{catalogued_crops}
+
+For a crop whose searchable_name is listed under CATALOGUED CROPS, set "scientific_name", "growth_requirements", "tolerances" and "management" to null; they are filled in from the catalog. Give them in full for every other crop.
+
 Each recommendation must include ALL these fields:
 
 {{
@@ -215,10 +220,20 @@ SENSOR READINGS:
 ALREADY GENERATED CROPS (DO NOT REPEAT THESE):
 {already_generated}
 
-Generate detailed crop recommendations as a JSON object with key "recommendations" containing an array of exactly 8 crop objects. 
+CANDIDATE CROPS (pre-ranked by how well their temperature, water, sunlight and shade needs fit the sensor readings, best first):
+{candidate_crops}
+
+When candidates are listed, choose your crops from them; only propose other crops if fewer than {crop_count} candidates suit the context.
+
+Generate detailed crop recommendations as a JSON object with key "recommendations" containing an array of exactly {crop_count} crop objects. 
 Please ensure diversity in crop types (Vegetables, Fruits, Cereals, Legumes, Cash crops, Fodder, Herbs, Ornamentals).
 
-CRITICAL: Your 8 crops MUST be completely different from the crops listed above in "ALREADY GENERATED CROPS"!
+CRITICAL: Your {crop_count} crops MUST be completely different from the crops listed above in "ALREADY GENERATED CROPS"!
+
+CATALOGUED CROPS (static agronomic data already on file):
+{catalogued_crops}
+
+For a crop whose searchable_name is listed under CATALOGUED CROPS, set "scientific_name", "growth_requirements", "tolerances" and "management" to null; they are filled in from the catalog. Give them in full for every other crop.
 
 Each recommendation must include ALL these fields:
 
@@ -312,7 +327,7 @@ Each recommendation must include ALL these fields:
 }}
 
 CRITICAL REQUIREMENTS:
-1. Return EXACTLY 8 selected recommendations, ranked by overall_score descending
+1. Return EXACTLY {crop_count} selected recommendations, ranked by overall_score descending
 2. Base recommendations SOLELY on sensor readings (soil moisture, temperature, humidity, light)
 3. Use the contextual weather and market data to influence season_score and market_score
 4. Confidence_pct should reflect sensor data quality (basic 4 sensors = moderate confidence 60-75%)
@@ -0,0 +1,167 @@
+import time
+import heapq
+import asyncio
+import itertools
+from collections import deque
+from enum import IntEnum
+from typing import Dict, Any, List
+from app.core.config import GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE
+
+CHARS_PER_TOKEN = 4
+
+class Priority(IntEnum):
+    HARDWARE = 0
+    INTERACTIVE = 1
+    FILTER = 2
+    PREWARM = 3
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+class TokenBucket:
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def seconds_until(self, amount: float) -> float:
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+class GeminiScheduler:
+    """Token-bucket admission control for every Gemini request.
+
+    Requests are admitted against requests-per-minute and tokens-per-minute
+    budgets (per process). When the budget is exhausted callers queue and are
+    released strictly by priority, then arrival order. A 429 from Gemini
+    pauses all admissions for the advised back-off.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.queue: List[tuple] = []
+        self.sequence = itertools.count()
+        self.paused_until = 0.0
+        self.timer = None
+        self.waits = {priority: deque(maxlen=500) for priority in Priority}
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "rate_limited": 0
+        }
+
+    def _delay_for(self, estimated_tokens: int, now: float) -> float:
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        return max(
+            self.paused_until - now,
+            self.requests.seconds_until(1),
+            self.tokens.seconds_until(estimated_tokens)
+        )
+
+    def _admit(self, estimated_tokens: int):
+        self.requests.consume(1)
+        self.tokens.consume(estimated_tokens)
+        self.stats["admitted"] += 1
+
+    async def acquire(self, priority: Priority, estimated_tokens: int):
+        start = time.monotonic()
+
+        if not self.queue and self._delay_for(estimated_tokens, start) <= 0:
+            self._admit(estimated_tokens)
+            self.waits[priority].append(0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.queue, (int(priority), next(self.sequence), future, estimated_tokens))
+        self.stats["queued"] += 1
+        self._rearm()
+
+        await future
+        self.waits[priority].append(time.monotonic() - start)
+
+    def try_acquire(self, estimated_tokens: int) -> bool:
+        # For optional extra requests: admit only if nobody is queued and budget is free now
+        if self.queue or self._delay_for(estimated_tokens, time.monotonic()) > 0:
+            return False
+        self._admit(estimated_tokens)
+        return True
+
+    def _dispatch(self):
+        self.timer = None
+        while self.queue:
+            _, _, future, estimated_tokens = self.queue[0]
+            if future.done():
+                # Caller was cancelled while waiting
+                heapq.heappop(self.queue)
+                continue
+
+            delay = self._delay_for(estimated_tokens, time.monotonic())
+            if delay > 0:
+                self.timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+
+            heapq.heappop(self.queue)
+            self._admit(estimated_tokens)
+            future.set_result(None)
+
+    def _rearm(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        self._dispatch()
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int):
+        # Estimates come from prompt length; charge the real usage once known
+        self.tokens.level -= actual_tokens - estimated_tokens
+
+    def penalize(self, seconds: float):
+        self.stats["rate_limited"] += 1
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        if self.queue:
+            self._rearm()
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        depth = {priority.name.lower(): 0 for priority in Priority}
+        for priority, _, future, _ in self.queue:
+            if not future.done():
+                depth[Priority(priority).name.lower()] += 1
+
+        wait_ms = {}
+        for priority, samples in self.waits.items():
+            ordered = sorted(samples)
+            wait_ms[priority.name.lower()] = {
+                "samples": len(ordered),
+                "avg": round(sum(ordered) / len(ordered) * 1000, 1) if ordered else 0.0,
+                "p50": round(_percentile(ordered, 0.50) * 1000, 1),
+                "p95": round(_percentile(ordered, 0.95) * 1000, 1),
+                "max": round(_percentile(ordered, 1.0) * 1000, 1)
+            }
+
+        return {
+            **self.stats,
+            "queue_depth": sum(depth.values()),
+            "queue_depth_by_priority": depth,
+            "wait_ms_by_priority": wait_ms,
+            "paused_for_seconds": round(max(0.0, self.paused_until - now), 2),
+            "request_budget_remaining": round(self.requests.level, 2),
+            "token_budget_remaining": round(self.tokens.level)
+        }
+
+gemini_scheduler = GeminiScheduler(GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE)
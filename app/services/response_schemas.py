@@ -0,0 +1,87 @@
+from typing import Dict, Any, Iterable, Type
+from pydantic import BaseModel, TypeAdapter
+from app.models.schemas import ContextAnalysisOutput, GeneratedRecommendationOutput, FilterRecommendationOutput
+
+# Filled in by the server after generation, never asked of the model
+SERVER_FIELDS = {"image_url", "planted", "is_top_3"}
+
+_TYPES = {
+    "string": "STRING",
+    "number": "NUMBER",
+    "integer": "INTEGER",
+    "boolean": "BOOLEAN",
+    "array": "ARRAY",
+    "object": "OBJECT"
+}
+
+def strip_code_fence(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    elif text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+def to_gemini_schema(model: Type[BaseModel], exclude: Iterable[str] = ()) -> Dict[str, Any]:
+    """Convert a Pydantic model to the OpenAPI subset accepted as `responseSchema`.
+
+    Gemini does not resolve $ref, so definitions are inlined. Every remaining
+    property is required and keeps the model's field order.
+    """
+    schema = model.model_json_schema()
+    definitions = schema.get("$defs", {})
+    exclude = set(exclude)
+
+    def convert(node: Dict[str, Any]) -> Dict[str, Any]:
+        if "$ref" in node:
+            return convert(definitions[node["$ref"].split("/")[-1]])
+
+        if "anyOf" in node:
+            options = [option for option in node["anyOf"] if option.get("type") != "null"]
+            converted = convert(options[0])
+            if len(options) < len(node["anyOf"]):
+                converted["nullable"] = True
+            return converted
+
+        if "const" in node:
+            return {"type": "STRING", "enum": [str(node["const"])]}
+        if "enum" in node:
+            return {"type": "STRING", "enum": [str(value) for value in node["enum"]]}
+
+        node_type = node.get("type", "string")
+        if node_type == "object":
+            properties = {
+                name: convert(value)
+                for name, value in node.get("properties", {}).items()
+                if name not in exclude
+            }
+            return {
+                "type": "OBJECT",
+                "properties": properties,
+                "required": list(properties),
+                "propertyOrdering": list(properties)
+            }
+        if node_type == "array":
+            return {"type": "ARRAY", "items": convert(node.get("items", {}))}
+        return {"type": _TYPES[node_type]}
+
+    return convert(schema)
+
+class ResponseFormat:
+    """Response schema plus a precompiled validator for one kind of JSON prompt."""
+
+    def __init__(self, name: str, model: Type[BaseModel], exclude: Iterable[str] = ()):
+        self.name = name
+        self.adapter = TypeAdapter(model)
+        self.schema = to_gemini_schema(model, exclude)
+
+    def parse(self, text: str) -> Dict[str, Any]:
+        # Raises json/pydantic ValidationError on bad or truncated output
+        return self.adapter.dump_python(self.adapter.validate_json(strip_code_fence(text)))
+
+CONTEXT_RESPONSE = ResponseFormat("context", ContextAnalysisOutput)
+# Catalog fields may be null here; callers merge them in from the crop catalog
+RECOMMENDATIONS_RESPONSE = ResponseFormat("recommendations", GeneratedRecommendationOutput, SERVER_FIELDS)
+FILTER_RESPONSE = ResponseFormat("filter", FilterRecommendationOutput, SERVER_FIELDS)
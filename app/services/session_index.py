@@ -0,0 +1,166 @@
+import time
+import logging
+from datetime import timezone
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from app.core.config import (
+    START_MONTH,
+    SESSION_REUSE_ENABLED,
+    SESSION_REUSE_MAX_DISTANCE,
+    SESSION_REUSE_MAX_AGE_HOURS,
+    SESSION_INDEX_MAX_SESSIONS
+)
+from app.core.database import mongodb
+
+logger = logging.getLogger(__name__)
+
+# Readings are divided by these before comparing, so a distance of 1.0 is
+# roughly one unit of "noticeably different" on a single sensor
+SENSOR_SCALES = {
+    "soil_moisture_pct": 5.0,
+    "temperature_c": 1.5,
+    "humidity_pct": 5.0,
+    "light_lux": 5000.0
+}
+FEATURES = list(SENSOR_SCALES)
+_SCALES = np.array([SENSOR_SCALES[name] for name in FEATURES])
+
+def sensor_vector(sensor_data: Dict[str, Any]) -> Optional[np.ndarray]:
+    try:
+        return np.array([float(sensor_data[name]) for name in FEATURES]) / _SCALES
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def _location_key(location: Dict[str, Any], start_month: int) -> Tuple[str, int]:
+    return (str(location.get("location_string", "")).strip().lower(), int(start_month))
+
+class _Bucket:
+    """Sessions for one location and start month, as parallel arrays."""
+
+    def __init__(self):
+        self.vectors = np.empty((0, len(FEATURES)))
+        self.created = np.empty(0)
+        self.session_ids: List[str] = []
+
+    def add(self, session_id: str, vector: np.ndarray, created: float, limit: int):
+        self.vectors = np.vstack([self.vectors, vector])[-limit:]
+        self.created = np.append(self.created, created)[-limit:]
+        self.session_ids = (self.session_ids + [session_id])[-limit:]
+
+    def remove(self, session_id: str):
+        if session_id not in self.session_ids:
+            return
+        keep = np.array([existing != session_id for existing in self.session_ids])
+        self.vectors = self.vectors[keep]
+        self.created = self.created[keep]
+        self.session_ids = [existing for existing in self.session_ids if existing != session_id]
+
+class SessionIndex:
+    """In-memory nearest-neighbour index over stored hardware sessions.
+
+    Sessions are grouped by location and start month and compared on their
+    scaled sensor readings. A new reading within SESSION_REUSE_MAX_DISTANCE of
+    a session younger than SESSION_REUSE_MAX_AGE_HOURS can reuse its crops
+    instead of a new generation. Sessions that were themselves reused are not
+    indexed, so reuse never chains away from a generated session.
+    """
+
+    def __init__(self, max_distance: float, max_age_hours: float, max_sessions: int, enabled: bool = True):
+        self.enabled = enabled
+        self.max_distance = max_distance
+        self.max_age_seconds = max_age_hours * 3600
+        self.max_sessions = max_sessions
+        self.buckets: Dict[Tuple[str, int], _Bucket] = {}
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stale_entries": 0
+        }
+
+    async def load(self):
+        """Rebuild the index from the most recent stored sessions."""
+        self.buckets = {}
+        if not self.enabled or mongodb.client is None:
+            return
+
+        since = time.time() - self.max_age_seconds
+        cursor = mongodb.get_database()["crop_recommendations"].find(
+            {"data.input.sensor_data": {"$exists": True}, "data.reused_from": {"$exists": False}},
+            {"timestamp": 1, "data.input": 1}
+        ).sort("timestamp", -1).limit(self.max_sessions)
+
+        loaded = 0
+        try:
+            async for doc in cursor:
+                timestamp = doc.get("timestamp")
+                if timestamp is None:
+                    continue
+                if timestamp.tzinfo is None:
+                    # pymongo returns naive UTC datetimes
+                    timestamp = timestamp.replace(tzinfo=timezone.utc)
+                created = timestamp.timestamp()
+                if created < since:
+                    break
+                if self._add(str(doc["_id"]), doc["data"]["input"], created):
+                    loaded += 1
+        except Exception as e:
+            logger.warning(f"Could not load session index: {str(e)}")
+            return
+
+        logger.info(f"Session index loaded {loaded} sessions in {len(self.buckets)} location groups")
+
+    def _add(self, session_id: str, session_input: Dict[str, Any], created: float) -> bool:
+        vector = sensor_vector(session_input.get("sensor_data") or {})
+        if vector is None:
+            return False
+        key = _location_key(session_input.get("location") or {}, session_input.get("start_month", START_MONTH))
+        self.buckets.setdefault(key, _Bucket()).add(session_id, vector, created, self.max_sessions)
+        return True
+
+    def add(self, session_id: str, storage_data: Dict[str, Any]):
+        if not self.enabled or "reused_from" in storage_data:
+            return
+        self._add(session_id, storage_data.get("input") or {}, time.time())
+
+    def remove(self, session_id: str):
+        self.stats["stale_entries"] += 1
+        for bucket in self.buckets.values():
+            bucket.remove(session_id)
+
+    def nearest(self, location: Dict[str, Any], sensor_data: Dict[str, Any], start_month: int = START_MONTH) -> Optional[Tuple[str, float]]:
+        """Closest recent session within max_distance, as (session_id, distance)."""
+        if not self.enabled:
+            return None
+
+        bucket = self.buckets.get(_location_key(location, start_month))
+        vector = sensor_vector(sensor_data)
+        if bucket is None or vector is None or not bucket.session_ids:
+            self.stats["misses"] += 1
+            return None
+
+        distances = np.linalg.norm(bucket.vectors - vector, axis=1)
+        distances[bucket.created < time.time() - self.max_age_seconds] = np.inf
+        best = int(np.argmin(distances))
+        if distances[best] > self.max_distance:
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["hits"] += 1
+        return bucket.session_ids[best], float(distances[best])
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "sessions": sum(len(bucket.session_ids) for bucket in self.buckets.values()),
+            "location_groups": len(self.buckets),
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0
+        }
+
+session_index = SessionIndex(
+    SESSION_REUSE_MAX_DISTANCE,
+    SESSION_REUSE_MAX_AGE_HOURS,
+    SESSION_INDEX_MAX_SESSIONS,
+    enabled=SESSION_REUSE_ENABLED
+)
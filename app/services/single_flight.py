@@ -0,0 +1,159 @@
+import os
+import uuid
+import socket
+import asyncio
+import logging
+import contextvars
+from datetime import datetime, timedelta
+from typing import Dict, Any, Callable, Awaitable
+from pymongo.errors import DuplicateKeyError
+from app.core.config import (
+    SINGLE_FLIGHT_BACKEND,
+    SINGLE_FLIGHT_LEASE_SECONDS,
+    SINGLE_FLIGHT_POLL_INTERVAL,
+    SINGLE_FLIGHT_RESULT_TTL_SECONDS
+)
+from app.core.database import mongodb
+from app.core.deadline import DeadlineExceeded, remaining, without_deadline
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "single_flight_locks"
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+class SingleFlight:
+    """Runs at most one generation per key at a time.
+
+    Callers in the same process share one asyncio task. With the "mongo"
+    backend a lease document also coordinates uvicorn workers: the worker
+    holding the lease runs the generation and publishes its result on the
+    lease, the others poll it until it is done or the lease expires.
+    """
+
+    def __init__(self, backend: str, lease_seconds: int, poll_interval: float, result_ttl_seconds: int):
+        self.backend = backend
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.result_ttl_seconds = result_ttl_seconds
+        self.in_flight: Dict[str, asyncio.Task] = {}
+        self.stats = {
+            "leaders": 0,
+            "coalesced_local": 0,
+            "coalesced_remote": 0,
+            "lease_takeovers": 0
+        }
+
+    def _collection(self):
+        if self.backend != "mongo" or mongodb.client is None:
+            return None
+        return mongodb.get_database()[COLLECTION_NAME]
+
+    async def ensure_indexes(self):
+        collection = self._collection()
+        if collection is None:
+            return
+        try:
+            await collection.create_index("expires_at", expireAfterSeconds=0)
+        except Exception as e:
+            logger.warning(f"Could not create single-flight TTL index: {str(e)}")
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self.in_flight.get(key)
+        if task is None:
+            self.stats["leaders"] += 1
+            # Not bound by the leader's deadline; each caller waits up to its own below
+            task = asyncio.get_running_loop().create_task(self._run_shared(key, fn), context=contextvars.Context())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self._release_local(key, done))
+        else:
+            self.stats["coalesced_local"] += 1
+        # Shield so a cancelled caller does not cancel the generation other callers await
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded()
+
+    def _release_local(self, key: str, task: asyncio.Task):
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when every waiter has gone away
+            task.exception()
+
+    async def _run_shared(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        collection = self._collection()
+        if collection is None:
+            return await fn()
+
+        if not await self._acquire(collection, key):
+            self.stats["coalesced_remote"] += 1
+            return await self._wait_remote(collection, key, fn)
+
+        try:
+            result = await fn()
+        except BaseException:
+            await without_deadline(lambda: collection.delete_one({"_id": key, "owner": WORKER_ID}))
+            raise
+
+        await collection.update_one(
+            {"_id": key, "owner": WORKER_ID},
+            {"$set": {
+                "status": "done",
+                "result": result,
+                "expires_at": datetime.utcnow() + timedelta(seconds=self.result_ttl_seconds)
+            }}
+        )
+        return result
+
+    async def _acquire(self, collection, key: str) -> bool:
+        now = datetime.utcnow()
+        lease = {
+            "status": "running",
+            "owner": WORKER_ID,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=self.lease_seconds)
+        }
+        try:
+            await collection.insert_one({"_id": key, **lease})
+            return True
+        except DuplicateKeyError:
+            pass
+
+        # The previous holder crashed or its published result has gone stale
+        taken = await collection.find_one_and_update(
+            {"_id": key, "expires_at": {"$lte": now}},
+            {"$set": lease}
+        )
+        if taken is not None:
+            self.stats["lease_takeovers"] += 1
+            return True
+        return False
+
+    async def _wait_remote(self, collection, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        give_up_at = loop.time() + self.lease_seconds
+        while loop.time() < give_up_at:
+            await asyncio.sleep(remaining(self.poll_interval))
+            doc = await collection.find_one({"_id": key})
+            if doc is None:
+                # The holder failed and released the lease; compete for it again
+                break
+            if doc.get("status") == "done":
+                return doc.get("result")
+
+        logger.warning(f"Single-flight wait for {key} ended without a result, generating locally")
+        return await self._run_shared(key, fn)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "backend": self.backend,
+            "in_flight": len(self.in_flight)
+        }
+
+single_flight = SingleFlight(
+    SINGLE_FLIGHT_BACKEND,
+    SINGLE_FLIGHT_LEASE_SECONDS,
+    SINGLE_FLIGHT_POLL_INTERVAL,
+    SINGLE_FLIGHT_RESULT_TTL_SECONDS
+)
@@ -0,0 +1,150 @@
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from cachetools import TLRUCache
+from pymongo import UpdateOne
+from app.core.config import (
+    THUMBNAIL_CACHE_ENABLED,
+    THUMBNAIL_CACHE_MAX_ENTRIES,
+    THUMBNAIL_CACHE_TTL_SECONDS,
+    THUMBNAIL_CACHE_NEGATIVE_TTL_SECONDS
+)
+from app.core.database import mongodb
+from app.services.crop_catalog import normalize_crop_name
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "thumbnail_cache"
+
+class ThumbnailCache:
+    """Two-tier cache of Wikipedia thumbnail URLs per crop.
+
+    Keyed on the normalized searchable_name, kept in an in-process LRU and
+    mirrored to a Mongo collection shared by every worker. Crops without an
+    image are cached too (as None) for THUMBNAIL_CACHE_NEGATIVE_TTL_SECONDS,
+    so they are not looked up on every response; failed lookups are not cached.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int, negative_ttl_seconds: int, enabled: bool = True):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        # Values are (url, monotonic expiry), so entries loaded from Mongo keep their remaining TTL
+        self.memory = TLRUCache(maxsize=max_entries, ttu=lambda key, value, now: value[1])
+        self.stats = {
+            "memory_hits": 0,
+            "mongo_hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "errors": 0
+        }
+
+    def _collection(self):
+        if mongodb.client is None:
+            return None
+        return mongodb.get_database()[COLLECTION_NAME]
+
+    def _ttl(self, url: Optional[str]) -> int:
+        return self.ttl_seconds if url else self.negative_ttl_seconds
+
+    async def ensure_indexes(self):
+        collection = self._collection()
+        if collection is None:
+            return
+        try:
+            # Mongo's TTL monitor removes documents once expires_at has passed
+            await collection.create_index("expires_at", expireAfterSeconds=0)
+        except Exception as e:
+            logger.warning(f"Could not create thumbnail cache TTL index: {str(e)}")
+
+    def _hit(self, url: Optional[str], tier: str):
+        self.stats[tier] += 1
+        if url is None:
+            self.stats["negative_hits"] += 1
+
+    async def get_many(self, searchable_names: List[str]) -> Dict[str, Optional[str]]:
+        """Cached URLs (None for crops known to have no image), for the names that are cached."""
+        if not self.enabled:
+            return {}
+
+        found: Dict[str, Optional[str]] = {}
+        missing: Dict[str, List[str]] = {}
+        for name in searchable_names:
+            key = normalize_crop_name(name)
+            entry = self.memory.get(key)
+            if entry is not None:
+                self._hit(entry[0], "memory_hits")
+                found[name] = entry[0]
+            else:
+                missing.setdefault(key, []).append(name)
+
+        collection = self._collection()
+        if missing and collection is not None:
+            now = datetime.utcnow()
+            try:
+                async for doc in collection.find({"_id": {"$in": list(missing)}, "expires_at": {"$gt": now}}):
+                    url = doc.get("url")
+                    self.memory[doc["_id"]] = (url, time.monotonic() + (doc["expires_at"] - now).total_seconds())
+                    for name in missing.pop(doc["_id"]):
+                        self._hit(url, "mongo_hits")
+                        found[name] = url
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning(f"Thumbnail cache lookup failed: {str(e)}")
+
+        self.stats["misses"] += sum(len(names) for names in missing.values())
+        return found
+
+    async def set_many(self, thumbnails: Dict[str, Optional[str]]):
+        if not self.enabled or not thumbnails:
+            return
+
+        entries: Dict[str, Tuple[str, Optional[str]]] = {}
+        for name, url in thumbnails.items():
+            key = normalize_crop_name(name)
+            if key:
+                entries[key] = (name, url)
+                self.memory[key] = (url, time.monotonic() + self._ttl(url))
+        self.stats["stores"] += len(entries)
+
+        collection = self._collection()
+        if collection is None or not entries:
+            return
+
+        now = datetime.utcnow()
+        try:
+            await collection.bulk_write([
+                UpdateOne(
+                    {"_id": key},
+                    {"$set": {
+                        "searchable_name": name,
+                        "url": url,
+                        "created_at": now,
+                        "expires_at": now + timedelta(seconds=self._ttl(url))
+                    }},
+                    upsert=True
+                )
+                for key, (name, url) in entries.items()
+            ], ordered=False)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Thumbnail cache store failed: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self.stats["memory_hits"] + self.stats["mongo_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "memory_entries": len(self.memory),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+        }
+
+thumbnail_cache = ThumbnailCache(
+    THUMBNAIL_CACHE_MAX_ENTRIES,
+    THUMBNAIL_CACHE_TTL_SECONDS,
+    THUMBNAIL_CACHE_NEGATIVE_TTL_SECONDS,
+    enabled=THUMBNAIL_CACHE_ENABLED
+)
@@ -1,29 +1,166 @@
+import asyncio
+import logging
 import httpx
-from typing import Optional
+from typing import Dict, Any, List, Optional
+from app.core.config import (
+    HTTP_USER_AGENT,
+    WIKIPEDIA_BASE_URL,
+    WIKIPEDIA_HTTP2,
+    WIKIPEDIA_TIMEOUT_SECONDS,
+    WIKIPEDIA_BATCH_TIMEOUT_SECONDS,
+    WIKIPEDIA_MAX_CONCURRENCY,
+    WIKIPEDIA_MAX_CONNECTIONS
+)
+from app.core.deadline import remaining, DeadlineExceeded
+from app.services.thumbnail_cache import thumbnail_cache
+from app.services.image_store import image_store
 
-async def fetch_wikipedia_thumbnail(searchable_name: str) -> Optional[str]:
-    try:
-        url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{searchable_name.replace(' ', '_')}"
-        
-        headers = {
-            "User-Agent": "PiliSeed/1.0 (Agricultural Recommendation System; https://github.com/dandee77/piliseed)"
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+class WikipediaClient:
+    client: httpx.AsyncClient = None
+    stats = {
+        "requests": 0,
+        "found": 0,
+        "not_found": 0,
+        "errors": 0,
+        "batches": 0,
+        "batch_timeouts": 0
+    }
+
+    @classmethod
+    async def connect(cls):
+        cls.client = httpx.AsyncClient(
+            timeout=WIKIPEDIA_TIMEOUT_SECONDS,
+            headers={"User-Agent": HTTP_USER_AGENT},
+            http2=WIKIPEDIA_HTTP2 and HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=WIKIPEDIA_MAX_CONNECTIONS,
+                max_keepalive_connections=WIKIPEDIA_MAX_CONNECTIONS
+            )
+        )
+
+    @classmethod
+    async def disconnect(cls):
+        if cls.client:
+            await cls.client.aclose()
+            cls.client = None
+
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        if cls.client is None:
+            raise RuntimeError("Wikipedia client is not connected")
+        return cls.client
+
+    @classmethod
+    def get_stats(cls) -> Dict[str, Any]:
+        return {
+            **cls.stats,
+            "http2": WIKIPEDIA_HTTP2 and HTTP2_AVAILABLE,
+            "max_concurrency": WIKIPEDIA_MAX_CONCURRENCY
         }
-        
-        async with httpx.AsyncClient(timeout=10.0, headers=headers) as client:
-            response = await client.get(url)
-            
-            if response.status_code == 200:
-                data = response.json()
-                thumbnail = data.get("thumbnail")
-                
-                if thumbnail and "source" in thumbnail:
-                    return thumbnail["source"]
-                
-                original = data.get("originalimage")
-                if original and "source" in original:
-                    return original["source"]
-        
-        return None
-    except Exception as e:
-        print(f"Error fetching Wikipedia thumbnail for {searchable_name}: {str(e)}")
+
+wikipedia_client = WikipediaClient()
+
+async def _fetch_thumbnail(searchable_name: str) -> Optional[str]:
+    """The crop's thumbnail URL, or None if its page has no image.
+
+    Raises on errors, which the caller must not cache as "no image".
+    """
+    WikipediaClient.stats["requests"] += 1
+    url = f"{WIKIPEDIA_BASE_URL}/page/summary/{searchable_name.replace(' ', '_')}"
+    response = await wikipedia_client.get_client().get(url, timeout=remaining(WIKIPEDIA_TIMEOUT_SECONDS))
+
+    if response.status_code == 404:
+        WikipediaClient.stats["not_found"] += 1
         return None
+    response.raise_for_status()
+
+    data = response.json()
+    thumbnail = data.get("thumbnail")
+
+    if thumbnail and "source" in thumbnail:
+        WikipediaClient.stats["found"] += 1
+        return thumbnail["source"]
+
+    original = data.get("originalimage")
+    if original and "source" in original:
+        WikipediaClient.stats["found"] += 1
+        return original["source"]
+
+    WikipediaClient.stats["not_found"] += 1
+    return None
+
+async def fetch_wikipedia_thumbnails(searchable_names: List[str]) -> Dict[str, Optional[str]]:
+    """Thumbnails for several names at once, from the thumbnail cache where possible.
+
+    Cache misses are fetched with at most WIKIPEDIA_MAX_CONCURRENCY in flight,
+    sharing one budget of WIKIPEDIA_BATCH_TIMEOUT_SECONDS (or the request's
+    time left). Names that fail, or are still pending when it runs out, get None.
+    """
+    names = list(dict.fromkeys(name for name in searchable_names if name))
+    if not names:
+        return {}
+
+    thumbnails = await thumbnail_cache.get_many(names)
+    misses = [name for name in names if name not in thumbnails]
+    if not misses:
+        return thumbnails
+
+    WikipediaClient.stats["batches"] += 1
+    semaphore = asyncio.Semaphore(WIKIPEDIA_MAX_CONCURRENCY)
+
+    async def fetch(name: str) -> Optional[str]:
+        async with semaphore:
+            return await _fetch_thumbnail(name)
+
+    tasks = {name: asyncio.create_task(fetch(name)) for name in misses}
+    try:
+        budget = remaining(WIKIPEDIA_BATCH_TIMEOUT_SECONDS)
+    except DeadlineExceeded:
+        budget = 0
+    _, pending = await asyncio.wait(tasks.values(), timeout=budget)
+
+    if pending:
+        WikipediaClient.stats["batch_timeouts"] += 1
+        logger.warning(f"Wikipedia batch budget ran out with {len(pending)} of {len(misses)} thumbnails pending")
+        for task in pending:
+            task.cancel()
+
+    fetched = {}
+    for name, task in tasks.items():
+        thumbnails[name] = None
+        if task in pending:
+            continue
+        if task.exception() is not None:
+            WikipediaClient.stats["errors"] += 1
+            logger.warning(f"Error fetching Wikipedia thumbnail for {name}: {str(task.exception())}")
+            continue
+        thumbnails[name] = fetched[name] = task.result()
+
+    await thumbnail_cache.set_many(fetched)
+    return thumbnails
+
+async def fetch_wikipedia_thumbnail(searchable_name: str) -> Optional[str]:
+    thumbnails = await fetch_wikipedia_thumbnails([searchable_name])
+    return thumbnails.get(searchable_name)
+
+async def add_thumbnails(recommendations: List[Dict[str, Any]], only_missing: bool = False):
+    """Set image_url on each crop from one concurrent batch of thumbnail fetches.
+
+    URLs point at the local image store when it is enabled.
+    """
+    targets = [
+        rec for rec in recommendations
+        if rec.get("searchable_name", rec.get("crop")) and not (only_missing and rec.get("image_url"))
+    ]
+    thumbnails = await fetch_wikipedia_thumbnails([rec.get("searchable_name", rec.get("crop")) for rec in targets])
+    for rec in targets:
+        searchable_name = rec.get("searchable_name", rec.get("crop"))
+        rec["image_url"] = image_store.localize(searchable_name, thumbnails.get(searchable_name))
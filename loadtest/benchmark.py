@@ -0,0 +1,247 @@
+"""End-to-end load benchmark for the PiliSeed API.
+
+Creates throwaway sensors, seeds one session per sensor through the hardware
+endpoint, then drives each route at a fixed concurrency and reports
+throughput and latency percentiles. Pair it with loadtest.stub_server so no
+Gemini quota is spent:
+
+    python -m loadtest.benchmark --spawn --requests 200 --concurrency 20
+
+--spawn starts the stub server and the API (against MONGODB_URL) as
+subprocesses; without it the benchmark targets an already running API at
+--base-url.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from typing import Dict, Any, List, Callable, Awaitable, Optional
+import httpx
+
+ROUTES = ["hardware", "generate", "chat", "history", "session"]
+
+FARMER = {
+    "crop_category": "Vegetables",
+    "budget_php": 50000,
+    "waiting_tolerance_days": 90,
+    "land_size_ha": 1.0,
+    "manpower": 3
+}
+
+CHAT_QUESTIONS = [
+    "Which crop can I harvest first?",
+    "How often should I water the top crop?",
+    "What pests should I watch for this month?",
+    "Which crop has the best profit margin?"
+]
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def _readings() -> Dict[str, float]:
+    return {
+        "soil_moisture_pct": round(random.uniform(20, 60), 1),
+        "temperature_c": round(random.uniform(22, 34), 1),
+        "humidity_pct": round(random.uniform(55, 90), 1),
+        "light_lux": round(random.uniform(5000, 30000))
+    }
+
+class Benchmark:
+    def __init__(self, client: httpx.AsyncClient, sensors: int):
+        self.client = client
+        self.sensor_count = sensors
+        self.sensor_ids: List[str] = []
+        self.session_ids: List[str] = []
+
+    async def setup(self):
+        for i in range(self.sensor_count):
+            response = await self.client.post("/sensors/locations", json={
+                "name": f"loadtest-{i}",
+                "location": random.choice(["Malolos, Bulacan", "Lipa, Batangas", "Tarlac City, Tarlac"]),
+                "description": "Created by loadtest.benchmark"
+            })
+            response.raise_for_status()
+            self.sensor_ids.append(response.json()["sensor_id"])
+
+        # Every other route needs at least one stored session per sensor
+        for sensor_id in self.sensor_ids:
+            response = await self.client.post(f"/recommendations/hardware/{sensor_id}/readings", json=_readings())
+            response.raise_for_status()
+
+        # The hardware route answers after the top 3 and stores the session in the background
+        deadline = time.monotonic() + 60
+        for sensor_id in self.sensor_ids:
+            while True:
+                response = await self.client.get(f"/recommendations/{sensor_id}/history")
+                response.raise_for_status()
+                history = response.json()["history"]
+                if history or time.monotonic() > deadline:
+                    break
+                await asyncio.sleep(0.5)
+            self.session_ids.extend(session["id"] for session in history)
+
+    async def teardown(self):
+        for sensor_id in self.sensor_ids:
+            await self.client.delete(f"/recommendations/{sensor_id}/all-data")
+            await self.client.delete(f"/sensors/locations/{sensor_id}")
+
+    def request_for(self, route: str) -> Callable[[], Awaitable[httpx.Response]]:
+        sensor_id = random.choice(self.sensor_ids)
+        if route == "hardware":
+            return lambda: self.client.post(f"/recommendations/hardware/{sensor_id}/readings", json=_readings())
+        if route == "generate":
+            return lambda: self.client.post("/recommendations/generate", json={"sensor_id": sensor_id, "farmer": FARMER})
+        if route == "chat":
+            return lambda: self.client.post(f"/recommendations/{sensor_id}/chat", json={"message": random.choice(CHAT_QUESTIONS)})
+        if route == "history":
+            return lambda: self.client.get(f"/recommendations/{sensor_id}/history")
+        if route == "session":
+            if not self.session_ids:
+                raise RuntimeError("No sessions were seeded; cannot benchmark the session route")
+            return lambda: self.client.get(f"/recommendations/session/{random.choice(self.session_ids)}")
+        raise ValueError(f"Unknown route: {route}")
+
+    async def run_route(self, route: str, requests: int, concurrency: int) -> Dict[str, Any]:
+        latencies: List[float] = []
+        status_counts: Dict[str, int] = {}
+        remaining = iter(range(requests))
+
+        async def worker():
+            for _ in remaining:
+                send = self.request_for(route)
+                start = time.perf_counter()
+                try:
+                    response = await send()
+                    status = str(response.status_code)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - start)
+                status_counts[status] = status_counts.get(status, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+        ordered = sorted(latencies)
+        errors = sum(count for status, count in status_counts.items() if not status.startswith("2"))
+        return {
+            "route": route,
+            "requests": len(ordered),
+            "errors": errors,
+            "status_counts": status_counts,
+            "elapsed_seconds": round(elapsed, 2),
+            "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(_percentile(ordered, 0.50) * 1000, 1),
+            "p95_ms": round(_percentile(ordered, 0.95) * 1000, 1),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1000, 1),
+            "max_ms": round(_percentile(ordered, 1.0) * 1000, 1)
+        }
+
+def print_report(results: List[Dict[str, Any]]):
+    header = f"{'route':<10} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(
+            f"{result['route']:<10} {result['requests']:>8} {result['errors']:>6} {result['throughput_rps']:>8} "
+            f"{result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9} {result['max_ms']:>9}"
+        )
+
+def _spawn(args) -> List[subprocess.Popen]:
+    stub = subprocess.Popen([
+        sys.executable, "-m", "loadtest.stub_server",
+        "--port", str(args.stub_port),
+        "--latency-ms", str(args.stub_latency_ms),
+        "--error-rate", str(args.stub_error_rate),
+        "--rate-limit-rate", str(args.stub_rate_limit_rate)
+    ])
+
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    env = {
+        **os.environ,
+        "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY") or "stub",
+        "GEMINI_BASE_URL": f"{stub_url}/v1beta",
+        "WIKIPEDIA_BASE_URL": f"{stub_url}/api/rest_v1",
+        # The production quota would dominate every number; the stub has none
+        "GEMINI_REQUESTS_PER_MINUTE": os.environ.get("GEMINI_REQUESTS_PER_MINUTE", "100000"),
+        "GEMINI_TOKENS_PER_MINUTE": os.environ.get("GEMINI_TOKENS_PER_MINUTE", "1000000000"),
+        # Random readings would mostly be answered from stored sessions; measure generation instead
+        "SENSOR_CHANGE_DETECTION_ENABLED": os.environ.get("SENSOR_CHANGE_DETECTION_ENABLED", "false"),
+        "SESSION_REUSE_ENABLED": os.environ.get("SESSION_REUSE_ENABLED", "false")
+    }
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.api_port), "--log-level", "warning"],
+        env=env
+    )
+    return [stub, api]
+
+async def _wait_ready(client: httpx.AsyncClient, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            response = await client.get("/")
+            if response.status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("API did not become ready")
+        await asyncio.sleep(0.5)
+
+async def run(args) -> List[Dict[str, Any]]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        await _wait_ready(client)
+        benchmark = Benchmark(client, args.sensors)
+        try:
+            await benchmark.setup()
+            results = []
+            for route in args.routes:
+                result = await benchmark.run_route(route, args.requests, args.concurrency)
+                results.append(result)
+                print(f"{route}: {result['throughput_rps']} req/s, p95 {result['p95_ms']} ms", file=sys.stderr)
+            return results
+        finally:
+            if not args.keep_data:
+                await benchmark.teardown()
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="PiliSeed end-to-end load benchmark")
+    parser.add_argument("--base-url", default=None, help="API to benchmark (default http://127.0.0.1:<api-port>)")
+    parser.add_argument("--routes", nargs="+", choices=ROUTES, default=ROUTES)
+    parser.add_argument("--requests", type=int, default=100, help="Requests per route")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--sensors", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--keep-data", action="store_true", help="Do not delete the sensors and sessions created")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    parser.add_argument("--spawn", action="store_true", help="Start the stub server and the API as subprocesses")
+    parser.add_argument("--api-port", type=int, default=8001)
+    parser.add_argument("--stub-port", type=int, default=8100)
+    parser.add_argument("--stub-latency-ms", type=float, default=500)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--stub-rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+    args.base_url = args.base_url or f"http://127.0.0.1:{args.api_port}"
+
+    processes = _spawn(args) if args.spawn else []
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Micro-benchmark for the crop suitability pre-ranker.
+
+Scores a synthetic catalog against synthetic sensor readings with
+app.services.crop_ranker.suitability, once as a single crops x sensors pass
+and once per sensor (the way a request ranks), and reports throughput:
+
+    python -m loadtest.ranker_benchmark --crops 5000 --sensors 500
+
+--check also scores a sample with a plain Python loop and verifies that both
+give the same result, and parses catalog entries written the way the model
+writes them into features.
+"""
+import sys
+import json
+import time
+import argparse
+from typing import Dict, Any, List, Optional
+import numpy as np
+from app.services.crop_ranker import crop_features, suitability, TEMP_FALLOFF_C, FULL_SUN_LUX, SHADE_PENALTY, WEIGHTS
+
+# (optimal_temp_range_c, water_requirement, sunlight_hours_daily, shade_tolerance)
+# as stored in crop_catalog, with the features crop_features should give
+CATALOG_SAMPLES = [
+    (("20-30", "Moderate", 6, "Low"), [20.0, 30.0, 1.0, 6.0, 0.0]),
+    (("18-28°C", "High", 8, "Moderate"), [18.0, 28.0, 2.0, 8.0, 1.0]),
+    (("22 - 32", "Low", 10, "Low"), [22.0, 32.0, 0.0, 10.0, 0.0]),
+    (("15–25", "Moderate to high", 4, "High"), [15.0, 25.0, 1.0, 4.0, 2.0]),
+    (("25 to 35 °C", "Low", 12, "Low"), [25.0, 35.0, 0.0, 12.0, 0.0]),
+    (("27°C", "Medium", 6, "Moderate"), [27.0, 27.0, 1.0, 6.0, 1.0])
+]
+
+def synthetic_crops(count: int, rng: np.random.Generator) -> np.ndarray:
+    temp_low = rng.uniform(10, 28, count)
+    return np.column_stack([
+        temp_low,
+        temp_low + rng.uniform(4, 12, count),
+        rng.integers(0, 3, count).astype(float),
+        rng.integers(3, 13, count).astype(float),
+        rng.integers(0, 3, count).astype(float)
+    ])
+
+def synthetic_sensors(count: int, rng: np.random.Generator) -> np.ndarray:
+    return np.column_stack([
+        rng.uniform(18, 36, count),
+        rng.uniform(10, 70, count),
+        rng.uniform(1000, 60000, count)
+    ])
+
+def reference_score(crop: np.ndarray, sensor: np.ndarray) -> float:
+    temp_low, temp_high, water, sunlight, shade = crop
+    temperature, moisture, lux = sensor
+    outside = max(temp_low - temperature, 0) + max(temperature - temp_high, 0)
+    temp_score = min(max(1 - outside / TEMP_FALLOFF_C, 0), 1)
+    moisture_level = min(max((moisture - 15) / 20, 0), 2)
+    water_score = 1 - abs(water - moisture_level) / 2
+    deficit = max(min(max(sunlight / 12, 0), 1) - min(max(lux / FULL_SUN_LUX, 0), 1), 0)
+    light_score = min(max(1 - deficit * SHADE_PENALTY[int(shade)], 0), 1)
+    return WEIGHTS["temperature"] * temp_score + WEIGHTS["water"] * water_score + WEIGHTS["light"] * light_score
+
+def catalog_entry(temp_range: str, water: str, sunlight: float, shade: str) -> Dict[str, Any]:
+    return {
+        "growth_requirements": {
+            "optimal_temp_range_c": temp_range,
+            "water_requirement": water,
+            "sunlight_hours_daily": sunlight
+        },
+        "tolerances": {"shade_tolerance": shade}
+    }
+
+def check_catalog_parsing() -> List[str]:
+    """Catalog samples whose parsed features differ from the expected ones."""
+    mismatches = []
+    for fields, expected in CATALOG_SAMPLES:
+        actual = crop_features(catalog_entry(*fields))
+        if actual != expected:
+            mismatches.append(f"{fields[0]!r}: {actual} != {expected}")
+    return mismatches
+
+def _best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def run(crop_count: int, sensor_count: int, top_k: int, repeat: int, check: bool, seed: int) -> Dict[str, Any]:
+    rng = np.random.default_rng(seed)
+    crops = synthetic_crops(crop_count, rng)
+    sensors = synthetic_sensors(sensor_count, rng)
+    pairs = crop_count * sensor_count
+
+    def batch():
+        scores = suitability(crops, sensors)
+        np.argpartition(-scores, min(top_k, crop_count - 1), axis=1)[:, :top_k]
+
+    def per_sensor():
+        for sensor in sensors:
+            scores = suitability(crops, sensor[None, :])[0]
+            np.argsort(-scores)[:top_k]
+
+    batch_seconds = _best_of(repeat, batch)
+    per_sensor_seconds = _best_of(repeat, per_sensor)
+    result = {
+        "crops": crop_count,
+        "sensors": sensor_count,
+        "top_k": top_k,
+        "batch_ms": round(batch_seconds * 1000, 2),
+        "batch_pairs_per_second": round(pairs / batch_seconds),
+        "per_sensor_ms": round(per_sensor_seconds * 1000 / sensor_count, 3),
+        "per_sensor_pairs_per_second": round(pairs / per_sensor_seconds)
+    }
+
+    if check:
+        sample = rng.choice(crop_count, size=min(crop_count, 200), replace=False)
+        sensor_sample = sensors[:min(sensor_count, 20)]
+        started = time.perf_counter()
+        expected = np.array([[reference_score(crops[c], sensor) for c in sample] for sensor in sensor_sample])
+        loop_seconds = time.perf_counter() - started
+        actual = suitability(crops[sample], sensor_sample)
+        result["matches_reference"] = bool(np.allclose(actual, expected))
+        result["python_loop_pairs_per_second"] = round(expected.size / loop_seconds)
+        mismatches = check_catalog_parsing()
+        result["catalog_parsing_ok"] = not mismatches
+        for mismatch in mismatches:
+            print(f"Catalog parsing mismatch: {mismatch}", file=sys.stderr)
+
+    return result
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Crop pre-ranker micro-benchmark")
+    parser.add_argument("--crops", type=int, default=5000)
+    parser.add_argument("--sensors", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5, help="Report the best of this many runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check", action="store_true", help="Compare against a plain Python implementation and check catalog parsing")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    result = run(args.crops, args.sensors, args.top_k, args.repeat, args.check, args.seed)
+    for key, value in result.items():
+        print(f"{key:<30} {value}")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.check and not (result["matches_reference"] and result["catalog_parsing_ok"]):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
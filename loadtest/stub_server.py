@@ -0,0 +1,356 @@
+"""Local stand-in for the Gemini and Wikipedia APIs used by PiliSeed.
+
+Serves `generateContent`, `streamGenerateContent` (SSE) and the Wikipedia
+REST summary endpoint with responses that validate against app.models.schemas,
+so the API can be load-tested without spending Gemini quota.
+
+Run it, then point the API at it:
+
+    python -m loadtest.stub_server --port 8100 --latency-ms 800 --rate-limit-rate 0.02
+
+    GEMINI_API_KEY=stub \
+    GEMINI_BASE_URL=http://localhost:8100/v1beta \
+    WIKIPEDIA_BASE_URL=http://localhost:8100/api/rest_v1 \
+    python main.py
+"""
+import os
+import re
+import json
+import random
+import asyncio
+import argparse
+import hashlib
+from typing import Dict, Any, List
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SETTINGS = {
+    "latency_ms": float(os.getenv("STUB_LATENCY_MS", "500")),
+    "jitter_ms": float(os.getenv("STUB_JITTER_MS", "200")),
+    "error_rate": float(os.getenv("STUB_ERROR_RATE", "0")),
+    "rate_limit_rate": float(os.getenv("STUB_RATE_LIMIT_RATE", "0")),
+    "retry_after_seconds": float(os.getenv("STUB_RETRY_AFTER_SECONDS", "2")),
+    "stream_chunk_chars": int(os.getenv("STUB_STREAM_CHUNK_CHARS", "400")),
+    "stream_chunk_delay_ms": float(os.getenv("STUB_STREAM_CHUNK_DELAY_MS", "50")),
+    "wikipedia_latency_ms": float(os.getenv("STUB_WIKIPEDIA_LATENCY_MS", "80"))
+}
+
+CROPS = [
+    ("Pechay", "Bok choy", "Brassica rapa subsp. chinensis", "Vegetables", 30),
+    ("Kangkong", "Ipomoea aquatica", "Ipomoea aquatica", "Vegetables", 25),
+    ("Mustasa", "Brassica juncea", "Brassica juncea", "Vegetables", 40),
+    ("Lettuce", "Lettuce", "Lactuca sativa", "Vegetables", 45),
+    ("Sitaw", "Yardlong bean", "Vigna unguiculata subsp. sesquipedalis", "Legumes", 60),
+    ("Okra", "Okra", "Abelmoschus esculentus", "Vegetables", 55),
+    ("Ampalaya", "Bitter melon", "Momordica charantia", "Vegetables", 70),
+    ("Talong", "Eggplant", "Solanum melongena", "Vegetables", 80),
+    ("Kamatis", "Tomato", "Solanum lycopersicum", "Vegetables", 75),
+    ("Sili", "Chili pepper", "Capsicum frutescens", "Vegetables", 90),
+    ("Upo", "Calabash", "Lagenaria siceraria", "Vegetables", 65),
+    ("Kalabasa", "Cucurbita moschata", "Cucurbita moschata", "Vegetables", 100),
+    ("Pipino", "Cucumber", "Cucumis sativus", "Vegetables", 50),
+    ("Mungbean", "Mung bean", "Vigna radiata", "Legumes", 65),
+    ("Peanut", "Peanut", "Arachis hypogaea", "Legumes", 110),
+    ("Sweet Corn", "Sweet corn", "Zea mays convar. saccharata", "Cereals", 75),
+    ("Kamote", "Sweet potato", "Ipomoea batatas", "Vegetables", 110),
+    ("Gabi", "Taro", "Colocasia esculenta", "Vegetables", 180),
+    ("Luya", "Ginger", "Zingiber officinale", "Herbs", 240),
+    ("Tanglad", "Lemongrass", "Cymbopogon citratus", "Herbs", 120),
+    ("Basil", "Basil", "Ocimum basilicum", "Herbs", 45),
+    ("Pakwan", "Watermelon", "Citrullus lanatus", "Fruits", 85),
+    ("Melon", "Cantaloupe", "Cucumis melo", "Fruits", 80),
+    ("Papaya", "Papaya", "Carica papaya", "Fruits", 270)
+]
+
+CONTEXT = {
+    "location_analysis": {
+        "province": "Bulacan",
+        "region": "Central Luzon",
+        "climate_type": "Type I",
+        "current_season": "Dry",
+        "season_end_month": 4
+    },
+    "weather_forecast": {
+        "current_month_rainfall_mm": 80,
+        "next_3months_rainfall_mm": 45,
+        "temperature_range_c": "23-31",
+        "typhoon_risk": "Low",
+        "el_nino_la_nina": "Normal"
+    },
+    "market_conditions": {
+        "high_demand_crops": ["Tomato", "Eggplant", "Pechay"],
+        "price_trends": "Vegetable prices are stable ahead of the holidays",
+        "export_opportunities": ["Okra"],
+        "local_market_saturation": ["Kangkong"]
+    },
+    "agricultural_calendar": {
+        "optimal_planting_window": "November-January",
+        "harvest_season_conflict": "Rice harvest competes for labor in November",
+        "recommended_crop_cycles": ["Fast (30-60d)", "Medium (60-120d)"]
+    },
+    "risk_factors": {
+        "pest_disease_season": ["Aphids", "Fruit fly"],
+        "water_availability": "Moderate",
+        "soil_degradation_risk": "Low"
+    }
+}
+
+stats = {
+    "generate_content": 0,
+    "stream_generate_content": 0,
+    "wikipedia": 0,
+    "errors_injected": 0,
+    "rate_limits_injected": 0
+}
+
+app = FastAPI(title="PiliSeed load-test stub")
+
+def _rng(prompt: str) -> random.Random:
+    # Same prompt, same answer: keeps cache behaviour in the API realistic
+    return random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+
+def _crop(entry: tuple, rank: int, rng: random.Random) -> Dict[str, Any]:
+    name, searchable_name, scientific_name, category, cycle_days = entry
+    overall = round(max(0.3, 0.95 - rank * 0.05 - rng.random() * 0.03), 2)
+    cost = round(rng.uniform(8000, 60000), 2)
+    revenue = round(cost * rng.uniform(1.3, 2.5), 2)
+
+    def score() -> float:
+        return round(rng.uniform(0.5, 0.95), 2)
+
+    def level() -> str:
+        return rng.choice(["Low", "Moderate", "High"])
+
+    return {
+        "crop": name,
+        "searchable_name": searchable_name,
+        "scientific_name": scientific_name,
+        "category": category,
+        "scores": {
+            "overall_score": overall,
+            "confidence_pct": rng.randint(60, 95),
+            "env_score": score(),
+            "econ_score": score(),
+            "time_fit_score": score(),
+            "season_score": score(),
+            "labor_score": score(),
+            "risk_score": score(),
+            "market_score": score()
+        },
+        "growth_requirements": {
+            "crop_cycle_days": cycle_days,
+            "water_requirement": level(),
+            "sunlight_hours_daily": rng.randint(4, 8),
+            "optimal_temp_range_c": "20-32",
+            "soil_ph_range": "5.5-7.0",
+            "soil_type_preferred": rng.choice(["Loam", "Sandy loam", "Clay loam"])
+        },
+        "tolerances": {
+            "drought_tolerance": level(),
+            "flood_tolerance": level(),
+            "salinity_tolerance": level(),
+            "frost_tolerance": "Low",
+            "shade_tolerance": level(),
+            "pest_disease_resistance": level()
+        },
+        "management": {
+            "management_intensity": level(),
+            "labor_hours_per_ha_per_week": round(rng.uniform(8, 40), 1),
+            "organic_suitable": rng.random() > 0.3,
+            "mechanization_possible": rng.random() > 0.6,
+            "requires_irrigation": rng.random() > 0.4,
+            "requires_trellising": rng.random() > 0.7
+        },
+        "economics": {
+            "estimated_cost_php": cost,
+            "cost_breakdown": {
+                "seeds_php": round(cost * 0.15, 2),
+                "fertilizer_php": round(cost * 0.25, 2),
+                "pesticides_php": round(cost * 0.1, 2),
+                "labor_php": round(cost * 0.35, 2),
+                "irrigation_php": round(cost * 0.1, 2),
+                "others_php": round(cost * 0.05, 2)
+            },
+            "estimated_yield_kg_per_ha": round(rng.uniform(2000, 20000)),
+            "estimated_revenue_php": revenue,
+            "profit_margin_pct": round((revenue - cost) / revenue * 100, 1),
+            "roi_pct": round((revenue - cost) / cost * 100, 1),
+            "break_even_days": cycle_days + rng.randint(0, 30)
+        },
+        "market_strategy": {
+            "best_selling_locations": ["Malolos Public Market", "Balintawak Market"],
+            "current_market_price_php_per_kg": round(rng.uniform(20, 120), 2),
+            "projected_harvest_price_php_per_kg": round(rng.uniform(20, 120), 2),
+            "price_volatility": level(),
+            "demand_level": rng.choice(["Moderate", "High", "Very High"]),
+            "export_potential": rng.random() > 0.8,
+            "buyer_types": ["Wet market", "Supermarket"]
+        },
+        "planting_schedule": {
+            "recommended_planting_date": "November 15-30, 2025",
+            "expected_harvest_date": f"{cycle_days} days after planting",
+            "succession_planting_possible": rng.random() > 0.5,
+            "intercropping_compatible_with": []
+        },
+        "risk_assessment": {
+            "weather_risks": ["Late-season typhoon"],
+            "pest_disease_risks": ["Aphids"],
+            "market_risks": ["Harvest-time price drop"],
+            "mitigation_strategies": ["Stagger planting dates", "Use certified seeds"]
+        },
+        "reasoning": f"{name} fits the current sensor readings and the {cycle_days}-day cycle suits the season."
+    }
+
+def _recommendations(prompt: str, count: int) -> List[Dict[str, Any]]:
+    rng = _rng(prompt)
+    excluded = ""
+    if "ALREADY GENERATED CROPS" in prompt:
+        excluded = prompt.split("ALREADY GENERATED CROPS", 1)[1].split("\n\n", 1)[0]
+    candidates = [entry for entry in CROPS if entry[0] not in excluded]
+    rng.shuffle(candidates)
+    return [_crop(entry, rank, rng) for rank, entry in enumerate(candidates[:count])]
+
+def _answer(prompt: str) -> str:
+    """Pick a response shape by recognising which app prompt was sent."""
+    if "agricultural data analyst" in prompt:
+        return json.dumps(CONTEXT)
+    if "PiliSeed AI" in prompt:
+        return (
+            "Based on your latest recommendations, Pechay and Kangkong are the quickest to harvest. "
+            "Keep soil moisture steady and watch for aphids during the dry season."
+        )
+    if "ORIGINAL RECOMMENDATIONS" in prompt:
+        recommendations = _recommendations(prompt, 3)
+        return json.dumps({
+            "filter_explanation": "Selected the crops that fit the budget and waiting time best.",
+            "recommendations": recommendations
+        })
+    match = re.search(r"exactly (\d+) crop", prompt)
+    count = int(match.group(1)) if match else 5
+    return json.dumps({"recommendations": _recommendations(prompt, count)})
+
+def _prompt_text(body: Dict[str, Any]) -> str:
+    return "".join(
+        part.get("text", "")
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+    )
+
+def _usage(prompt: str, text: str) -> Dict[str, int]:
+    prompt_tokens = max(1, len(prompt) // 4)
+    output_tokens = max(1, len(text) // 4)
+    return {
+        "promptTokenCount": prompt_tokens,
+        "candidatesTokenCount": output_tokens,
+        "totalTokenCount": prompt_tokens + output_tokens
+    }
+
+async def _latency(mean_ms: float, jitter_ms: float):
+    delay = max(0.0, random.gauss(mean_ms, jitter_ms)) / 1000
+    if delay:
+        await asyncio.sleep(delay)
+
+def _injected_failure():
+    roll = random.random()
+    if roll < SETTINGS["rate_limit_rate"]:
+        stats["rate_limits_injected"] += 1
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(SETTINGS["retry_after_seconds"])},
+            content={"error": {"code": 429, "message": "Resource has been exhausted (stub)", "status": "RESOURCE_EXHAUSTED"}}
+        )
+    if roll < SETTINGS["rate_limit_rate"] + SETTINGS["error_rate"]:
+        stats["errors_injected"] += 1
+        return JSONResponse(
+            status_code=500,
+            content={"error": {"code": 500, "message": "Internal error (stub)", "status": "INTERNAL"}}
+        )
+    return None
+
+@app.post("/v1beta/models/{model}:generateContent")
+async def generate_content(model: str, request: Request):
+    stats["generate_content"] += 1
+    body = await request.json()
+    prompt = _prompt_text(body)
+
+    await _latency(SETTINGS["latency_ms"], SETTINGS["jitter_ms"])
+    failure = _injected_failure()
+    if failure is not None:
+        return failure
+
+    text = _answer(prompt)
+    return {
+        "candidates": [{
+            "content": {"role": "model", "parts": [{"text": text}]},
+            "finishReason": "STOP"
+        }],
+        "usageMetadata": _usage(prompt, text),
+        "modelVersion": model
+    }
+
+@app.post("/v1beta/models/{model}:streamGenerateContent")
+async def stream_generate_content(model: str, request: Request):
+    stats["stream_generate_content"] += 1
+    body = await request.json()
+    prompt = _prompt_text(body)
+
+    # Time to first token; later chunks are paced by stream_chunk_delay_ms
+    await _latency(SETTINGS["latency_ms"] / 2, SETTINGS["jitter_ms"] / 2)
+    failure = _injected_failure()
+    if failure is not None:
+        return failure
+
+    text = _answer(prompt)
+    size = SETTINGS["stream_chunk_chars"]
+
+    async def events():
+        for start in range(0, len(text), size):
+            if start:
+                await asyncio.sleep(SETTINGS["stream_chunk_delay_ms"] / 1000)
+            chunk = {"candidates": [{"content": {"role": "model", "parts": [{"text": text[start:start + size]}]}}]}
+            if start + size >= len(text):
+                chunk["candidates"][0]["finishReason"] = "STOP"
+                chunk["usageMetadata"] = _usage(prompt, text)
+            yield f"data: {json.dumps(chunk)}\r\n\r\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/api/rest_v1/page/summary/{title}")
+async def wikipedia_summary(title: str, request: Request):
+    stats["wikipedia"] += 1
+    await _latency(SETTINGS["wikipedia_latency_ms"], SETTINGS["wikipedia_latency_ms"] / 4)
+    base_url = str(request.base_url).rstrip("/")
+    return {
+        "type": "standard",
+        "title": title.replace("_", " "),
+        "extract": f"{title.replace('_', ' ')} is a crop grown in the Philippines.",
+        "thumbnail": {"source": f"{base_url}/images/{title}.jpg", "width": 320, "height": 240},
+        "originalimage": {"source": f"{base_url}/images/{title}.jpg", "width": 1280, "height": 960}
+    }
+
+@app.get("/stats")
+async def get_stats():
+    return {"settings": SETTINGS, **stats}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=SETTINGS["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=SETTINGS["jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=SETTINGS["error_rate"], help="Fraction of Gemini calls answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=SETTINGS["rate_limit_rate"], help="Fraction of Gemini calls answered with 429")
+    parser.add_argument("--retry-after-seconds", type=float, default=SETTINGS["retry_after_seconds"])
+    parser.add_argument("--stream-chunk-chars", type=int, default=SETTINGS["stream_chunk_chars"])
+    parser.add_argument("--stream-chunk-delay-ms", type=float, default=SETTINGS["stream_chunk_delay_ms"])
+    parser.add_argument("--wikipedia-latency-ms", type=float, default=SETTINGS["wikipedia_latency_ms"])
+    args = parser.parse_args()
+
+    for name in SETTINGS:
+        SETTINGS[name] = getattr(args, name)
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()